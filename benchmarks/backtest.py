@@ -0,0 +1,110 @@
+"""
+Benchmark of the vectorized backtest.
+
+Times :func:`backtest` over a synthetic daily price history, for a range of numbers of portfolios and rebalancing policies,
+and compares it with the same calendar policy run by calling :meth:`Portfolio.rebalance` in a Python loop (on fewer dates).
+The results are printed (or written) as JSON.
+
+Usage:
+    python benchmarks/backtest.py [--years 20] [--assets 10] [--portfolios 1 100 1000] [--loop-dates 63] [--output results.json]
+"""
+import argparse
+import json
+import platform
+import time
+
+import numpy as np
+
+import rebalance
+from rebalance import Asset
+from rebalance import Cash
+from rebalance import CachedCurrencyRates
+from rebalance import MarketSnapshot
+from rebalance import Portfolio
+from rebalance import StaticQuoteProvider
+from rebalance import SyntheticCurrencyRates
+from rebalance import backtest
+from rebalance import synthetic_history
+
+
+POLICIES = {
+    "monthly": {"every": 21},
+    "threshold_5%": {"threshold": 5.},
+    "quarterly_with_selling": {"every": 63, "selling_allowed": True},
+}
+
+
+def loop_seconds_per_rebalance(history, nb_dates):
+    """
+    Wall time (in seconds) of one :meth:`Portfolio.rebalance` call, on each of the first ``nb_dates`` dates.
+    """
+    tickers = list(history.tickers)
+    target = dict(zip(tickers, [100. / len(tickers)] * len(tickers)))
+    Cash.currency_rates = CachedCurrencyRates(SyntheticCurrencyRates())
+    p = Portfolio()
+    p.add_cash(10000., history.currencies[0])
+
+    start = time.perf_counter()
+    for t in range(nb_dates):
+        rates = history.rates[t]
+        snapshot = MarketSnapshot(history.currencies, rates[:, np.newaxis] / rates[np.newaxis, :],
+                                  tickers, history.prices[t], history.asset_currencies)
+        if t == 0:
+            Asset.quote_provider = StaticQuoteProvider(
+                {ticker: (price, currency)
+                 for ticker, price, currency in zip(tickers, history.prices[t], history.asset_currencies)})
+            p.easy_add_assets(tickers, [0] * len(tickers))
+        p.add_cash(500., history.currencies[0])
+        p.rebalance(target, snapshot=snapshot)
+
+    return (time.perf_counter() - start) / nb_dates
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--years", type=int, default=20, help="length of the history (252 dates per year)")
+    parser.add_argument("--assets", type=int, default=10, help="number of assets")
+    parser.add_argument("--portfolios", type=int, nargs="+", default=[1, 100, 1000], help="numbers of portfolios")
+    parser.add_argument("--loop-dates", type=int, default=63, help="number of dates rebalanced by the Python loop")
+    parser.add_argument("--output", default=None, help="file to which the JSON results are written")
+    args = parser.parse_args()
+
+    nb_dates = 252 * args.years
+    history = synthetic_history(["A%03d" % i for i in range(args.assets)], nb_dates)
+    target = np.full(args.assets, 100. / args.assets)
+    contributions = np.where(np.arange(nb_dates) % 21 == 0, 500., 0.)
+
+    results = []
+    for nb_portfolios in args.portfolios:
+        rng = np.random.default_rng(0)
+        quantities = np.zeros((nb_portfolios, args.assets))
+        cash = rng.uniform(1000., 100000., nb_portfolios)
+        for policy, options in POLICIES.items():
+            start = time.perf_counter()
+            result = backtest(history, quantities, cash, target, contributions, **options)
+            results.append({"policy": policy,
+                            "nb_portfolios": nb_portfolios,
+                            "nb_dates": nb_dates,
+                            "nb_assets": args.assets,
+                            "seconds": time.perf_counter() - start,
+                            "nb_rebalances": int(np.sum(result.nb_rebalances))})
+
+    seconds_per_rebalance = loop_seconds_per_rebalance(history, args.loop_dates)
+    report = {
+        "benchmark": "backtest",
+        "rebalance_version": rebalance.__version__,
+        "python_version": platform.python_version(),
+        "numpy_version": np.__version__,
+        "machine": platform.machine(),
+        "results": results,
+        "python_loop_seconds_per_rebalance": seconds_per_rebalance,
+    }
+    if args.output is None:
+        print(json.dumps(report, indent=2))
+    else:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Import-time benchmark.
+
+Measures, in fresh interpreters, the time taken by typical first statements of a short-lived job
+and prints the results as JSON. With ``--max-seconds``, exits with an error if any median exceeds the budget.
+
+Usage:
+    python benchmarks/import_time.py [--repeat 10] [--max-seconds 0.5]
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+
+STATEMENTS = {
+    "import rebalance": "import rebalance",
+    "from rebalance import Portfolio": "from rebalance import Portfolio",
+    "Portfolio()": "from rebalance import Portfolio; Portfolio()",
+}
+
+
+def time_statement(statement, repeat):
+    """
+    Median wall time (in seconds) of ``statement`` in a fresh interpreter.
+    """
+    script = ("import time\n"
+              "start = time.perf_counter()\n"
+              "%s\n"
+              "print(time.perf_counter() - start)" % statement)
+    timings = [float(subprocess.check_output([sys.executable, "-c", script]))
+               for _ in range(repeat)]
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=10, help="number of interpreters per statement")
+    parser.add_argument("--max-seconds", type=float, default=None, help="fail if a median exceeds this budget")
+    args = parser.parse_args()
+
+    results = {name: time_statement(statement, args.repeat) for name, statement in STATEMENTS.items()}
+    print(json.dumps({"benchmark": "import_time", "median_seconds": results}, indent=2))
+
+    if args.max_seconds is not None and max(results.values()) > args.max_seconds:
+        sys.exit("import time regression: budget of %.3f s exceeded." % args.max_seconds)
+
+
+if __name__ == "__main__":
+    main()
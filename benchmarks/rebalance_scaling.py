@@ -0,0 +1,144 @@
+"""
+Scaling benchmark of the rebalancing.
+
+Times valuation, :func:`rebalance_optimizer`, :meth:`Portfolio._smart_exchange` and :meth:`Portfolio.rebalance`
+for a range of numbers of assets and currencies, with and without selling.
+Quotes and exchange rates are deterministic and synthetic (no network access), so timings are comparable across runs
+and versions. The results are printed (or written) as JSON.
+
+Usage:
+    python benchmarks/rebalance_scaling.py [--assets 5 50 500 5000 10000] [--currencies 1 3 10] [--repeat 5] [--output results.json]
+"""
+import argparse
+import json
+import platform
+import statistics
+import time
+
+import numpy as np
+
+import rebalance
+from rebalance import Asset
+from rebalance import Cash
+from rebalance import CachedCurrencyRates
+from rebalance import MarketSnapshot
+from rebalance import Portfolio
+from rebalance import SyntheticCurrencyRates
+from rebalance import SyntheticQuoteProvider
+from rebalance.portfolio import rebalancing_helper
+
+
+def make_portfolio(nb_assets, nb_currencies, selling_allowed, seed=0):
+    """
+    Synthetic portfolio, with its target allocation (in %) and a snapshot of the market.
+    """
+    currencies = SyntheticCurrencyRates.currencies(nb_currencies)
+    Asset.quote_provider = SyntheticQuoteProvider(currencies, seed=seed)
+    Cash.currency_rates = CachedCurrencyRates(SyntheticCurrencyRates(seed=seed))
+
+    rng = np.random.default_rng(seed)
+    tickers = ["A%05d" % i for i in range(nb_assets)]
+    p = Portfolio()
+    p.easy_add_assets(tickers, rng.integers(0, 100, nb_assets).tolist())
+    p.easy_add_cash((rng.uniform(100., 1000., nb_currencies) * nb_assets).tolist(), currencies)
+    p.selling_allowed = selling_allowed
+
+    target = rng.uniform(0., 1., nb_assets)
+    target = target / np.sum(target) * 100.
+    return p, target, MarketSnapshot.capture(p)
+
+
+def time_call(function, repeat):
+    """
+    Median and minimum wall time (in seconds) of ``repeat`` calls of ``function``, after one warm-up call
+    (which e.g. pays for lazy imports).
+    """
+    function()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+
+    return {"median_seconds": statistics.median(timings), "min_seconds": min(timings), "repeat": repeat}
+
+
+def benchmark_case(nb_assets, nb_currencies, selling_allowed, repeat, slsqp_max_assets):
+    """
+    Timings of each operation for one portfolio configuration.
+    """
+    p, target, snapshot = make_portfolio(nb_assets, nb_currencies, selling_allowed)
+    target_dict = dict(zip(p._holdings.tickers, target.tolist()))
+    common = p._common_currency
+
+    # the optimization problem, as set up by rebalancing_helper.rebalance
+    problem = p._scratch_copy()
+    if selling_allowed:
+        problem._sell_everything()
+    problem._combine_cash(snapshot=snapshot)
+
+    # the currency conversions needed by the rebalancing
+    _, _, prices, cost, _ = rebalancing_helper.rebalance(p, target, snapshot)
+    currency_cost = {}
+    for ticker, (_, currency) in prices.items():
+        currency_cost[currency] = currency_cost.get(currency, 0.) + cost[ticker]
+
+    operations = {
+        "valuation": lambda: (p.value(common, snapshot), p.asset_allocation(snapshot)),
+        "rebalance_optimizer[exact]": lambda: rebalancing_helper.rebalance_optimizer(
+            problem, target, snapshot, solver="exact"),
+        "_smart_exchange": lambda: p._scratch_copy()._smart_exchange(currency_cost, snapshot),
+        "rebalance": lambda: p._scratch_copy().rebalance(target_dict, snapshot=snapshot),
+    }
+    if nb_assets <= slsqp_max_assets:
+        operations["rebalance_optimizer[slsqp]"] = lambda: rebalancing_helper.rebalance_optimizer(
+            problem, target, snapshot, solver="slsqp")
+
+    results = []
+    for operation, function in operations.items():
+        result = {"operation": operation,
+                  "nb_assets": nb_assets,
+                  "nb_currencies": nb_currencies,
+                  "selling_allowed": selling_allowed}
+        result.update(time_call(function, repeat))
+        results.append(result)
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--assets", type=int, nargs="+", default=[5, 50, 500, 5000, 10000],
+                        help="numbers of assets")
+    parser.add_argument("--currencies", type=int, nargs="+", default=[1, 3, 10],
+                        help="numbers of currencies (at most 10)")
+    parser.add_argument("--repeat", type=int, default=5, help="number of timed calls per operation")
+    parser.add_argument("--slsqp-max-assets", type=int, default=500,
+                        help="largest number of assets for which the SLSQP solver is timed")
+    parser.add_argument("--output", default=None, help="file to which the JSON results are written")
+    args = parser.parse_args()
+
+    results = []
+    for nb_assets in args.assets:
+        for nb_currencies in args.currencies:
+            for selling_allowed in (False, True):
+                results.extend(benchmark_case(nb_assets, nb_currencies, selling_allowed,
+                                              args.repeat, args.slsqp_max_assets))
+
+    report = {
+        "benchmark": "rebalance_scaling",
+        "rebalance_version": rebalance.__version__,
+        "python_version": platform.python_version(),
+        "numpy_version": np.__version__,
+        "machine": platform.machine(),
+        "results": results,
+    }
+    if args.output is None:
+        print(json.dumps(report, indent=2))
+    else:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
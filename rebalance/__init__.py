@@ -1,6 +1,61 @@
 __version__ = "0.1"
 
-from .cash.cash import Cash
-from .cash.price import Price
-from .assets.asset import Asset
-from .portfolio.portfolio import Portfolio
\ No newline at end of file
+import importlib
+
+# The public classes are imported lazily, on first access,
+# so that importing the package does not pull in numpy, scipy, or the network libraries.
+_lazy_attributes = {
+    "CachedCurrencyRates": ".cash.rate_cache",
+    "Cash": ".cash.cash",
+    "Price": ".cash.price",
+    "Quote": ".market.quotes",
+    "QuoteProvider": ".market.quotes",
+    "StaticQuoteProvider": ".market.quotes",
+    "YahooQuoteProvider": ".market.quotes",
+    "PriceHistory": ".market.history",
+    "MarketFixture": ".market.recording",
+    "RecordingCurrencyRates": ".market.recording",
+    "RecordingQuoteProvider": ".market.recording",
+    "ReplayCurrencyRates": ".market.recording",
+    "ReplayQuoteProvider": ".market.recording",
+    "MarketSnapshot": ".market.snapshot",
+    "MarketStore": ".market.store",
+    "StoredCurrencyRates": ".market.store",
+    "StoredQuoteProvider": ".market.store",
+    "SyntheticCurrencyRates": ".market.synthetic",
+    "SyntheticQuoteProvider": ".market.synthetic",
+    "synthetic_history": ".market.synthetic",
+    "Asset": ".assets.asset",
+    "Portfolio": ".portfolio.portfolio",
+    "RebalanceResult": ".portfolio.portfolio",
+    "Metrics": ".instrumentation",
+    "Tracer": ".instrumentation",
+    "Deadline": ".deadline",
+    "DeadlineExceeded": ".deadline",
+    "rebalance_many": ".portfolio.batch",
+    "BacktestResult": ".portfolio.backtest",
+    "backtest": ".portfolio.backtest",
+    "RiskModel": ".portfolio.risk",
+    "SolutionCache": ".portfolio.solution_cache",
+    "DriftCheck": ".portfolio.drift",
+    "ToleranceBands": ".portfolio.drift",
+    "CashFlow": ".portfolio.stream",
+    "PriceUpdate": ".portfolio.stream",
+    "save_portfolios": ".portfolio.storage",
+    "load_portfolios": ".portfolio.storage",
+}
+
+__all__ = list(_lazy_attributes.keys())
+
+
+def __getattr__(name):
+    if name not in _lazy_attributes:
+        raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+    value = getattr(importlib.import_module(_lazy_attributes[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals().keys()) + __all__)
@@ -1,6 +1,6 @@
 from rebalance import Price
-
-import yfinance as yf
+from rebalance.market.quotes import Quote
+from rebalance.market.quotes import YahooQuoteProvider
 
 
 class Asset:
@@ -9,14 +9,24 @@ class Asset:
 
     Holds the name, number of units, and the :class:`.Price` of the asset.
 
+    A lazy asset (``lazy=True``) does not fetch its quote when constructed, but on first access to its price.
+    When lazy assets are added to a :class:`.Portfolio`, their quotes are fetched together, in one request.
+
+    Attributes
+        quote_provider (QuoteProvider) : Used to fetch the price and currency of assets.
+
     """
-    def __init__(self, ticker, quantity=0):
+    quote_provider = YahooQuoteProvider()
+
+    def __init__(self, ticker, quantity=0, quote=None, lazy=False):
         """
         Initialization.
 
         Args:
             ticker (str): Ticker of the asset.
             quantity (int, optional): Number of units of the asset. Default is zero.
+            quote (Quote, optional): Quote of the asset. If None, it is fetched from ``Asset.quote_provider``.
+            lazy (bool, optional): If True (and no ``quote`` is specified), the quote is only fetched when first needed. Default is False.
         """
 
         assert ticker is not None, "ticker symbol is a mandatory argument."
@@ -24,10 +34,49 @@ class Asset:
 
         self._ticker = ticker
         self._quantity = quantity
-        ticker_info = yf.Ticker(self._ticker).info
 
         # we fetch the price
-        self._price = Price(ticker_info["regularMarketPrice"], ticker_info["currency"])
+        if quote is None and not lazy:
+            quote = Asset.quote_provider.get_quote(self._ticker)
+
+        if quote is not None:
+            self._set_quote(quote)
+
+    @classmethod
+    def from_quote(cls, ticker, quantity, price, currency, name=None):
+        """
+        Creates an asset from a known price, without fetching its quote.
+
+        Args:
+            ticker (str): Ticker of the asset.
+            quantity (int): Number of units of the asset.
+            price (float): Price of the asset (in its own currency).
+            currency (str): Currency of the asset.
+            name (str, optional): Display name of the asset.
+
+        Returns:
+            Asset: The asset.
+        """
+        return cls(ticker, quantity, quote=Quote(price, currency.upper(), name))
+
+    def __getattr__(self, name):
+        # only called for missing attributes: the quote of a lazy asset is fetched on first access
+        if name in ("_price", "_name") and "_ticker" in self.__dict__:
+            self._set_quote(Asset.quote_provider.get_quote(self._ticker))
+            return self.__dict__[name]
+
+        raise AttributeError("'%s' object has no attribute '%s'" % (type(self).__name__, name))
+
+    def _set_quote(self, quote):
+        self._price = Price(quote.price, quote.currency)
+        self._name = quote.name
+
+    @property
+    def is_priced(self):
+        """
+        (bool): Whether the quote of the asset is known (False for a lazy asset whose quote has not been fetched yet).
+        """
+        return "_price" in self.__dict__
 
     @property
     def quantity(self):
@@ -46,14 +95,15 @@ class Asset:
         """
         return self._price.price
 
-    def price_in(self, currency):
+    def price_in(self, currency, snapshot=None):
         """ 
         Price of the asset in specified currency. 
 
         Args:
             currency (str): Currency in which to obtain price of asset.
+            snapshot (MarketSnapshot, optional): If specified, the exchange rate is taken from it.
         """
-        return self._price.price_in(currency)
+        return self._price.price_in(currency, snapshot)
 
     @property
     def currency(self):
@@ -78,17 +128,18 @@ class Asset:
         """
         return self.price * self._quantity
 
-    def market_value_in(self, currency):
+    def market_value_in(self, currency, snapshot=None):
         """
         Computes the market value of the asset in specified currency. 
 
         Args:
             currency (str): Currency in which to obtain market value.
+            snapshot (MarketSnapshot, optional): If specified, the exchange rate is taken from it.
 
         Returns:
             float: Market value of the asset.
         """
-        return self._price.price_in(currency) * self._quantity
+        return self._price.price_in(currency, snapshot) * self._quantity
 
     def buy(self, quantity, currency=None):
         """
@@ -107,13 +158,14 @@ class Asset:
         
         return self._price.price_in(currency) * quantity
 
-    def cost_of(self, units, currency=None):
+    def cost_of(self, units, currency=None, snapshot=None):
         """
         Computes the cost to purchase the specified number of units.
 
         Args:
             units (int): Units interested in purchasing.
             currency (str, optional): Currency in which to convert the cost. Default is asset's own currency.
+            snapshot (MarketSnapshot, optional): If specified, the exchange rate is taken from it.
 
         Returns:
             (float): Cost of the purchase.
@@ -121,12 +173,14 @@ class Asset:
         if currency is None:
             return self.price * units
       
-        return self.price_in(currency) * units
+        return self.price_in(currency, snapshot) * units
 
     @property
     def mer(self):
         return 0.
 
     def __str__(self):
-        return yf.Ticker(
-            self._ticker).info['shortName'] + "(" + self._ticker + ")"
+        if self._name is None:
+            return self._ticker
+
+        return self._name + "(" + self._ticker + ")"
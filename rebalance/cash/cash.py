@@ -1,4 +1,4 @@
-from forex_python.converter import CurrencyRates
+from rebalance.cash.rate_cache import CachedCurrencyRates
 
 
 class Cash:
@@ -6,10 +6,10 @@ class Cash:
     An instance of :class:`Cash` holds an amount and a currency.
 
     Attributes
-        currency_rates (forex_python.converter) : Used for currency conversion.
+        currency_rates (CachedCurrencyRates) : Used for currency conversion. Caches the rates of forex_python's ``CurrencyRates`` (created on the first lookup).
 
     """
-    currency_rates = CurrencyRates()
+    currency_rates = CachedCurrencyRates()
 
     def __init__(self, amount, currency="CAD"):
         """
@@ -41,28 +41,31 @@ class Cash:
         """
         return self._currency
 
-    def amount_in(self, currency):
+    def amount_in(self, currency, snapshot=None):
         """
         Converts amount of cash in specified currency.
 
         Args:
             currency (str): Currency in which to convert the amount of cash.
+            snapshot (MarketSnapshot, optional): If specified, the exchange rate is taken from it instead of ``Cash.currency_rates``.
 
         Returns:
             (float): Amount of cash in specified currency.
         """
 
-        return self.exchange_rate(currency) * self._amount
+        return self.exchange_rate(currency, snapshot) * self._amount
 
-    def exchange_rate(self, currency):
+    def exchange_rate(self, currency, snapshot=None):
         """
         Obtain the exchange rate from ``cash``'s own currency to specified currency.
 
         Args:
             currency (str): Currency.
+            snapshot (MarketSnapshot, optional): If specified, the exchange rate is taken from it instead of ``Cash.currency_rates``.
 
         Returns:
             (float): exchange rate.
         """
 
-        return Cash.currency_rates.get_rate(self.currency, currency.upper())
+        rates = Cash.currency_rates if snapshot is None else snapshot
+        return rates.get_rate(self.currency, currency.upper())
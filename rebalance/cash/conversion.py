@@ -0,0 +1,133 @@
+import numpy as np
+
+from rebalance import instrumentation
+
+
+def plan_conversions(available, needed, snapshot, spreads=None):
+    """
+    Plans the currency conversions which cover the amount needed in each currency with the cash available in the others.
+
+    All the exchange rates are taken from ``snapshot``, so planning makes no rate lookup.
+    Currencies and conversions are considered in a fixed order (by amount, then by name), so the plan is deterministic.
+
+    Without ``spreads``, the plan makes as few conversions as possible: each deficit is covered in one conversion
+    from the smallest currency which can cover it on its own, otherwise from the largest currencies first.
+    With ``spreads``, the plan minimizes the total cost of the conversions, which is a small transportation problem
+    (a min-cost flow from the currencies in surplus to those in deficit) solved as a linear program.
+
+    If there is not enough cash to cover every deficit, all the cash in surplus is converted.
+
+    Args:
+        available (Dict[str, float]): Cash available in each currency.
+        needed (Dict[str, float]): Amount needed in each currency.
+        snapshot (MarketSnapshot): Exchange rates between all the currencies involved.
+        spreads (Dict[tuple, float], optional): Cost of converting between two currencies, as a fraction of the amount converted.
+            The keys of the dictionary are ``(from_currency, to_currency)`` pairs. Pairs which are not specified cost nothing.
+
+    Returns:
+        List[tuple]: tuple containing:
+                *  from_amount (float): Amount exchanged from currency indicated by `from_currency`
+                *  from_currency (str): Currency from which to perform the exchange
+                *  to_amount (float): Amount exchanged to currency indicated by `to_currency`
+                *  to_currency (str): Currency to which to perform the exchange
+                *  rate (float): Currency exchange rate from `from_currency` to `to_currency`
+    """
+    # net amount of each currency: positive if in surplus, negative if in deficit
+    net = {}
+    for currency, amount in available.items():
+        net[currency.upper()] = net.get(currency.upper(), 0.) + amount
+    for currency, amount in needed.items():
+        net[currency.upper()] = net.get(currency.upper(), 0.) - amount
+
+    # rate of each currency to the snapshot's first currency, to compare amounts of different currencies
+    base = snapshot.currencies[0]
+    to_base = {currency: snapshot.get_rate(currency, base) for currency in net}
+    surpluses = {currency: amount for currency, amount in net.items() if amount > 0.}
+    deficits = sorted(((currency, -amount) for currency, amount in net.items() if amount < 0.),
+                      key=lambda item: (-item[1] * to_base[item[0]], item[0]))
+    if len(surpluses) == 0 or len(deficits) == 0:
+        return []
+
+    if spreads is None:
+        plan = _fewest_conversions(surpluses, deficits, to_base)
+    else:
+        plan = _cheapest_conversions(surpluses, deficits, to_base, spreads)
+
+    exchange_history = []
+    for from_currency, to_currency, from_amount, to_amount in plan:
+        rate = snapshot.get_rate(from_currency, to_currency)
+        # the side of the conversion which is not limiting follows from the rate
+        if from_amount is None:
+            from_amount = to_amount * snapshot.get_rate(to_currency, from_currency)
+        else:
+            to_amount = from_amount * rate
+        exchange_history.append((from_amount, from_currency, to_amount, to_currency, rate))
+
+    instrumentation.count("currency_conversions", len(exchange_history))
+    return exchange_history
+
+
+def _fewest_conversions(surpluses, deficits, to_base):
+    # each conversion of the plan is (from_currency, to_currency, from_amount, to_amount), where one amount is None
+    plan = []
+    remaining = dict(surpluses)
+    for to_currency, deficit in deficits:
+        deficit_value = deficit * to_base[to_currency]
+        covering = [currency for currency, amount in remaining.items()
+                    if amount * to_base[currency] >= deficit_value]
+        if len(covering) > 0:
+            # the smallest currency which covers the deficit, so the large ones remain for the next deficits
+            from_currency = min(covering, key=lambda currency: (remaining[currency] * to_base[currency], currency))
+            plan.append((from_currency, to_currency, None, deficit))
+            remaining[from_currency] -= deficit_value / to_base[from_currency]
+            continue
+
+        # no currency covers the deficit on its own: use up the largest currencies first
+        for from_currency in sorted(remaining, key=lambda currency: (-remaining[currency] * to_base[currency], currency)):
+            value = remaining[from_currency] * to_base[from_currency]
+            if value <= 0.:
+                break
+            if value >= deficit_value:
+                plan.append((from_currency, to_currency, None, deficit_value / to_base[to_currency]))
+                remaining[from_currency] -= deficit_value / to_base[from_currency]
+                break
+
+            plan.append((from_currency, to_currency, remaining[from_currency], None))
+            remaining[from_currency] = 0.
+            deficit_value -= value
+
+    return plan
+
+
+def _cheapest_conversions(surpluses, deficits, to_base, spreads):
+    from scipy.optimize import linprog  # only needed (and imported) when spreads are specified
+
+    sources = sorted(surpluses)
+    sinks = [currency for currency, _ in deficits]
+    supply = np.array([surpluses[currency] * to_base[currency] for currency in sources])
+    demand = np.array([deficit * to_base[currency] for currency, deficit in deficits])
+    nb_sources = len(sources)
+    nb_sinks = len(sinks)
+
+    # flows[i, j] is the value converted from sources[i] to sinks[j], flattened row by row
+    costs = np.array([spreads.get((source, sink), 0.) for source in sources for sink in sinks])
+    per_source = np.kron(np.eye(nb_sources), np.ones(nb_sinks))
+    per_sink = np.kron(np.ones(nb_sources), np.eye(nb_sinks))
+
+    # the smaller side is used up entirely
+    if np.sum(supply) >= np.sum(demand):
+        solution = linprog(costs, A_ub=per_source, b_ub=supply, A_eq=per_sink, b_eq=demand, method="highs")
+    else:
+        solution = linprog(costs, A_ub=per_sink, b_ub=demand, A_eq=per_source, b_eq=supply, method="highs")
+    if not solution.success:
+        raise Exception("Currency conversions could not be planned: %s" % solution.message)
+
+    flows = solution.x.reshape(nb_sources, nb_sinks)
+    tolerance = 1e-9 * max(np.sum(supply), np.sum(demand))
+    plan = []
+    for j, (to_currency, deficit) in enumerate(deficits):
+        for i, from_currency in enumerate(sources):
+            if flows[i, j] > tolerance:
+                plan.append((from_currency, to_currency, None, deficit * flows[i, j] / demand[j]))
+
+    return plan
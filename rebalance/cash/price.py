@@ -1,7 +1,5 @@
 from rebalance import Cash
 
-from forex_python.converter import CurrencyRates
-
 
 class Price:
     """
@@ -32,17 +30,18 @@ class Price:
         """
         return self._currency
 
-    def price_in(self, currency):
+    def price_in(self, currency, snapshot=None):
         """
         Converts price in specified currency.
 
         Args:
             currency (str): Currency in which to convert the price.
+            snapshot (MarketSnapshot, optional): If specified, the exchange rate is taken from it instead of ``Cash.currency_rates``.
 
         Returns:
             (float): Price in specified currency.
         """
-        currency_exchange = Cash.currency_rates.get_rate(
-            self.currency, currency.upper())
+        rates = Cash.currency_rates if snapshot is None else snapshot
+        currency_exchange = rates.get_rate(self.currency, currency.upper())
 
         return currency_exchange * self._price
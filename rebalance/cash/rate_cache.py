@@ -0,0 +1,173 @@
+import threading
+import time
+from collections import OrderedDict
+
+from rebalance import instrumentation
+
+
+class CachedCurrencyRates:
+    """
+    Caches the exchange rates served by a source of currency rates.
+
+    Rates are kept for ``ttl`` seconds and at most ``maxsize`` currency pairs are cached (least recently used pairs are evicted first).
+    Conversions from a currency to itself are answered without any lookup.
+    The cache may be shared by several threads (e.g. a lookup abandoned at a deadline may still complete in the background).
+    """
+    def __init__(self, rates=None, ttl=3600., maxsize=1024):
+        """
+        Initialization.
+
+        Args:
+            rates (optional): Source of the rates. Must implement ``get_rate(from_currency, to_currency)``.
+                Default is forex_python's ``CurrencyRates``, created on the first lookup.
+            ttl (float, optional): Time (in seconds) during which a cached rate is valid. Default is one hour.
+            maxsize (int, optional): Maximum number of currency pairs kept in the cache. Default is 1024.
+        """
+        assert maxsize > 0, "maxsize must be positive."
+
+        self._rates = rates
+        self._ttl = ttl
+        self._maxsize = maxsize
+        self._cache = OrderedDict()
+        # guards the cache and the counters; lookups from the source are made without holding it
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    @property
+    def hits(self):
+        """
+        (int): Number of lookups answered from the cache (identity lookups included).
+        """
+        return self._hits
+
+    @property
+    def misses(self):
+        """
+        (int): Number of lookups forwarded to the source of the rates.
+        """
+        return self._misses
+
+    def get_rate(self, from_currency, to_currency):
+        """
+        Obtain the exchange rate from one currency to another.
+
+        Args:
+            from_currency (str): Currency from which to convert.
+            to_currency (str): Currency to which to convert.
+
+        Returns:
+            (float): exchange rate.
+        """
+        from_currency = from_currency.upper()
+        to_currency = to_currency.upper()
+        if from_currency == to_currency:
+            with self._lock:
+                self._hits += 1
+            instrumentation.count("fx_cache_hits")
+            return 1.0
+
+        key = (from_currency, to_currency)
+        now = time.monotonic()
+        rate = self._lookup(key, now)
+        if rate is not None:
+            return rate
+
+        with self._lock:
+            self._misses += 1
+        instrumentation.count("fx_cache_misses")
+        rate = self._source().get_rate(from_currency, to_currency)
+        self._store(key, rate, now)
+        return rate
+
+    async def aget_rates(self, pairs, max_concurrency=8):
+        """
+        Obtains many exchange rates without blocking the event loop.
+
+        The rates missing from the cache are fetched concurrently (in the event loop's default executor),
+        with at most ``max_concurrency`` lookups in flight, and then cached.
+
+        Args:
+            pairs (Sequence[tuple]): ``(from_currency, to_currency)`` pairs of interest.
+            max_concurrency (int, optional): Maximum number of concurrent lookups. Default is 8.
+
+        Returns:
+            Dict[tuple, float]: Exchange rate of each pair. The keys of the dictionary are the (upper-cased) pairs.
+        """
+        import asyncio  # only needed (and imported) when the asynchronous interface is used
+
+        assert max_concurrency > 0, "max_concurrency must be positive."
+
+        now = time.monotonic()
+        rates = {}
+        missing = []
+        for from_currency, to_currency in pairs:
+            key = (from_currency.upper(), to_currency.upper())
+            if key in rates or key in missing:
+                continue
+            if key[0] == key[1]:
+                with self._lock:
+                    self._hits += 1
+                instrumentation.count("fx_cache_hits")
+                rates[key] = 1.0
+                continue
+
+            rate = self._lookup(key, now)
+            if rate is None:
+                missing.append(key)
+            else:
+                rates[key] = rate
+
+        if len(missing) > 0:
+            source = self._source()
+            loop = asyncio.get_running_loop()
+            semaphore = asyncio.Semaphore(max_concurrency)
+
+            async def fetch(key):
+                async with semaphore:
+                    return await loop.run_in_executor(None, source.get_rate, *key)
+
+            with self._lock:
+                self._misses += len(missing)
+            instrumentation.count("fx_cache_misses", len(missing))
+            fetched = await asyncio.gather(*[fetch(key) for key in missing])
+            for key, rate in zip(missing, fetched):
+                self._store(key, rate, now)
+                rates[key] = rate
+
+        return rates
+
+    def _source(self):
+        if self._rates is None:
+            from forex_python.converter import CurrencyRates
+            self._rates = CurrencyRates()
+
+        return self._rates
+
+    def _lookup(self, key, now):
+        # cached rate of the pair, or None if it is absent or expired
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None or now >= entry[1]:
+                return None
+            self._cache.move_to_end(key)
+            self._hits += 1
+
+        instrumentation.count("fx_cache_hits")
+        return entry[0]
+
+    def _store(self, key, rate, now):
+        with self._lock:
+            self._cache[key] = (rate, now + self._ttl)
+            self._cache.move_to_end(key)
+            if len(self._cache) > self._maxsize:
+                self._cache.popitem(last=False)
+
+    def clear(self):
+        """
+        Empties the cache and resets the hit and miss counters.
+        """
+        with self._lock:
+            self._cache.clear()
+            self._hits = 0
+            self._misses = 0
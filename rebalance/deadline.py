@@ -0,0 +1,110 @@
+import contextvars
+import threading
+import time
+
+
+class DeadlineExceeded(Exception):
+    """
+    Raised when a call guarded by a :class:`Deadline` does not complete in time.
+    """
+
+
+class Deadline:
+    """
+    Time budget of a computation, shared by all its stages.
+
+    Blocking calls (quote fetching, exchange rate lookups) are run with :meth:`run`, which gives up when the budget is spent,
+    and iterative stages (the SLSQP solver) check :meth:`expired` to stop early.
+    A stage which had to settle for an approximate answer records it with :meth:`mark`, so the caller can flag the outcome.
+    """
+    def __init__(self, time_budget):
+        """
+        Initialization.
+
+        Args:
+            time_budget (float): Time budget (in seconds), starting now. May be zero or negative (the deadline has already passed).
+        """
+        self._expires_at = time.monotonic() + time_budget
+        self._exceeded = []
+
+    @property
+    def expires_at(self):
+        """
+        (float): Time (of ``time.monotonic()``) at which the deadline passes.
+        """
+        return self._expires_at
+
+    @property
+    def exceeded(self):
+        """
+        (List[str]): Names of the stages which ran out of time, in order.
+        """
+        return self._exceeded
+
+    def remaining(self):
+        """
+        Time left before the deadline.
+
+        Returns:
+            (float): Time left (in seconds). Zero if the deadline has passed.
+        """
+        return max(0., self._expires_at - time.monotonic())
+
+    def expired(self):
+        """
+        Checks whether the deadline has passed.
+
+        Returns:
+            (bool): True if no time is left.
+        """
+        return time.monotonic() >= self._expires_at
+
+    def mark(self, stage):
+        """
+        Records that a stage ran out of time.
+
+        Args:
+            stage (str): Name of the stage.
+        """
+        self._exceeded.append(stage)
+
+    def run(self, function, *args, timeout=None):
+        """
+        Calls a function, giving up if it does not return before the deadline.
+
+        The function runs in a daemon thread (in a copy of the current context, so its spans and counters are traced),
+        which is left behind if the deadline passes: a stalled network call never blocks the caller beyond the deadline.
+
+        Args:
+            function (Callable): Function to call.
+            *args: Arguments of the function.
+            timeout (float, optional): If specified, the call also gives up after this time (in seconds), even if the deadline has not passed,
+                so the call only takes a share of the time left.
+
+        Returns:
+            Value returned by the function.
+
+        Raises:
+            DeadlineExceeded: If the deadline passes (or the timeout elapses) before the function returns, or if the deadline has already passed.
+        """
+        if self.expired():
+            raise DeadlineExceeded("The deadline passed before %s was called." % getattr(function, "__name__", "the function"))
+
+        outcome = {}
+        context = contextvars.copy_context()
+
+        def target():
+            try:
+                outcome["value"] = context.run(function, *args)
+            except BaseException as e:
+                outcome["error"] = e
+
+        thread = threading.Thread(target=target, daemon=True)
+        thread.start()
+        thread.join(self.remaining() if timeout is None else min(timeout, self.remaining()))
+        if thread.is_alive():
+            raise DeadlineExceeded("%s did not complete before the deadline." % getattr(function, "__name__", "The function"))
+        if "error" in outcome:
+            raise outcome["error"]
+
+        return outcome["value"]
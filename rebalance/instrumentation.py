@@ -0,0 +1,237 @@
+import re
+import time
+from contextlib import contextmanager
+from contextlib import nullcontext
+from contextvars import ContextVar
+
+
+# tracers receiving the spans and counters of the current context (innermost last)
+_active_tracers = ContextVar("rebalance_active_tracers", default=())
+
+
+class Metrics:
+    """
+    Aggregated timings of named spans and values of named counters.
+    """
+    def __init__(self):
+        """
+        Initialization.
+        """
+        self._spans = {}
+        self._counters = {}
+
+    @property
+    def spans(self):
+        """
+        (Dict[str, Dict[str, float]]): Number of times ("count") and total wall time in seconds ("seconds") of each span.
+        The keys of the dictionary are the names of the spans.
+        """
+        return self._spans
+
+    @property
+    def counters(self):
+        """
+        (Dict[str, float]): Value of each counter. The keys of the dictionary are the names of the counters.
+        """
+        return self._counters
+
+    def add_span(self, name, seconds):
+        """
+        Records one occurrence of a span.
+
+        Args:
+            name (str): Name of the span.
+            seconds (float): Wall time of the span (in seconds).
+        """
+        span = self._spans.setdefault(name, {"count": 0, "seconds": 0.})
+        span["count"] += 1
+        span["seconds"] += seconds
+
+    def add_count(self, name, value=1):
+        """
+        Increments a counter.
+
+        Args:
+            name (str): Name of the counter.
+            value (float, optional): Increment. Default is 1.
+        """
+        self._counters[name] = self._counters.get(name, 0) + value
+
+    def merge(self, other):
+        """
+        Adds the spans and counters of other metrics to these ones.
+
+        Args:
+            other (Metrics): Metrics to add.
+        """
+        for name, span in other.spans.items():
+            mine = self._spans.setdefault(name, {"count": 0, "seconds": 0.})
+            mine["count"] += span["count"]
+            mine["seconds"] += span["seconds"]
+        for name, value in other.counters.items():
+            self.add_count(name, value)
+
+    def to_prometheus(self, prefix="rebalance"):
+        """
+        Formats the metrics in the Prometheus text exposition format.
+
+        Spans are exported as the ``<prefix>_span_seconds_total`` and ``<prefix>_span_count_total`` counters (labelled by span),
+        and each counter as ``<prefix>_<counter>_total``.
+
+        Args:
+            prefix (str, optional): Prefix of the metric names. Default is "rebalance".
+
+        Returns:
+            str: Metrics in the Prometheus text format.
+        """
+        lines = []
+        if len(self._spans) > 0:
+            for suffix, key, help_text in (("span_seconds_total", "seconds", "Total wall time of the span."),
+                                           ("span_count_total", "count", "Number of occurrences of the span.")):
+                metric = "%s_%s" % (prefix, suffix)
+                lines.append("# HELP %s %s" % (metric, help_text))
+                lines.append("# TYPE %s counter" % metric)
+                for name in sorted(self._spans):
+                    lines.append('%s{span="%s"} %r' % (metric, _escape_label(name), self._spans[name][key]))
+
+        for name in sorted(self._counters):
+            metric = "%s_%s_total" % (prefix, _metric_name(name))
+            lines.append("# TYPE %s counter" % metric)
+            lines.append("%s %r" % (metric, self._counters[name]))
+
+        return "\n".join(lines) + "\n"
+
+
+class Tracer:
+    """
+    Receives the spans and counters of the rebalancing pipeline, and aggregates them in :attr:`metrics`.
+
+    A tracer is active within a ``with tracer:`` block (or during a :meth:`.Portfolio.rebalance` it is passed to).
+    Subclasses may override :meth:`on_span_start`, :meth:`on_span_end` and :meth:`on_count`
+    (calling the base implementation) to forward the measurements elsewhere, e.g. to a logging or tracing system.
+    """
+    def __init__(self):
+        """
+        Initialization.
+        """
+        self._metrics = Metrics()
+        self._tokens = []
+
+    @property
+    def metrics(self):
+        """
+        (Metrics): Spans and counters received so far.
+        """
+        return self._metrics
+
+    def on_span_start(self, name):
+        """
+        Called when a span starts.
+
+        Args:
+            name (str): Name of the span.
+        """
+        pass
+
+    def on_span_end(self, name, seconds):
+        """
+        Called when a span ends.
+
+        Args:
+            name (str): Name of the span.
+            seconds (float): Wall time of the span (in seconds).
+        """
+        self._metrics.add_span(name, seconds)
+
+    def on_count(self, name, value):
+        """
+        Called when a counter is incremented.
+
+        Args:
+            name (str): Name of the counter.
+            value (float): Increment.
+        """
+        self._metrics.add_count(name, value)
+
+    def __enter__(self):
+        self._tokens.append(_active_tracers.set(_active_tracers.get() + (self,)))
+        return self
+
+    def __exit__(self, *args):
+        _active_tracers.reset(self._tokens.pop())
+
+
+@contextmanager
+def tracing(*tracers):
+    """
+    Activates the specified tracers within the enclosed block. Tracers which are None or already active are ignored.
+
+    Args:
+        *tracers (Tracer): Tracers to activate.
+    """
+    active = _active_tracers.get()
+    tracers = tuple(tracer for tracer in tracers if tracer is not None and tracer not in active)
+    if len(tracers) == 0:
+        yield
+        return
+
+    token = _active_tracers.set(active + tracers)
+    try:
+        yield
+    finally:
+        _active_tracers.reset(token)
+
+
+def span(name):
+    """
+    Times the enclosed block (``with span(name):``) as a span named ``name``, for the active tracers (if any).
+
+    Args:
+        name (str): Name of the span.
+    """
+    tracers = _active_tracers.get()
+    if len(tracers) == 0:
+        return _no_span
+
+    return _Span(name, tracers)
+
+
+class _Span:
+    def __init__(self, name, tracers):
+        self._name = name
+        self._tracers = tracers
+        self._start = None
+
+    def __enter__(self):
+        for tracer in self._tracers:
+            tracer.on_span_start(self._name)
+        self._start = time.perf_counter()
+
+    def __exit__(self, *args):
+        seconds = time.perf_counter() - self._start
+        for tracer in self._tracers:
+            tracer.on_span_end(self._name, seconds)
+
+
+# shared by all spans opened while no tracer is active, so they cost (almost) nothing
+_no_span = nullcontext()
+
+
+def count(name, value=1):
+    """
+    Increments a counter of the active tracers (if any).
+
+    Args:
+        name (str): Name of the counter.
+        value (float, optional): Increment. Default is 1.
+    """
+    for tracer in _active_tracers.get():
+        tracer.on_count(name, value)
+
+
+def _metric_name(name):
+    return re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+def _escape_label(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
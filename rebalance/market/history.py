@@ -0,0 +1,142 @@
+import numpy as np
+
+
+class PriceHistory:
+    """
+    Daily prices of a set of assets and exchange rates of their currencies, over a range of dates.
+
+    The prices and the rates are stored as dense matrices (one row per date), so a whole history can be
+    processed with vectorized operations (see :func:`.backtest`).
+    """
+    def __init__(self, dates, tickers, prices, asset_currencies, currencies=None, rates=None):
+        """
+        Initialization.
+
+        Args:
+            dates (Sequence): Dates of the history, in increasing order. Converted to ``datetime64[D]``.
+            tickers (Sequence[str]): Tickers of the assets.
+            prices (np.ndarray): Prices of the assets (in their own currency). ``prices[t, i]`` is the price of ``tickers[i]`` on ``dates[t]``.
+            asset_currencies (Sequence[str]): Currencies of the assets, in the same order as ``tickers``.
+            currencies (Sequence[str], optional): Currencies of the history. The first one is the base currency, in which the assets are valued.
+                Default is the currencies of the assets (in order of first appearance).
+            rates (np.ndarray, optional): Exchange rates to the base currency. ``rates[t, j]`` is the rate from ``currencies[j]`` to ``currencies[0]`` on ``dates[t]``.
+                Default is 1 for every currency, which is only meaningful if there is a single currency.
+        """
+        self._dates = np.array(dates, dtype="datetime64[D]")
+        self._tickers = tuple(tickers)
+        self._prices = np.array(prices, dtype=float).reshape(len(self._dates), len(self._tickers))
+        self._asset_currencies = tuple(currency.upper() for currency in asset_currencies)
+        if currencies is None:
+            currencies = list(dict.fromkeys(self._asset_currencies))
+        self._currencies = tuple(currency.upper() for currency in currencies)
+        if rates is None:
+            assert len(self._currencies) <= 1, "`rates` are required when there is more than one currency."
+            rates = np.ones((len(self._dates), len(self._currencies)))
+        self._rates = np.array(rates, dtype=float).reshape(len(self._dates), len(self._currencies))
+
+        assert len(self._asset_currencies) == len(self._tickers), \
+               "`tickers` and `asset_currencies` must be of the same length."
+        assert set(self._asset_currencies) <= set(self._currencies), \
+               "the currencies of the assets must be part of `currencies`."
+        assert np.all(np.diff(self._dates.astype(np.int64)) > 0), "`dates` must be increasing."
+        assert np.all(self._prices > 0.) and np.all(self._rates > 0.), "prices and rates must be positive."
+
+        for array in (self._dates, self._prices, self._rates):
+            array.flags.writeable = False
+
+    @classmethod
+    def load(cls, path):
+        """
+        Loads a history saved by :meth:`save`.
+
+        Args:
+            path (str): Path of the ``.npz`` file.
+
+        Returns:
+            PriceHistory: The history.
+        """
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data["dates"], data["tickers"].tolist(), data["prices"], data["asset_currencies"].tolist(),
+                       data["currencies"].tolist(), data["rates"])
+
+    def save(self, path):
+        """
+        Saves the history to a ``.npz`` file.
+
+        Args:
+            path (str): Path of the file.
+        """
+        with open(path, "wb") as f:
+            np.savez(f, dates=self._dates, tickers=np.array(self._tickers), prices=self._prices,
+                     asset_currencies=np.array(self._asset_currencies), currencies=np.array(self._currencies),
+                     rates=self._rates)
+
+    @property
+    def dates(self):
+        """
+        (np.ndarray): Read-only vector of dates (``datetime64[D]``).
+        """
+        return self._dates
+
+    @property
+    def tickers(self):
+        """
+        (Tuple[str]): Tickers of the assets.
+        """
+        return self._tickers
+
+    @property
+    def prices(self):
+        """
+        (np.ndarray): Read-only matrix of prices (in the assets' own currency). One row per date, one column per asset.
+        """
+        return self._prices
+
+    @property
+    def asset_currencies(self):
+        """
+        (Tuple[str]): Currencies of the assets, in the same order as ``tickers``.
+        """
+        return self._asset_currencies
+
+    @property
+    def currencies(self):
+        """
+        (Tuple[str]): Currencies of the history. The first one is the base currency.
+        """
+        return self._currencies
+
+    @property
+    def rates(self):
+        """
+        (np.ndarray): Read-only matrix of exchange rates to the base currency. One row per date, one column per currency.
+        """
+        return self._rates
+
+    def base_prices(self):
+        """
+        Prices of the assets in the base currency.
+
+        Returns:
+            (np.ndarray): Matrix of prices, with one row per date and one column per asset.
+        """
+        codes = [self._currencies.index(currency) for currency in self._asset_currencies]
+        return self._prices * self._rates[:, codes]
+
+    def select(self, tickers):
+        """
+        History of some of the assets.
+
+        Args:
+            tickers (Sequence[str]): Tickers of the assets, in the order of interest.
+
+        Returns:
+            PriceHistory: History of the assets.
+        """
+        try:
+            columns = [self._tickers.index(ticker) for ticker in tickers]
+        except ValueError as e:
+            raise Exception("Asset is not part of the price history: %s." % e)
+
+        return PriceHistory(self._dates, tickers, self._prices[:, columns],
+                            [self._asset_currencies[i] for i in columns], self._currencies, self._rates)
@@ -0,0 +1,236 @@
+import csv
+import json
+from collections import namedtuple
+
+from rebalance import instrumentation
+
+
+Quote = namedtuple("Quote", ["price", "currency", "name"])
+Quote.__doc__ = """
+Price, currency and (optionally) display name of a ticker.
+
+Attributes:
+    price (float): Last price of the ticker (in its own currency).
+    currency (str): Currency of the price.
+    name (str): Display name of the ticker. None if unknown.
+"""
+
+
+class QuoteProvider:
+    """
+    Interface of a source of quotes.
+
+    Subclasses must implement :meth:`get_quotes`, which fetches the quotes of many tickers at once.
+    """
+    def get_quotes(self, tickers):
+        """
+        Fetches the quotes of the specified tickers.
+
+        Args:
+            tickers (Sequence[str]): Tickers of interest.
+
+        Returns:
+            Dict[str, Quote]: Quote of each ticker. The keys of the dictionary are the tickers.
+        """
+        raise NotImplementedError
+
+    def get_quote(self, ticker):
+        """
+        Fetches the quote of a single ticker.
+
+        Args:
+            ticker (str): Ticker of interest.
+
+        Returns:
+            Quote: Quote of the ticker.
+        """
+        return self.get_quotes([ticker])[ticker]
+
+    async def aget_quotes(self, tickers):
+        """
+        Fetches the quotes of the specified tickers without blocking the event loop.
+
+        By default, :meth:`get_quotes` runs in the event loop's default executor.
+        Subclasses which can fetch quotes concurrently should override this method.
+
+        Args:
+            tickers (Sequence[str]): Tickers of interest.
+
+        Returns:
+            Dict[str, Quote]: Quote of each ticker. The keys of the dictionary are the tickers.
+        """
+        import asyncio  # only needed (and imported) when the asynchronous interface is used
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.get_quotes, list(tickers))
+
+
+def _unique(tickers):
+    # remove duplicates but preserve the order
+    return list(dict.fromkeys(tickers))
+
+
+class StaticQuoteProvider(QuoteProvider):
+    """
+    Serves quotes from memory. No network access is ever made.
+
+    Useful when prices come from one's own market-data feed, a local file or in tests.
+    """
+    def __init__(self, quotes=None):
+        """
+        Initialization.
+
+        Args:
+            quotes (Dict[str, tuple], optional): Initial quotes. The keys are the tickers and each value is a ``(price, currency)`` or ``(price, currency, name)`` tuple.
+        """
+        self._quotes = {}
+        if quotes is not None:
+            for ticker, quote in quotes.items():
+                self.add_quote(ticker, *quote)
+
+    @classmethod
+    def from_file(cls, path):
+        """
+        Loads quotes from a local file.
+
+        A ``.json`` file must map each ticker to an object with ``price``, ``currency`` and (optionally) ``name`` fields.
+        A ``.csv`` file must have a header with (at least) the ``ticker``, ``price`` and ``currency`` columns.
+
+        Args:
+            path (str): Path of the file.
+
+        Returns:
+            StaticQuoteProvider: Provider serving the quotes of the file.
+        """
+        provider = cls()
+        with open(path, newline="") as f:
+            if path.lower().endswith(".csv"):
+                for row in csv.DictReader(f):
+                    provider.add_quote(row["ticker"], float(row["price"]),
+                                       row["currency"], row.get("name"))
+            else:
+                for ticker, row in json.load(f).items():
+                    provider.add_quote(ticker, float(row["price"]),
+                                       row["currency"], row.get("name"))
+
+        return provider
+
+    def add_quote(self, ticker, price, currency, name=None):
+        """
+        Adds (or replaces) the quote of a ticker.
+
+        Args:
+            ticker (str): Ticker.
+            price (float): Price of the ticker (in its own currency).
+            currency (str): Currency of the price.
+            name (str, optional): Display name of the ticker.
+        """
+        self._quotes[ticker] = Quote(price, currency.upper(), name)
+
+    def get_quotes(self, tickers):
+        missing = [ticker for ticker in tickers if ticker not in self._quotes]
+        if len(missing) > 0:
+            raise Exception("No quote available for: %s." % ", ".join(missing))
+
+        return {ticker: self._quotes[ticker] for ticker in tickers}
+
+
+class YahooQuoteProvider(QuoteProvider):
+    """
+    Fetches quotes from Yahoo Finance, through yfinance.
+
+    The tickers are requested in batches of ``batch_size`` symbols. The tickers of a batch are fetched
+    with one :class:`yfinance.Tickers`, up to ``max_concurrency`` of them at the same time,
+    so pricing a portfolio of a few hundred assets costs about as long as a few round trips.
+    With :meth:`aget_quotes`, up to ``max_concurrency`` batches are requested at the same time.
+    """
+    def __init__(self, batch_size=200, timeout=10., max_concurrency=8):
+        """
+        Initialization.
+
+        Args:
+            batch_size (int, optional): Maximum number of tickers per batch. Default is 200.
+            timeout (float, optional): Timeout of each request (in seconds). Default is 10.
+            max_concurrency (int, optional): Maximum number of tickers of a batch fetched at the same time,
+                and of batches in flight in :meth:`aget_quotes`. Default is 8.
+        """
+        assert batch_size > 0, "batch_size must be positive."
+        assert max_concurrency > 0, "max_concurrency must be positive."
+
+        self._batch_size = batch_size
+        self._timeout = timeout
+        self._max_concurrency = max_concurrency
+
+    def get_quotes(self, tickers):
+        tickers = _unique(tickers)
+
+        quotes = {}
+        for batch in self._batches(tickers):
+            quotes.update(self._fetch_batch(batch))
+
+        return self._check_missing(tickers, quotes)
+
+    async def aget_quotes(self, tickers):
+        import asyncio  # only needed (and imported) when the asynchronous interface is used
+
+        tickers = _unique(tickers)
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(self._max_concurrency)
+
+        async def fetch(batch):
+            async with semaphore:
+                return await loop.run_in_executor(None, self._fetch_batch, batch)
+
+        quotes = {}
+        for batch_quotes in await asyncio.gather(*[fetch(batch) for batch in self._batches(tickers)]):
+            quotes.update(batch_quotes)
+
+        return self._check_missing(tickers, quotes)
+
+    def _batches(self, tickers):
+        return [tickers[start:start + self._batch_size]
+                for start in range(0, len(tickers), self._batch_size)]
+
+    def _fetch_batch(self, batch):
+        """
+        Fetches the quotes of one batch of tickers.
+
+        The last price, currency and name of each ticker are read from the metadata of its recent price history,
+        which yfinance requests with the cookie and crumb Yahoo Finance expects.
+
+        Args:
+            batch (List[str]): Tickers of the batch.
+
+        Returns:
+            Dict[str, Quote]: Quotes returned by Yahoo Finance. Tickers unknown to Yahoo Finance are left out.
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        import yfinance as yf  # only needed (and imported) when quotes are fetched from Yahoo Finance
+
+        instrumentation.count("quote_requests")
+        # yfinance upper-cases the symbols
+        tickers = yf.Tickers(list(batch))
+        with ThreadPoolExecutor(max_workers=min(len(batch), self._max_concurrency)) as executor:
+            metadata = list(executor.map(self._history_metadata,
+                                         [tickers.tickers[ticker.upper()] for ticker in batch]))
+
+        quotes = {}
+        for ticker, meta in zip(batch, metadata):
+            if meta.get("regularMarketPrice") is not None and meta.get("currency") is not None:
+                quotes[ticker] = Quote(float(meta["regularMarketPrice"]),
+                                       meta["currency"].upper(),
+                                       meta.get("shortName", meta.get("longName")))
+        return quotes
+
+    def _history_metadata(self, ticker):
+        ticker.history(period="5d", timeout=self._timeout)
+        return ticker.get_history_metadata()
+
+    @staticmethod
+    def _check_missing(tickers, quotes):
+        missing = [ticker for ticker in tickers if ticker not in quotes]
+        if len(missing) > 0:
+            raise Exception("No quote available for: %s." % ", ".join(missing))
+
+        return quotes
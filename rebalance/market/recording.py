@@ -0,0 +1,261 @@
+import json
+from contextlib import contextmanager
+
+from rebalance.market.quotes import Quote
+from rebalance.market.quotes import QuoteProvider
+
+
+class MarketFixture:
+    """
+    Quotes and exchange rates recorded from live sources, to be replayed later (e.g. by an offline test suite).
+
+    A fixture is stored as a JSON file of the form::
+
+        {"quotes": {"VCN.TO": {"price": 35.5, "currency": "CAD", "name": "Vanguard FTSE Canada"}, ...},
+         "rates": {"USD": {"CAD": 1.25, ...}, ...}}
+    """
+    def __init__(self, quotes=None, rates=None):
+        """
+        Initialization.
+
+        Args:
+            quotes (Dict[str, Quote], optional): Recorded quotes. The keys of the dictionary are the tickers.
+            rates (Dict[str, Dict[str, float]], optional): Recorded rates. ``rates[a][b]`` is the rate from currency ``a`` to currency ``b``.
+        """
+        self._quotes = {} if quotes is None else dict(quotes)
+        self._rates = {} if rates is None else {a: dict(b) for a, b in rates.items()}
+
+    @classmethod
+    def load(cls, path):
+        """
+        Loads a fixture from a JSON file.
+
+        Args:
+            path (str): Path of the file.
+
+        Returns:
+            MarketFixture: The fixture.
+        """
+        with open(path) as f:
+            data = json.load(f)
+
+        quotes = {ticker: Quote(row["price"], row["currency"], row.get("name"))
+                  for ticker, row in data.get("quotes", {}).items()}
+        return cls(quotes, data.get("rates", {}))
+
+    def save(self, path):
+        """
+        Saves the fixture to a JSON file (sorted, so that re-recording produces small diffs).
+
+        Args:
+            path (str): Path of the file.
+        """
+        data = {"quotes": {ticker: quote._asdict() for ticker, quote in self._quotes.items()},
+                "rates": self._rates}
+        with open(path, "w") as f:
+            json.dump(data, f, indent=2, sort_keys=True)
+            f.write("\n")
+
+    @property
+    def quotes(self):
+        """
+        (Dict[str, Quote]): Recorded quotes. The keys of the dictionary are the tickers.
+        """
+        return self._quotes
+
+    def add_quote(self, ticker, quote):
+        """
+        Records the quote of a ticker.
+
+        Args:
+            ticker (str): Ticker.
+            quote (Quote): Quote of the ticker.
+        """
+        self._quotes[ticker] = Quote(*quote)
+
+    def add_rate(self, from_currency, to_currency, rate):
+        """
+        Records an exchange rate.
+
+        Args:
+            from_currency (str): Currency from which to convert.
+            to_currency (str): Currency to which to convert.
+            rate (float): Exchange rate.
+        """
+        self._rates.setdefault(from_currency.upper(), {})[to_currency.upper()] = rate
+
+    def get_rate(self, from_currency, to_currency):
+        """
+        Recorded exchange rate from one currency to another. The inverse of the opposite rate is used if only that one was recorded.
+
+        Args:
+            from_currency (str): Currency from which to convert.
+            to_currency (str): Currency to which to convert.
+
+        Returns:
+            (float): exchange rate.
+        """
+        from_currency = from_currency.upper()
+        to_currency = to_currency.upper()
+        if from_currency == to_currency:
+            return 1.0
+        if to_currency in self._rates.get(from_currency, {}):
+            return self._rates[from_currency][to_currency]
+        if from_currency in self._rates.get(to_currency, {}):
+            return 1. / self._rates[to_currency][from_currency]
+
+        raise Exception("No recorded rate from %s to %s." % (from_currency, to_currency))
+
+
+class RecordingQuoteProvider(QuoteProvider):
+    """
+    Forwards requests to another provider and records every quote returned in a :class:`MarketFixture`.
+    """
+    def __init__(self, provider, fixture):
+        """
+        Initialization.
+
+        Args:
+            provider (QuoteProvider): Provider of the quotes.
+            fixture (MarketFixture): Fixture in which to record the quotes.
+        """
+        self._provider = provider
+        self._fixture = fixture
+
+    def get_quotes(self, tickers):
+        quotes = self._provider.get_quotes(tickers)
+        for ticker, quote in quotes.items():
+            self._fixture.add_quote(ticker, quote)
+        return quotes
+
+
+class RecordingCurrencyRates:
+    """
+    Forwards lookups to another source of rates and records every rate returned in a :class:`MarketFixture`.
+    """
+    def __init__(self, rates, fixture):
+        """
+        Initialization.
+
+        Args:
+            rates: Source of the rates. Must implement ``get_rate(from_currency, to_currency)``.
+            fixture (MarketFixture): Fixture in which to record the rates.
+        """
+        self._rates = rates
+        self._fixture = fixture
+
+    def get_rate(self, from_currency, to_currency):
+        """
+        Obtain the exchange rate from one currency to another.
+
+        Args:
+            from_currency (str): Currency from which to convert.
+            to_currency (str): Currency to which to convert.
+
+        Returns:
+            (float): exchange rate.
+        """
+        rate = self._rates.get_rate(from_currency, to_currency)
+        if from_currency.upper() != to_currency.upper():
+            self._fixture.add_rate(from_currency, to_currency, rate)
+        return rate
+
+
+class ReplayQuoteProvider(QuoteProvider):
+    """
+    Serves the quotes recorded in a :class:`MarketFixture`. No network access is ever made.
+    """
+    def __init__(self, fixture):
+        """
+        Initialization.
+
+        Args:
+            fixture (MarketFixture): Fixture of recorded quotes.
+        """
+        self._fixture = fixture
+
+    def get_quotes(self, tickers):
+        quotes = self._fixture.quotes
+        missing = [ticker for ticker in tickers if ticker not in quotes]
+        if len(missing) > 0:
+            raise Exception("No recorded quote for: %s." % ", ".join(missing))
+
+        return {ticker: quotes[ticker] for ticker in tickers}
+
+
+class ReplayCurrencyRates:
+    """
+    Serves the exchange rates recorded in a :class:`MarketFixture`. No network access is ever made.
+    """
+    def __init__(self, fixture):
+        """
+        Initialization.
+
+        Args:
+            fixture (MarketFixture): Fixture of recorded rates.
+        """
+        self._fixture = fixture
+
+    def get_rate(self, from_currency, to_currency):
+        """
+        Obtain the exchange rate from one currency to another.
+
+        Args:
+            from_currency (str): Currency from which to convert.
+            to_currency (str): Currency to which to convert.
+
+        Returns:
+            (float): exchange rate.
+        """
+        return self._fixture.get_rate(from_currency, to_currency)
+
+
+@contextmanager
+def recording(path):
+    """
+    Records all quotes and exchange rates fetched within the enclosed block, and saves them to ``path`` at the end.
+
+    ``Asset.quote_provider`` and ``Cash.currency_rates`` are wrapped for the duration of the block.
+    Quotes and rates already recorded in ``path`` (if it exists) are kept.
+
+    Args:
+        path (str): Path of the fixture file.
+    """
+    from rebalance import Asset, Cash, CachedCurrencyRates
+
+    try:
+        fixture = MarketFixture.load(path)
+    except FileNotFoundError:
+        fixture = MarketFixture()
+
+    quote_provider, currency_rates = Asset.quote_provider, Cash.currency_rates
+    Asset.quote_provider = RecordingQuoteProvider(quote_provider, fixture)
+    # a fresh cache, so that every rate used is looked up (and recorded) at least once
+    Cash.currency_rates = CachedCurrencyRates(RecordingCurrencyRates(currency_rates, fixture))
+    try:
+        yield fixture
+    finally:
+        Asset.quote_provider, Cash.currency_rates = quote_provider, currency_rates
+        fixture.save(path)
+
+
+@contextmanager
+def replaying(path):
+    """
+    Serves the quotes and exchange rates recorded in ``path`` within the enclosed block. No network access is made.
+
+    ``Asset.quote_provider`` and ``Cash.currency_rates`` are replaced for the duration of the block.
+
+    Args:
+        path (str): Path of the fixture file.
+    """
+    from rebalance import Asset, Cash, CachedCurrencyRates
+
+    fixture = MarketFixture.load(path)
+    quote_provider, currency_rates = Asset.quote_provider, Cash.currency_rates
+    Asset.quote_provider = ReplayQuoteProvider(fixture)
+    Cash.currency_rates = CachedCurrencyRates(ReplayCurrencyRates(fixture))
+    try:
+        yield fixture
+    finally:
+        Asset.quote_provider, Cash.currency_rates = quote_provider, currency_rates
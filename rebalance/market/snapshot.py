@@ -0,0 +1,349 @@
+import numpy as np
+
+from rebalance import Cash
+from rebalance import instrumentation
+from rebalance.deadline import DeadlineExceeded
+
+
+class MarketSnapshot:
+    """
+    Immutable snapshot of the market: exchange rates between a set of currencies and prices of a set of assets.
+
+    A snapshot is captured once (e.g. at the start of a rebalance) and used for every price and rate lookup afterwards,
+    so computations using it make no network calls and are reproducible.
+    """
+    def __init__(self, currencies, rates, tickers=(), prices=(), asset_currencies=()):
+        """
+        Initialization.
+
+        Args:
+            currencies (Sequence[str]): Currencies of the snapshot.
+            rates (np.ndarray): Dense matrix of exchange rates. ``rates[i, j]`` is the rate from ``currencies[i]`` to ``currencies[j]``.
+            tickers (Sequence[str], optional): Tickers of the assets.
+            prices (Sequence[float], optional): Prices of the assets (in their own currency). Must be in the same order as ``tickers``.
+            asset_currencies (Sequence[str], optional): Currencies of the assets. Must be in the same order as ``tickers``.
+        """
+        self._currencies = tuple(currency.upper() for currency in currencies)
+        self._currency_index = {currency: i for i, currency in enumerate(self._currencies)}
+        self._rates = np.array(rates, dtype=float).reshape(len(self._currencies), len(self._currencies))
+        self._rates.flags.writeable = False
+
+        assert len(tickers) == len(prices) == len(asset_currencies), \
+               "`tickers`, `prices` and `asset_currencies` must be of the same length."
+        self._tickers = tuple(tickers)
+        self._ticker_index = {ticker: i for i, ticker in enumerate(self._tickers)}
+        self._prices = np.array(prices, dtype=float)
+        self._prices.flags.writeable = False
+        self._asset_currencies = tuple(currency.upper() for currency in asset_currencies)
+
+    @classmethod
+    def capture(cls, portfolio, currencies=(), deadline=None):
+        """
+        Captures the current prices of a portfolio's assets and the exchange rates between all currencies involved.
+
+        Only one rate lookup per currency is made (from the portfolio's common currency). Cross rates are derived from them,
+        which keeps the rate matrix consistent (converting A to B to C gives the same amount as converting A to C).
+
+        Args:
+            portfolio (:class:`.Portfolio`): Portfolio of interest.
+            currencies (Sequence[str], optional): Additional currencies to include in the snapshot.
+            deadline (Deadline, optional): If specified, the exchange rate lookups give up when it passes. See :meth:`capture_many`.
+
+        Returns:
+            MarketSnapshot: Snapshot of the market.
+        """
+        return cls.capture_many([portfolio], currencies, deadline=deadline)
+
+    @classmethod
+    def capture_many(cls, portfolios, currencies=(), refresh_quotes=False, deadline=None):
+        """
+        Captures one snapshot shared by many portfolios: the union of their assets and of their currencies.
+
+        Args:
+            portfolios (Sequence[:class:`.Portfolio`]): Portfolios of interest. They must share the same common currency.
+            currencies (Sequence[str], optional): Additional currencies to include in the snapshot.
+            refresh_quotes (bool, optional): If True, the prices of all assets are fetched again from ``Asset.quote_provider``, in one request.
+                Otherwise, the prices held by the portfolios are used. Default is False.
+            deadline (Deadline, optional): If specified, the quotes and the exchange rates are fetched within it.
+                The quotes get at most half of the time left, so the exchange rates can still be fetched if the quotes stall:
+                the prices held by the portfolios are then used (and the "quotes" stage is marked on the deadline).
+
+        Returns:
+            MarketSnapshot: Snapshot of the market.
+
+        Raises:
+            DeadlineExceeded: If the exchange rates are not fetched before the deadline.
+        """
+        with instrumentation.span("snapshot"):
+            base, prices, asset_currencies, all_currencies = _collect(portfolios, currencies)
+
+            if refresh_quotes and len(prices) > 0:
+                from rebalance import Asset
+                try:
+                    quotes = _call(deadline, Asset.quote_provider.get_quotes, list(prices.keys()), share=0.5)
+                except DeadlineExceeded:
+                    # stale prices are better than no answer
+                    deadline.mark("quotes")
+                    instrumentation.count("deadline_exceeded")
+                else:
+                    _apply_quotes(quotes, prices, asset_currencies, all_currencies)
+
+            all_currencies = _ordered_currencies(base, all_currencies)
+            base_rates = np.array(_call(deadline, _get_rates, base, all_currencies))
+
+            return cls._from_parts(all_currencies, base_rates, prices, asset_currencies)
+
+    @classmethod
+    async def acapture_many(cls, portfolios, currencies=(), refresh_quotes=False, max_concurrency=8):
+        """
+        Asynchronous counterpart of :meth:`capture_many`, which does not block the event loop.
+
+        The quotes are fetched with the quote provider's ``aget_quotes`` and the exchange rates concurrently,
+        with at most ``max_concurrency`` lookups in flight.
+
+        Args:
+            portfolios (Sequence[:class:`.Portfolio`]): Portfolios of interest. They must share the same common currency.
+            currencies (Sequence[str], optional): Additional currencies to include in the snapshot.
+            refresh_quotes (bool, optional): If True, the prices of all assets are fetched again from ``Asset.quote_provider``.
+                Otherwise, the prices held by the portfolios are used. Default is False.
+            max_concurrency (int, optional): Maximum number of concurrent exchange rate lookups. Default is 8.
+
+        Returns:
+            MarketSnapshot: Snapshot of the market.
+        """
+        base, prices, asset_currencies, all_currencies = _collect(portfolios, currencies)
+
+        if refresh_quotes and len(prices) > 0:
+            from rebalance import Asset
+            _apply_quotes(await Asset.quote_provider.aget_quotes(list(prices.keys())),
+                          prices, asset_currencies, all_currencies)
+
+        all_currencies = _ordered_currencies(base, all_currencies)
+        rates = await fetch_rates([(base, currency) for currency in all_currencies], max_concurrency)
+        base_rates = np.array([rates[(base, currency)] for currency in all_currencies])
+
+        return cls._from_parts(all_currencies, base_rates, prices, asset_currencies)
+
+    @classmethod
+    def _from_parts(cls, currencies, base_rates, prices, asset_currencies):
+        tickers = list(prices.keys())
+        return cls(currencies, _cross_rates(base_rates),
+                   tickers=tickers,
+                   prices=[prices[ticker] for ticker in tickers],
+                   asset_currencies=[asset_currencies[ticker] for ticker in tickers])
+
+    @property
+    def currencies(self):
+        """
+        (Tuple[str]): Currencies of the snapshot.
+        """
+        return self._currencies
+
+    @property
+    def rates(self):
+        """
+        (np.ndarray): Read-only matrix of exchange rates. Entry ``[i, j]`` is the rate from ``currencies[i]`` to ``currencies[j]``.
+        """
+        return self._rates
+
+    @property
+    def tickers(self):
+        """
+        (Tuple[str]): Tickers of the assets of the snapshot.
+        """
+        return self._tickers
+
+    @property
+    def prices(self):
+        """
+        (np.ndarray): Read-only vector of asset prices (in their own currency), in the same order as ``tickers``.
+        """
+        return self._prices
+
+    @property
+    def asset_currencies(self):
+        """
+        (Tuple[str]): Currencies of the assets, in the same order as ``tickers``.
+        """
+        return self._asset_currencies
+
+    def get_rate(self, from_currency, to_currency):
+        """
+        Obtain the exchange rate from one currency to another.
+
+        Args:
+            from_currency (str): Currency from which to convert.
+            to_currency (str): Currency to which to convert.
+
+        Returns:
+            (float): exchange rate.
+        """
+        try:
+            return float(self._rates[self._currency_index[from_currency.upper()],
+                                     self._currency_index[to_currency.upper()]])
+        except KeyError:
+            raise Exception("Currency pair %s/%s is not part of the market snapshot." %
+                            (from_currency, to_currency))
+
+    def rates_to(self, currency):
+        """
+        Exchange rates from every currency of the snapshot to the specified currency.
+
+        Args:
+            currency (str): Currency to which to convert.
+
+        Returns:
+            (np.ndarray): Rates, in the same order as ``currencies``.
+        """
+        return self._rates[:, self._currency_index[currency.upper()]]
+
+    def prices_of(self, tickers):
+        """
+        Prices of many assets (in their own currency).
+
+        Args:
+            tickers (Sequence[str]): Tickers of the assets.
+
+        Returns:
+            (np.ndarray): Price of each asset, in the same order as ``tickers``.
+        """
+        try:
+            return self._prices[[self._ticker_index[ticker] for ticker in tickers]]
+        except KeyError as e:
+            raise Exception("Asset %s is not part of the market snapshot." % e)
+
+    def with_prices(self, prices):
+        """
+        Copy of the snapshot in which some assets have new prices. The exchange rates are shared with this snapshot.
+
+        Args:
+            prices (Dict[str, float]): New price of each asset (in its own currency). The keys of the dictionary are tickers of the snapshot.
+
+        Returns:
+            MarketSnapshot: Updated snapshot.
+        """
+        new_prices = self._prices.copy()
+        try:
+            for ticker, price in prices.items():
+                new_prices[self._ticker_index[ticker]] = price
+        except KeyError as e:
+            raise Exception("Asset %s is not part of the market snapshot." % e)
+        new_prices.flags.writeable = False
+
+        snapshot = MarketSnapshot.__new__(MarketSnapshot)
+        snapshot.__dict__.update(self.__dict__)
+        snapshot._prices = new_prices
+        return snapshot
+
+    def price(self, ticker):
+        """
+        Price of an asset (in its own currency).
+
+        Args:
+            ticker (str): Ticker of the asset.
+
+        Returns:
+            (float): Price of the asset.
+        """
+        return float(self._prices[self._ticker_index[ticker]])
+
+    def price_in(self, ticker, currency):
+        """
+        Price of an asset in specified currency.
+
+        Args:
+            ticker (str): Ticker of the asset.
+            currency (str): Currency in which to obtain price of asset.
+
+        Returns:
+            (float): Price of the asset.
+        """
+        i = self._ticker_index[ticker]
+        return float(self._prices[i]) * self.get_rate(self._asset_currencies[i], currency)
+
+
+def _call(deadline, function, *args, share=1.):
+    # calls the function within a share of the time left before the deadline, if any
+    if deadline is None:
+        return function(*args)
+
+    return deadline.run(function, *args, timeout=share * deadline.remaining())
+
+
+def _get_rates(base, currencies):
+    return [Cash.currency_rates.get_rate(base, currency) for currency in currencies]
+
+
+def _cross_rates(base_rates):
+    # base_rates[i] is the rate from the base currency to currency i
+    # so the rate from currency i to currency j is base_rates[j] / base_rates[i]
+    rates = base_rates[np.newaxis, :] / base_rates[:, np.newaxis]
+    np.fill_diagonal(rates, 1.)
+    return rates
+
+
+async def fetch_rates(pairs, max_concurrency=8):
+    """
+    Fetches many exchange rates from ``Cash.currency_rates`` concurrently, without blocking the event loop.
+
+    If the source of the rates has no ``aget_rates`` method (see :meth:`.CachedCurrencyRates.aget_rates`),
+    its ``get_rate`` method is called in the event loop's default executor instead.
+
+    Args:
+        pairs (Sequence[tuple]): ``(from_currency, to_currency)`` pairs of interest.
+        max_concurrency (int, optional): Maximum number of concurrent lookups. Default is 8.
+
+    Returns:
+        Dict[tuple, float]: Exchange rate of each pair. The keys of the dictionary are the (upper-cased) pairs.
+    """
+    import asyncio  # only needed (and imported) when the asynchronous interface is used
+
+    currency_rates = Cash.currency_rates
+    if hasattr(currency_rates, "aget_rates"):
+        return await currency_rates.aget_rates(pairs, max_concurrency)
+
+    keys = list(dict.fromkeys((from_currency.upper(), to_currency.upper()) for from_currency, to_currency in pairs))
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def fetch(key):
+        async with semaphore:
+            return await loop.run_in_executor(None, currency_rates.get_rate, *key)
+
+    return dict(zip(keys, await asyncio.gather(*[fetch(key) for key in keys])))
+
+
+def _collect(portfolios, currencies):
+    # common currency, prices and currencies of the union of the portfolios' assets, and all currencies involved
+    assert len(portfolios) > 0, "at least one portfolio is required."
+    base = portfolios[0]._common_currency.upper()
+    assert all(portfolio._common_currency.upper() == base for portfolio in portfolios), \
+           "portfolios must share the same common currency."
+
+    prices = {}
+    asset_currencies = {}
+    all_currencies = {currency.upper() for currency in currencies}
+    for portfolio in portfolios:
+        holdings = portfolio._holdings
+        for ticker, price, code in zip(holdings.tickers, holdings.prices.tolist(), holdings.currency_codes):
+            if ticker not in prices:
+                prices[ticker] = price
+                asset_currencies[ticker] = holdings.currency_list[code]
+        all_currencies.update(holdings.currency_list)
+        all_currencies.update(portfolio.cash.keys())
+
+    return base, prices, asset_currencies, all_currencies
+
+
+def _apply_quotes(quotes, prices, asset_currencies, all_currencies):
+    for ticker in prices:
+        prices[ticker] = quotes[ticker].price
+        asset_currencies[ticker] = quotes[ticker].currency
+    all_currencies.update(asset_currencies.values())
+
+
+def _ordered_currencies(base, currencies):
+    # the base currency comes first, so its rates are the first row of the matrix
+    currencies = set(currencies)
+    currencies.discard(base)
+    return [base] + sorted(currencies)
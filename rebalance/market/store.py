@@ -0,0 +1,259 @@
+import os
+import sqlite3
+import threading
+import time
+
+from rebalance import instrumentation
+from rebalance.market.quotes import Quote
+from rebalance.market.quotes import QuoteProvider
+from rebalance.market.quotes import _unique
+
+
+class MarketStore:
+    """
+    Persistent store of quotes and exchange rates, kept in a local SQLite database.
+
+    Each quote (price, currency and name of a ticker) and each exchange rate is stored with the time it was fetched,
+    so that it can be reused by later processes as long as it is fresh enough.
+    See :class:`StoredQuoteProvider` and :class:`StoredCurrencyRates`, which read from the store first. For instance::
+
+        store = MarketStore("~/.rebalance.sqlite")
+        Asset.quote_provider = StoredQuoteProvider(YahooQuoteProvider(), store)
+        Cash.currency_rates = CachedCurrencyRates(StoredCurrencyRates(store))
+    """
+    def __init__(self, path, durable=True):
+        """
+        Initialization.
+
+        Args:
+            path (str): Path of the database file (created if it does not exist). A leading ``~`` is expanded to the home directory.
+                ``":memory:"`` keeps the store in memory.
+            durable (bool, optional): If False, writes are never synced to disk. Opening and closing the store is then much faster,
+                but a crash of the operating system may corrupt the file. Meant for throwaway stores, such as in tests. Default is True.
+        """
+        # sqlite does not expand the home directory itself
+        self._path = os.path.expanduser(path)
+        self._lock = threading.Lock()
+        # the store may be used from the executor threads of the asynchronous interfaces
+        self._connection = sqlite3.connect(self._path, check_same_thread=False)
+        with self._lock, self._connection:
+            # in WAL mode, a crash cannot corrupt the store with synchronous=NORMAL; only the last writes may be lost on power failure
+            self._connection.execute("PRAGMA synchronous=%s" % ("NORMAL" if durable else "OFF"))
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS quotes ("
+                "ticker TEXT PRIMARY KEY, price REAL NOT NULL, currency TEXT NOT NULL, name TEXT, "
+                "timestamp REAL NOT NULL)")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS rates ("
+                "from_currency TEXT NOT NULL, to_currency TEXT NOT NULL, rate REAL NOT NULL, "
+                "timestamp REAL NOT NULL, PRIMARY KEY (from_currency, to_currency))")
+
+    @property
+    def path(self):
+        """
+        (str): Path of the database file.
+        """
+        return self._path
+
+    def get_quotes(self, tickers, max_age=None):
+        """
+        Reads stored quotes.
+
+        Args:
+            tickers (Sequence[str]): Tickers of interest.
+            max_age (float, optional): Maximum age (in seconds) of the quotes returned. Default is no limit.
+
+        Returns:
+            Dict[str, Quote]: Stored quotes of the tickers (tickers without a fresh enough quote are omitted).
+        """
+        tickers = _unique(tickers)
+        oldest = -float("inf") if max_age is None else time.time() - max_age
+
+        quotes = {}
+        with self._lock:
+            # query in chunks to stay below SQLite's limit on the number of parameters
+            for start in range(0, len(tickers), 500):
+                chunk = tickers[start:start + 500]
+                rows = self._connection.execute(
+                    "SELECT ticker, price, currency, name FROM quotes "
+                    "WHERE timestamp >= ? AND ticker IN (%s)" % ",".join("?" * len(chunk)),
+                    [oldest] + chunk)
+                for ticker, price, currency, name in rows:
+                    quotes[ticker] = Quote(price, currency, name)
+
+        return quotes
+
+    def put_quotes(self, quotes, timestamp=None):
+        """
+        Stores quotes (replacing the previous quotes of the same tickers).
+
+        Args:
+            quotes (Dict[str, Quote]): Quotes to store. The keys of the dictionary are the tickers.
+            timestamp (float, optional): Time (in seconds since the epoch) at which the quotes were fetched. Default is now.
+        """
+        if timestamp is None:
+            timestamp = time.time()
+
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO quotes VALUES (?, ?, ?, ?, ?)",
+                [(ticker, quote.price, quote.currency, quote.name, timestamp) for ticker, quote in quotes.items()])
+
+    def get_rate(self, from_currency, to_currency, max_age=None):
+        """
+        Reads a stored exchange rate.
+
+        Args:
+            from_currency (str): Currency from which to convert.
+            to_currency (str): Currency to which to convert.
+            max_age (float, optional): Maximum age (in seconds) of the rate returned. Default is no limit.
+
+        Returns:
+            (float): Exchange rate. None if no fresh enough rate is stored.
+        """
+        oldest = -float("inf") if max_age is None else time.time() - max_age
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT rate FROM rates WHERE from_currency = ? AND to_currency = ? AND timestamp >= ?",
+                (from_currency.upper(), to_currency.upper(), oldest)).fetchone()
+
+        return None if row is None else row[0]
+
+    def put_rate(self, from_currency, to_currency, rate, timestamp=None):
+        """
+        Stores an exchange rate (replacing the previous rate of the same pair).
+
+        Args:
+            from_currency (str): Currency from which to convert.
+            to_currency (str): Currency to which to convert.
+            rate (float): Exchange rate.
+            timestamp (float, optional): Time (in seconds since the epoch) at which the rate was fetched. Default is now.
+        """
+        if timestamp is None:
+            timestamp = time.time()
+
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO rates VALUES (?, ?, ?, ?)",
+                (from_currency.upper(), to_currency.upper(), rate, timestamp))
+
+    def clear(self):
+        """
+        Deletes all stored quotes and rates.
+        """
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM quotes")
+            self._connection.execute("DELETE FROM rates")
+
+    def close(self):
+        """
+        Closes the database.
+        """
+        self._connection.close()
+
+
+class StoredQuoteProvider(QuoteProvider):
+    """
+    Serves quotes from a :class:`MarketStore`, and fetches the missing (or outdated) ones from another provider.
+
+    The quotes fetched are written to the store, so later processes can reuse them.
+    If the provider fails (e.g. when offline) and ``serve_stale`` is True, outdated quotes are served instead.
+    """
+    def __init__(self, provider, store, max_age=900., serve_stale=True):
+        """
+        Initialization.
+
+        Args:
+            provider (QuoteProvider): Provider of the quotes missing from the store.
+            store (MarketStore): Store of the quotes.
+            max_age (float, optional): Maximum age (in seconds) of the stored quotes served. Default is 15 minutes.
+            serve_stale (bool, optional): If True, outdated quotes are served when the provider fails. Default is True.
+        """
+        self._provider = provider
+        self._store = store
+        self._max_age = max_age
+        self._serve_stale = serve_stale
+
+    def get_quotes(self, tickers):
+        tickers = _unique(tickers)
+        quotes = self._store.get_quotes(tickers, self._max_age)
+        missing = [ticker for ticker in tickers if ticker not in quotes]
+        instrumentation.count("quote_store_hits", len(quotes))
+        instrumentation.count("quote_store_misses", len(missing))
+        if len(missing) == 0:
+            return quotes
+
+        try:
+            fetched = self._provider.get_quotes(missing)
+        except Exception:
+            stale = self._store.get_quotes(missing) if self._serve_stale else {}
+            if len(stale) < len(missing):
+                raise
+            fetched = stale
+        else:
+            self._store.put_quotes(fetched)
+
+        quotes.update(fetched)
+        return {ticker: quotes[ticker] for ticker in tickers}
+
+
+class StoredCurrencyRates:
+    """
+    Serves exchange rates from a :class:`MarketStore`, and fetches the missing (or outdated) ones from another source.
+
+    The rates fetched are written to the store, so later processes can reuse them.
+    If the source fails (e.g. when offline) and ``serve_stale`` is True, outdated rates are served instead.
+    It is meant to be wrapped in a :class:`.CachedCurrencyRates`, which avoids reading the store more than once per pair.
+    """
+    def __init__(self, store, rates=None, max_age=3600., serve_stale=True):
+        """
+        Initialization.
+
+        Args:
+            store (MarketStore): Store of the rates.
+            rates (optional): Source of the rates missing from the store. Must implement ``get_rate(from_currency, to_currency)``.
+                Default is forex_python's ``CurrencyRates``, created when first needed.
+            max_age (float, optional): Maximum age (in seconds) of the stored rates served. Default is one hour.
+            serve_stale (bool, optional): If True, outdated rates are served when the source fails. Default is True.
+        """
+        self._store = store
+        self._rates = rates
+        self._max_age = max_age
+        self._serve_stale = serve_stale
+
+    def get_rate(self, from_currency, to_currency):
+        """
+        Obtain the exchange rate from one currency to another.
+
+        Args:
+            from_currency (str): Currency from which to convert.
+            to_currency (str): Currency to which to convert.
+
+        Returns:
+            (float): exchange rate.
+        """
+        if from_currency.upper() == to_currency.upper():
+            return 1.0
+
+        rate = self._store.get_rate(from_currency, to_currency, self._max_age)
+        if rate is not None:
+            instrumentation.count("fx_store_hits")
+            return rate
+
+        instrumentation.count("fx_store_misses")
+
+        if self._rates is None:
+            from forex_python.converter import CurrencyRates
+            self._rates = CurrencyRates()
+
+        try:
+            rate = self._rates.get_rate(from_currency.upper(), to_currency.upper())
+        except Exception:
+            rate = self._store.get_rate(from_currency, to_currency) if self._serve_stale else None
+            if rate is None:
+                raise
+        else:
+            self._store.put_rate(from_currency, to_currency, rate)
+
+        return rate
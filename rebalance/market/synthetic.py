@@ -0,0 +1,150 @@
+import zlib
+
+import numpy as np
+
+from rebalance.market.history import PriceHistory
+from rebalance.market.quotes import Quote
+from rebalance.market.quotes import QuoteProvider
+
+
+_CURRENCIES = ("CAD", "USD", "EUR", "GBP", "JPY", "CHF", "AUD", "NZD", "SEK", "HKD")
+
+
+def _uniform(key, seed):
+    # deterministic number in [0, 1), stable across processes (unlike hash())
+    return zlib.crc32(("%d:%s" % (seed, key)).encode()) / 2.**32
+
+
+class SyntheticQuoteProvider(QuoteProvider):
+    """
+    Serves deterministic, made-up quotes for any ticker. No network access is ever made.
+
+    The price and currency of a ticker only depend on the ticker and the seed, so they are the same in every process.
+    Useful for benchmarks and tests.
+    """
+    def __init__(self, currencies=("CAD", "USD"), seed=0, min_price=5., max_price=500.):
+        """
+        Initialization.
+
+        Args:
+            currencies (Sequence[str], optional): Currencies of the assets. Default is CAD and USD.
+            seed (int, optional): Seed of the quotes. Default is 0.
+            min_price (float, optional): Lowest price. Default is 5.
+            max_price (float, optional): Highest price. Default is 500.
+        """
+        assert len(currencies) > 0, "at least one currency is required."
+        assert 0. < min_price <= max_price, "prices must be positive."
+
+        self._currencies = [currency.upper() for currency in currencies]
+        self._seed = seed
+        self._min_price = min_price
+        self._max_price = max_price
+
+    def get_quotes(self, tickers):
+        quotes = {}
+        for ticker in tickers:
+            u = _uniform(ticker, self._seed)
+            price = round(self._min_price + (self._max_price - self._min_price) * u, 2)
+            currency = self._currencies[int(_uniform(ticker, self._seed + 1) * len(self._currencies))]
+            quotes[ticker] = Quote(price, currency, None)
+
+        return quotes
+
+
+class SyntheticCurrencyRates:
+    """
+    Serves deterministic, made-up exchange rates. No network access is ever made.
+
+    Each currency is given a value (in an imaginary reference currency) depending only on the currency and the seed,
+    and the rate between two currencies is the ratio of their values, so the rates are consistent with each other.
+    Can be used as the source of a :class:`.CachedCurrencyRates`.
+    """
+    def __init__(self, seed=0):
+        """
+        Initialization.
+
+        Args:
+            seed (int, optional): Seed of the rates. Default is 0.
+        """
+        self._seed = seed
+
+    @staticmethod
+    def currencies(nb_currencies):
+        """
+        Codes of the first ``nb_currencies`` major currencies (at most 10), starting with CAD.
+
+        Args:
+            nb_currencies (int): Number of currencies.
+
+        Returns:
+            List[str]: Currency codes.
+        """
+        assert 0 < nb_currencies <= len(_CURRENCIES), \
+               "between 1 and %d currencies are available." % len(_CURRENCIES)
+        return list(_CURRENCIES[:nb_currencies])
+
+    def value(self, currency):
+        """
+        Value of a currency in the reference currency.
+
+        Args:
+            currency (str): Currency of interest.
+
+        Returns:
+            (float): Value of the currency.
+        """
+        return 0.5 + 1.5 * _uniform(currency.upper(), self._seed)
+
+    def get_rate(self, from_currency, to_currency):
+        """
+        Obtain the exchange rate from one currency to another.
+
+        Args:
+            from_currency (str): Currency from which to convert.
+            to_currency (str): Currency to which to convert.
+
+        Returns:
+            (float): exchange rate.
+        """
+        if from_currency.upper() == to_currency.upper():
+            return 1.0
+
+        return self.value(from_currency) / self.value(to_currency)
+
+
+def synthetic_history(tickers, nb_dates, start="2000-01-03", currencies=("CAD", "USD"), seed=0, volatility=0.01):
+    """
+    Made-up daily price history of many assets, and of the exchange rates of their currencies.
+
+    Each series is a geometric random walk: the prices start at the quotes of :class:`SyntheticQuoteProvider`,
+    and the rates at those of :class:`SyntheticCurrencyRates`. The series of a ticker (or currency) only depends on
+    the ticker (or currency) and the seed, so it is the same in every process and whatever the other tickers are.
+
+    Args:
+        tickers (Sequence[str]): Tickers of the assets.
+        nb_dates (int): Number of dates. One per weekday.
+        start (str, optional): First date. Default is "2000-01-03".
+        currencies (Sequence[str], optional): Currencies of the assets. The first one is the base currency. Default is CAD and USD.
+        seed (int, optional): Seed of the history. Default is 0.
+        volatility (float, optional): Standard deviation of the daily log-returns of the prices (the rates move half as much). Default is 0.01.
+
+    Returns:
+        PriceHistory: The history.
+    """
+    currencies = [currency.upper() for currency in currencies]
+    quotes = SyntheticQuoteProvider(currencies, seed).get_quotes(tickers)
+    rates = SyntheticCurrencyRates(seed)
+
+    def random_walk(key, start_value, scale):
+        rng = np.random.default_rng(zlib.crc32(("%d:%s" % (seed, key)).encode()))
+        steps = rng.normal(0., scale, nb_dates)
+        steps[0] = 0.
+        return start_value * np.exp(np.cumsum(steps))
+
+    prices = np.column_stack([random_walk(ticker, quotes[ticker].price, volatility) for ticker in tickers])
+    base_rates = np.column_stack([random_walk(currency, rates.get_rate(currency, currencies[0]), volatility / 2.)
+                                  if i > 0 else np.ones(nb_dates) for i, currency in enumerate(currencies)])
+    dates = np.busday_offset(np.datetime64(start, "D"), np.arange(nb_dates), roll="forward")
+
+    return PriceHistory(dates, tickers, prices.reshape(nb_dates, len(tickers)),
+                        [quotes[ticker].currency for ticker in tickers], currencies, base_rates)
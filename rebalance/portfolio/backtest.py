@@ -0,0 +1,176 @@
+from collections import namedtuple
+
+import numpy as np
+
+from rebalance import instrumentation
+from rebalance.portfolio import share_allocation
+from rebalance.portfolio import solvers
+
+
+BacktestResult = namedtuple("BacktestResult", ["values", "units", "cash", "nb_rebalances",
+                                               "turnover", "drift", "max_drift", "cash_drag"])
+BacktestResult.__doc__ = """
+Outcome of :func:`backtest`. All values are in the base currency of the price history.
+
+Attributes:
+    values (np.ndarray): Value of each portfolio at the end of each date. One row per date, one column per portfolio.
+    units (np.ndarray): Units of each asset held by each portfolio at the end of the history. One row per portfolio.
+    cash (np.ndarray): Cash of each portfolio at the end of the history.
+    nb_rebalances (np.ndarray): Number of rebalancings of each portfolio.
+    turnover (np.ndarray): Value traded (bought and sold) by each portfolio, relative to its average value.
+    drift (np.ndarray): Average (over the dates) of the largest difference between the asset allocation and the target allocation (in %), before rebalancing.
+    max_drift (np.ndarray): Largest difference between the asset allocation and the target allocation (in %) of each portfolio, before rebalancing.
+    cash_drag (np.ndarray): Average (over the dates) share of each portfolio held in cash (in %), after rebalancing.
+"""
+
+
+# largest number of (date, portfolio, asset) entries processed at once
+_MAX_BLOCK_ENTRIES = 1 << 22
+
+
+def backtest(history, quantities, cash, target_allocation, contributions=None, every=None, threshold=None,
+             selling_allowed=False, integer_allocation="greedy"):
+    """
+    Simulates rebalancing policies over a price history, for many portfolios at once.
+
+    The portfolios hold the assets of ``history`` (in the same order) and their cash in its base currency.
+    On each date, the contributions are added to the cash, then each portfolio whose policy is due is rebalanced
+    with the same logic as :meth:`.Portfolio.rebalance` (exact solvers and whole units): calendar rebalancing every ``every`` dates,
+    and/or threshold rebalancing whenever the allocation drifts from the target by more than ``threshold`` %.
+    If neither is specified, the portfolios are never rebalanced (buy and hold).
+
+    Between rebalancings, the dates are processed in blocks with vectorized operations over the dates, the portfolios and the assets.
+
+    Args:
+        history (PriceHistory): Prices and exchange rates.
+        quantities (np.ndarray): Initial units of each asset, one row per portfolio.
+        cash (np.ndarray): Initial cash of each portfolio (in the base currency).
+        target_allocation (np.ndarray): Target asset allocation (in %), either shared by all portfolios or one row per portfolio.
+        contributions (np.ndarray, optional): Cash added to the portfolios (negative for withdrawals) on each date (in the base currency).
+            Either one value per date, or one row per date and one column per portfolio. Default is no contribution.
+        every (int, optional): Calendar policy: the portfolios are rebalanced on the first date and then every ``every`` dates.
+        threshold (float or np.ndarray, optional): Threshold policy: largest difference (in %) between the asset allocation and the target allocation
+            tolerated before rebalancing. Either shared by all portfolios, or one per portfolio.
+        selling_allowed (bool, optional): Flag indicating if selling of assets is allowed when rebalancing. Default is False.
+        integer_allocation (str, optional): How the solution is turned into whole units: "greedy" (default) or "floor". See :func:`.rebalancing_helper.rebalance`.
+
+    Returns:
+        BacktestResult: Values over time, final state and statistics of each portfolio.
+    """
+    prices = history.base_prices()
+    nb_dates, nb_assets = prices.shape
+
+    units = np.array(quantities, dtype=np.int64).reshape(-1, nb_assets)
+    nb_portfolios = len(units)
+    cash = np.array(cash, dtype=float).reshape(nb_portfolios)
+    targets = np.broadcast_to(np.asarray(target_allocation, dtype=float), (nb_portfolios, nb_assets))
+    assert np.all(np.abs(np.sum(targets, axis=1) - 100.) <= 1E-2), "target allocation must sum up to 100%."
+    assert every is None or every > 0, "every must be positive."
+    assert integer_allocation in ("greedy", "floor"), "Unknown integer allocation option '%s'." % integer_allocation
+
+    if contributions is None:
+        contributions = np.zeros((nb_dates, 1))
+    contributions = np.asarray(contributions, dtype=float)
+    if contributions.ndim == 1:
+        contributions = contributions[:, np.newaxis]
+    contributions = np.broadcast_to(contributions, (nb_dates, nb_portfolios))
+    if threshold is None:
+        threshold = np.inf
+    threshold = np.broadcast_to(np.asarray(threshold, dtype=float), (nb_portfolios,))
+
+    values = np.empty((nb_dates, nb_portfolios))
+    nb_rebalances = np.zeros(nb_portfolios, dtype=np.int64)
+    traded = np.zeros(nb_portfolios)
+    drift = np.zeros(nb_portfolios)
+    max_drift = np.zeros(nb_portfolios)
+    cash_weights = np.zeros(nb_portfolios)
+
+    max_block = max(1, _MAX_BLOCK_ENTRIES // max(1, nb_portfolios * nb_assets))
+    block = min(64, max_block)
+    t = 0
+    with instrumentation.span("backtest"):
+        while t < nb_dates:
+            end = min(nb_dates, t + block)
+            block_cash = cash + np.cumsum(contributions[t:end], axis=0)
+            block_values = units[np.newaxis, :, :] * prices[t:end, np.newaxis, :]
+            totals = np.sum(block_values, axis=2) + block_cash
+            positive = totals > 0.
+            allocations = 100. * block_values / np.where(positive, totals, 1.)[:, :, np.newaxis]
+            deviations = np.where(positive, np.max(np.abs(allocations - targets), axis=2), 0.)
+
+            due = positive & (deviations > threshold)
+            if every is not None:
+                due |= positive & (np.arange(t, end) % every == 0)[:, np.newaxis]
+            due_dates = np.nonzero(np.any(due, axis=1))[0]
+            # the dates before the first rebalancing are final
+            nb_final = len(due) if len(due_dates) == 0 else due_dates[0] + 1
+
+            values[t:t + nb_final] = totals[:nb_final]
+            drift += np.sum(deviations[:nb_final], axis=0)
+            max_drift = np.maximum(max_drift, np.max(deviations[:nb_final], axis=0))
+            cash_weights += np.sum(np.where(positive, block_cash / np.where(positive, totals, 1.), 0.)[:nb_final], axis=0)
+            # a copy: the rebalancings below must not change the cash of the block
+            cash = block_cash[nb_final - 1].copy()
+
+            if len(due_dates) > 0:
+                rows = np.nonzero(due[nb_final - 1])[0]
+                date_prices = prices[t + nb_final - 1]
+                new_units = _rebalance_rows(units[rows], cash[rows], date_prices, targets[rows],
+                                            selling_allowed, integer_allocation)
+                trades = (new_units - units[rows]) * date_prices
+                traded[rows] += np.sum(np.abs(trades), axis=1)
+                cash[rows] -= np.sum(trades, axis=1)
+                units[rows] = new_units
+                nb_rebalances[rows] += 1
+
+                # the cash weight of the date is the one after rebalancing
+                total = totals[nb_final - 1, rows]
+                cash_weights[rows] += (cash[rows] - block_cash[nb_final - 1, rows]) / total
+                # shorter blocks when rebalancings are frequent, longer ones when they are not
+                block = min(max_block, max(1, 2 * nb_final))
+            else:
+                block = min(max_block, 2 * block)
+
+            t += nb_final
+
+    average_values = np.mean(values, axis=0)
+    return BacktestResult(values, units, cash, nb_rebalances,
+                          traded / np.where(average_values > 0., average_values, 1.),
+                          drift / nb_dates, max_drift, 100. * cash_weights / nb_dates)
+
+
+def _rebalance_rows(units, cash, prices, targets, selling_allowed, integer_allocation):
+    """
+    Rebalances many portfolios holding the same assets, as :func:`.rebalancing_helper.rebalance` does for one.
+
+    Args:
+        units (np.ndarray): Units of each asset, one row per portfolio.
+        cash (np.ndarray): Cash of each portfolio.
+        prices (np.ndarray): Price of each asset (in the same currency as ``cash``).
+        targets (np.ndarray): Target asset allocation (in %), one row per portfolio.
+        selling_allowed (bool): Flag indicating if selling of assets is allowed.
+        integer_allocation (str): "greedy" or "floor".
+
+    Returns:
+        np.ndarray: Units of each asset held after rebalancing, one row per portfolio.
+    """
+    current_values = units * prices
+    total_values = np.sum(current_values, axis=1) + cash
+    fractions = targets / 100.
+    fractions = fractions / np.sum(fractions, axis=1, keepdims=True)
+
+    if selling_allowed:
+        # everything is sold, then the total value is split according to the target allocation
+        to_buy = fractions * total_values[:, np.newaxis]
+        new_units = np.floor((to_buy - current_values) / prices).astype(np.int64)
+    else:
+        to_buy = solvers.project_simplex_rows(fractions * total_values[:, np.newaxis] - current_values, cash)
+        new_units = np.floor(to_buy / prices).astype(np.int64)
+
+    if integer_allocation == "greedy":
+        target_values = targets / np.sum(targets, axis=1, keepdims=True) * total_values[:, np.newaxis]
+        shortfalls = target_values - (units + new_units) * prices
+        leftover_cash = cash - np.sum(new_units * prices, axis=1)
+        new_units = share_allocation.greedy_units_rows(new_units, prices, shortfalls, leftover_cash)
+
+    return units + new_units
@@ -0,0 +1,153 @@
+import multiprocessing
+import os
+import time
+from collections import namedtuple
+
+from rebalance import instrumentation
+from rebalance.deadline import Deadline, DeadlineExceeded
+from rebalance.instrumentation import Tracer
+from rebalance.market.snapshot import MarketSnapshot
+
+
+BatchResult = namedtuple("BatchResult", ["results", "timings"])
+BatchResult.__doc__ = """
+Outcome of :func:`rebalance_many`.
+
+Attributes:
+    results (List[tuple]): Result of :meth:`.Portfolio.rebalance` for each portfolio, in the same order as the portfolios.
+    timings (Dict[str, float]): Wall time (in seconds) of the "snapshot" capture, of the "solve" of all portfolios, and "total".
+"""
+
+
+# state shared by all the rebalancings of a worker process
+_worker_snapshot = None
+_worker_options = None
+_worker_deadline = None
+
+
+def _init_worker(snapshot, options, deadline):
+    global _worker_snapshot, _worker_options, _worker_deadline
+    _worker_snapshot = snapshot
+    _worker_options = options
+    _worker_deadline = deadline
+
+
+def _rebalance_one(task):
+    portfolio, target_allocation = task
+    result = portfolio.rebalance(target_allocation, snapshot=_worker_snapshot,
+                                 **_options_within(_worker_options, _worker_deadline))
+    return result, portfolio
+
+
+def _options_within(options, deadline):
+    # the time left in the batch's budget is the budget of the next rebalancing
+    if deadline is None:
+        return options
+
+    return dict(options, time_budget=deadline.remaining())
+
+
+def rebalance_many(portfolios, targets, processes=None, chunksize=64, snapshot=None,
+                   refresh_quotes=False, tracer=None, **options):
+    """
+    Rebalances many portfolios, sharing one :class:`.MarketSnapshot` between them.
+
+    The snapshot covers the union of the portfolios' assets and currencies, so each quote and exchange rate is fetched once for the whole batch.
+    The rebalancings are then spread over a pool of processes. The portfolios are rebalanced in place, as with :meth:`.Portfolio.rebalance`.
+
+    Args:
+        portfolios (Sequence[:class:`.Portfolio`]): Portfolios to rebalance.
+        targets (Dict[str, float] or Sequence[Dict[str, float]]): Target asset allocation (in %) of each portfolio, in the same order as ``portfolios``.
+            A single dictionary is used as the target of every portfolio.
+        processes (int, optional): Number of worker processes. If 1, the portfolios are rebalanced in the current process. Default is the number of CPUs.
+        chunksize (int, optional): Number of portfolios sent to a worker at a time. Default is 64.
+        snapshot (MarketSnapshot, optional): Snapshot of the market to use. Default is a snapshot captured with :meth:`.MarketSnapshot.capture_many`.
+        refresh_quotes (bool, optional): If True, the prices of all assets are fetched again (in one request) when capturing the snapshot. Default is False.
+        tracer (Tracer, optional): If specified, receives the spans and counters of the whole batch.
+            The metrics of rebalancings run in worker processes are merged into ``tracer.metrics`` (its hooks are not called for them).
+        **options: Other keyword arguments of :meth:`.Portfolio.rebalance` (e.g. ``solver``), used for every portfolio.
+            With ``tolerance``, the portfolios within their tolerance bands are checked and answered in the current process,
+            so only the portfolios which need rebalancing are sent to the worker processes.
+            A ``cache`` (see :class:`.SolutionCache`) is shared by the portfolios rebalanced in the current process,
+            while each worker process fills its own copy.
+            ``time_budget`` is the budget of the whole batch: the snapshot is captured within it (if the quotes cannot be refreshed in time,
+            the prices held by the portfolios are used and every result is flagged as ``approximate``),
+            and each rebalancing gets the time left when it starts.
+
+    Returns:
+        BatchResult: Result of each rebalancing and aggregate timings.
+    """
+    start = time.perf_counter()
+    portfolios = list(portfolios)
+    if isinstance(targets, dict):
+        targets = [targets] * len(portfolios)
+    else:
+        targets = list(targets)
+
+    assert len(portfolios) == len(targets), \
+           "`portfolios` and `targets` must be of the same length."
+    assert "verbose" not in options, "verbose is not supported when rebalancing many portfolios."
+
+    timings = {"snapshot": 0., "solve": 0., "total": 0.}
+    if len(portfolios) == 0:
+        return BatchResult([], timings)
+
+    time_budget = options.pop("time_budget", None)
+    deadline = None if time_budget is None else Deadline(time_budget)
+
+    with instrumentation.tracing(tracer):
+        if snapshot is None:
+            try:
+                snapshot = MarketSnapshot.capture_many(portfolios, refresh_quotes=refresh_quotes, deadline=deadline)
+            except DeadlineExceeded:
+                # no time is left: each portfolio is answered without trades
+                deadline.mark("snapshot")
+                instrumentation.count("deadline_exceeded")
+                processes = 1
+        timings["snapshot"] = time.perf_counter() - start
+
+        if processes is None:
+            processes = os.cpu_count() or 1
+        processes = min(processes, len(portfolios))
+
+        solve_start = time.perf_counter()
+        results = [None] * len(portfolios)
+        if processes == 1:
+            for i, (portfolio, target_allocation) in enumerate(zip(portfolios, targets)):
+                results[i] = portfolio.rebalance(target_allocation, snapshot=snapshot, tracer=tracer,
+                                                 **_options_within(options, deadline))
+        else:
+            # portfolios within their tolerance bands are answered here: only the others are sent to the workers
+            pending = list(range(len(portfolios)))
+            tolerance = options.get("tolerance")
+            if tolerance is not None:
+                with instrumentation.span("drift_check"):
+                    in_band = [i for i in pending
+                               if tolerance.check(portfolios[i], targets[i], snapshot).in_band]
+                for i in in_band:
+                    results[i] = portfolios[i].rebalance(targets[i], snapshot=snapshot, tracer=tracer,
+                                                         **_options_within(options, deadline))
+                pending = [i for i in pending if results[i] is None]
+
+            if len(pending) > 0:
+                # the workers record the metrics of each rebalancing, which are then merged here
+                worker_options = dict(options, tracer=None if tracer is None else Tracer())
+                with multiprocessing.Pool(min(processes, len(pending)), initializer=_init_worker,
+                                          initargs=(snapshot, worker_options, deadline)) as pool:
+                    outcomes = pool.imap(_rebalance_one, [(portfolios[i], targets[i]) for i in pending], chunksize)
+                    for i, (result, rebalanced_portfolio) in zip(pending, outcomes):
+                        # commit the rebalanced state computed by the worker
+                        portfolios[i].__dict__.update(rebalanced_portfolio.__dict__)
+                        if tracer is not None:
+                            tracer.metrics.merge(result.metrics)
+                        results[i] = result
+
+        if deadline is not None and "quotes" in deadline.exceeded:
+            for result in results:
+                result.approximate = True
+
+    end = time.perf_counter()
+    timings["solve"] = end - solve_start
+    timings["total"] = end - start
+
+    return BatchResult(results, timings)
@@ -0,0 +1,106 @@
+from collections import namedtuple
+
+import numpy as np
+
+
+DriftCheck = namedtuple("DriftCheck", ["in_band", "breached", "deviations"])
+DriftCheck.__doc__ = """
+Outcome of :meth:`ToleranceBands.check`.
+
+Attributes:
+    in_band (bool): True if no asset breached its tolerance bands.
+    breached (List[str]): Tickers of the assets which breached their tolerance bands.
+    deviations (Dict[str, float]): Allocation minus target allocation of each asset (in %). The keys of the dictionary are the tickers of the assets.
+"""
+
+
+class ToleranceBands:
+    """
+    Tolerance bands around the target allocation of each asset.
+
+    An asset breaches its bands when its allocation differs from its target allocation by more than ``absolute`` percentage points,
+    or by more than ``relative`` times its target allocation (e.g. the "5/25" rule is ``ToleranceBands(absolute=5., relative=0.25)``).
+    The allocations are relative to the total value of the portfolio, cash included, so uninvested cash counts as drift.
+    """
+    def __init__(self, absolute=None, relative=None):
+        """
+        Initialization.
+
+        Args:
+            absolute (float or Dict[str, float], optional): Absolute band (in percentage points), either shared by all assets or per asset
+                (the keys of the dictionary are the tickers; assets which are not specified have no absolute band).
+            relative (float or Dict[str, float], optional): Relative band (as a fraction of the target allocation), either shared by all assets or per asset.
+        """
+        assert absolute is not None or relative is not None, "at least one band must be specified."
+
+        self._absolute = absolute
+        self._relative = relative
+
+    @property
+    def absolute(self):
+        """
+        (float or Dict[str, float]): Absolute band (in percentage points).
+        """
+        return self._absolute
+
+    @property
+    def relative(self):
+        """
+        (float or Dict[str, float]): Relative band (as a fraction of the target allocation).
+        """
+        return self._relative
+
+    def widths(self, tickers, target_allocation):
+        """
+        Half-width of the band of each asset: the largest deviation from its target allocation which is tolerated.
+
+        Args:
+            tickers (Sequence[str]): Tickers of the assets.
+            target_allocation (np.ndarray): Target allocation of each asset (in %), in the same order as ``tickers``.
+
+        Returns:
+            (np.ndarray): Width of the band of each asset (in percentage points). Infinite if the asset has no band.
+        """
+        return np.minimum(_per_asset(self._absolute, tickers),
+                          _per_asset(self._relative, tickers) * np.asarray(target_allocation, dtype=float))
+
+    def check(self, portfolio, target_allocation, snapshot=None):
+        """
+        Checks whether a portfolio's asset allocation is within the bands.
+
+        Args:
+            portfolio (:class:`.Portfolio`): Portfolio of interest.
+            target_allocation (Dict[str, float]): Target asset allocation of the portfolio (in %). The keys of the dictionary are the tickers of the assets.
+            snapshot (MarketSnapshot, optional): If specified, the assets are valued at its prices and exchange rates.
+
+        Returns:
+            DriftCheck: Which assets breached their bands, and the deviation of each asset.
+        """
+        holdings = portfolio._holdings
+        tickers = holdings.tickers
+        try:
+            targets = np.array([target_allocation[ticker] for ticker in tickers], dtype=float)
+        except KeyError:
+            raise Exception("'target_allocation not compatible with the assets of the portfolio.")
+
+        currency = portfolio._common_currency
+        prices = holdings.prices if snapshot is None else snapshot.prices_of(tickers)
+        market_values = holdings.quantities * prices * holdings.fx_to(currency, snapshot)
+        total_value = np.sum(market_values) + portfolio.cash_value(currency, snapshot)
+        allocation = market_values / max(1., total_value) * 100.
+
+        deviations = allocation - targets
+        breached = np.abs(deviations) > self.widths(tickers, targets)
+        return DriftCheck(not np.any(breached),
+                          [ticker for ticker, flag in zip(tickers, breached.tolist()) if flag],
+                          dict(zip(tickers, deviations.tolist())))
+
+
+def _per_asset(band, tickers):
+    # band of each asset, infinite where there is none
+    if band is None:
+        return np.full(len(tickers), np.inf)
+    if isinstance(band, dict):
+        return np.array([band.get(ticker, np.inf) for ticker in tickers], dtype=float)
+
+    return np.full(len(tickers), float(band))
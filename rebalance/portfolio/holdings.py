@@ -0,0 +1,310 @@
+import numpy as np
+
+from rebalance import Asset
+from rebalance import Cash
+from rebalance import Price
+
+
+class Holdings:
+    """
+    Columnar store of a portfolio's assets.
+
+    Holds one entry per asset in parallel arrays: tickers, quantities (int64), prices (float64, in the asset's own currency)
+    and currency codes (indices into :attr:`currency_list`). Valuations are computed with vectorized NumPy expressions.
+    """
+    def __init__(self):
+        """
+        Initialization.
+        """
+        self._tickers = []
+        self._index = {}
+        self._names = []
+        self._quantities = np.zeros(0, dtype=np.int64)
+        self._prices = np.zeros(0, dtype=float)
+        self._currency_list = []
+        self._currency_codes = np.zeros(0, dtype=np.intp)
+        self._views = None
+        self._shared = False
+
+    @classmethod
+    def from_columns(cls, tickers, quantities, prices, currency_list, currency_codes, names=None):
+        """
+        Creates holdings directly from their columns (no validation, no copy of the arrays).
+
+        Args:
+            tickers (List[str]): Tickers of the assets (distinct).
+            quantities (np.ndarray): Number of units of each asset (int64).
+            prices (np.ndarray): Price of each asset (in asset's own currency).
+            currency_list (List[str]): Distinct currencies of the assets.
+            currency_codes (np.ndarray): Currency of each asset, as an index into ``currency_list``.
+            names (List[str], optional): Display name of each asset.
+
+        Returns:
+            Holdings: The holdings.
+        """
+        holdings = cls.__new__(cls)
+        holdings._tickers = tickers
+        holdings._index = {ticker: i for i, ticker in enumerate(tickers)}
+        holdings._names = [None] * len(tickers) if names is None else names
+        holdings._quantities = quantities
+        holdings._prices = prices
+        holdings._currency_list = currency_list
+        holdings._currency_codes = currency_codes
+        holdings._views = None
+        holdings._shared = False
+        return holdings
+
+    def __len__(self):
+        return len(self._tickers)
+
+    def __contains__(self, ticker):
+        return ticker in self._index
+
+    @property
+    def tickers(self):
+        """
+        (List[str]): Tickers of the assets.
+        """
+        return self._tickers
+
+    @property
+    def quantities(self):
+        """
+        (np.ndarray): Number of units of each asset.
+        """
+        return self._quantities
+
+    @quantities.setter
+    def quantities(self, quantities):
+        self._quantities[:] = quantities
+
+    @property
+    def prices(self):
+        """
+        (np.ndarray): Price of each asset (in asset's own currency).
+        """
+        return self._prices
+
+    @prices.setter
+    def prices(self, prices):
+        self._prices[:] = prices
+
+    @property
+    def currency_list(self):
+        """
+        (List[str]): Distinct currencies of the assets.
+        """
+        return self._currency_list
+
+    @property
+    def currency_codes(self):
+        """
+        (np.ndarray): Currency of each asset, as an index into :attr:`currency_list`.
+        """
+        return self._currency_codes
+
+    def index(self, ticker):
+        """
+        Position of an asset in the arrays.
+
+        Args:
+            ticker (str): Ticker of the asset.
+
+        Returns:
+            int: Position of the asset.
+        """
+        return self._index[ticker]
+
+    def currency(self, i):
+        """
+        Currency of the asset at position ``i``.
+        """
+        return self._currency_list[self._currency_codes[i]]
+
+    def name(self, i):
+        """
+        Display name of the asset at position ``i`` (None if unknown).
+        """
+        return self._names[i]
+
+    def copy(self):
+        """
+        Makes a copy of the holdings. The arrays are copied; the tickers and names are shared until either copy adds assets.
+
+        Returns:
+            Holdings: Copy of the holdings.
+        """
+        holdings = Holdings.__new__(Holdings)
+        holdings._tickers = self._tickers
+        holdings._index = self._index
+        holdings._names = self._names
+        holdings._quantities = self._quantities.copy()
+        holdings._prices = self._prices.copy()
+        holdings._currency_list = self._currency_list
+        holdings._currency_codes = self._currency_codes.copy()
+        holdings._views = None
+        holdings._shared = True
+        self._shared = True
+        return holdings
+
+    def extend(self, tickers, quantities, prices, currencies, names=None):
+        """
+        Adds many assets at once. An asset already held is replaced, and so is an asset given more than once (the last one is kept).
+
+        Args:
+            tickers (Sequence[str]): Tickers of the assets.
+            quantities (Sequence[int]): Number of units of each asset.
+            prices (Sequence[float]): Price of each asset (in asset's own currency).
+            currencies (Sequence[str]): Currency of each asset.
+            names (Sequence[str], optional): Display name of each asset.
+        """
+        if names is None:
+            names = [None] * len(tickers)
+
+        if self._shared:
+            # copy on write of the structure shared with another copy
+            self._tickers = list(self._tickers)
+            self._index = dict(self._index)
+            self._names = list(self._names)
+            self._currency_list = list(self._currency_list)
+            self._shared = False
+
+        codes = []
+        for currency in currencies:
+            currency = currency.upper()
+            if currency not in self._currency_list:
+                self._currency_list.append(currency)
+            codes.append(self._currency_list.index(currency))
+
+        # a ticker given more than once keeps its first position and its last values
+        last_rows = {}
+        for row, ticker in enumerate(tickers):
+            last_rows[ticker] = row
+
+        new_rows = []
+        for ticker, row in last_rows.items():
+            if ticker in self._index:
+                i = self._index[ticker]
+                self._quantities[i] = quantities[row]
+                self._prices[i] = prices[row]
+                self._currency_codes[i] = codes[row]
+                self._names[i] = names[row]
+            else:
+                self._index[ticker] = len(self._tickers)
+                self._tickers.append(ticker)
+                self._names.append(names[row])
+                new_rows.append(row)
+
+        self._quantities = np.concatenate(
+            (self._quantities, np.asarray(quantities, dtype=np.int64)[new_rows]))
+        self._prices = np.concatenate(
+            (self._prices, np.asarray(prices, dtype=float)[new_rows]))
+        self._currency_codes = np.concatenate(
+            (self._currency_codes, np.asarray(codes, dtype=np.intp)[new_rows]))
+        self._views = None
+
+    def fx_to(self, currency, snapshot=None):
+        """
+        Exchange rate from each asset's currency to the specified currency.
+
+        Only one rate lookup per distinct currency is made.
+
+        Args:
+            currency (str): Currency to which to convert.
+            snapshot (MarketSnapshot, optional): If specified, the exchange rates are taken from it instead of ``Cash.currency_rates``.
+
+        Returns:
+            (np.ndarray): Exchange rate of each asset.
+        """
+        rates = Cash.currency_rates if snapshot is None else snapshot
+        currency = currency.upper()
+        fx = np.array([rates.get_rate(asset_currency, currency)
+                       for asset_currency in self._currency_list], dtype=float)
+
+        return fx[self._currency_codes] if len(fx) > 0 else np.zeros(0)
+
+    def prices_in(self, currency, snapshot=None):
+        """
+        Price of each asset in the specified currency.
+
+        Args:
+            currency (str): Currency in which to obtain the prices.
+            snapshot (MarketSnapshot, optional): If specified, the exchange rates are taken from it.
+
+        Returns:
+            (np.ndarray): Price of each asset.
+        """
+        return self._prices * self.fx_to(currency, snapshot)
+
+    def market_values_in(self, currency, snapshot=None):
+        """
+        Market value of each asset in the specified currency.
+
+        Args:
+            currency (str): Currency in which to obtain the market values.
+            snapshot (MarketSnapshot, optional): If specified, the exchange rates are taken from it.
+
+        Returns:
+            (np.ndarray): Market value of each asset.
+        """
+        return self._quantities * self.prices_in(currency, snapshot)
+
+    def values_per_currency(self, values):
+        """
+        Sums values (expressed in the assets' own currencies) per currency.
+
+        Args:
+            values (np.ndarray): One value per asset (e.g. market value or cost), in the asset's own currency.
+
+        Returns:
+            Dict[str, float]: Sum of the values per currency. The keys of the dictionary are the currencies.
+        """
+        sums = np.bincount(self._currency_codes, weights=values,
+                           minlength=len(self._currency_list))
+        return {currency: float(total) for currency, total in zip(self._currency_list, sums)}
+
+    def views(self):
+        """
+        Dictionary view of the holdings. Views are built lazily and write through to the arrays.
+
+        Returns:
+            Dict[str, Asset]: The keys of the dictionary are the tickers of the assets.
+        """
+        if self._views is None:
+            self._views = {ticker: _AssetView(self, i) for i, ticker in enumerate(self._tickers)}
+
+        return self._views
+
+
+class _AssetView(Asset):
+    """
+    :class:`.Asset` backed by one entry of :class:`Holdings`.
+    """
+    def __init__(self, holdings, index):
+        self._holdings = holdings
+        self._index = index
+
+    @property
+    def _ticker(self):
+        return self._holdings.tickers[self._index]
+
+    @property
+    def _name(self):
+        return self._holdings.name(self._index)
+
+    @property
+    def _quantity(self):
+        return int(self._holdings.quantities[self._index])
+
+    @_quantity.setter
+    def _quantity(self, quantity):
+        self._holdings.quantities[self._index] = quantity
+
+    @property
+    def is_priced(self):
+        return True
+
+    @property
+    def _price(self):
+        return Price(float(self._holdings.prices[self._index]),
+                     self._holdings.currency(self._index))
@@ -1,14 +1,36 @@
-import copy
-import math
-from typing import Sequence
+from collections import namedtuple
 
 import numpy as np
 
 from rebalance import Asset
 from rebalance import Cash
-from rebalance import Price
+from rebalance import instrumentation
+from rebalance.cash.conversion import plan_conversions
+from rebalance.deadline import Deadline, DeadlineExceeded
+from rebalance.instrumentation import Tracer
 
+from rebalance.market.quotes import Quote
+from rebalance.market.snapshot import MarketSnapshot, fetch_rates
 from rebalance.portfolio import rebalancing_helper
+from rebalance.portfolio.holdings import Holdings
+
+
+class RebalanceResult(namedtuple("RebalanceResult", ["new_units", "prices", "exchange_history", "max_diff"])):
+    """
+    Outcome of :meth:`Portfolio.rebalance`. It unpacks as a 4-tuple.
+
+    Attributes:
+        new_units (Dict[str, int]): Units of each asset to buy. The keys of the dictionary are the tickers of the assets.
+        prices (Dict[str, [float, str]]): Price and currency of each asset during the rebalancing computation.
+        exchange_history (List[tuple]): Currency conversions made (see :meth:`Portfolio._smart_exchange`).
+        max_diff (float): Largest difference between target allocation and optimized asset allocation.
+        metrics (Metrics): Spans and counters of this rebalancing. None unless a tracer was specified.
+        breached (List[str]): Tickers of the assets which breached their tolerance bands. None unless tolerance bands were specified.
+        approximate (bool): True if the time budget ran out, so the trades are the best plan found in time rather than the optimal one.
+    """
+    metrics = None
+    breached = None
+    approximate = False
 
 
 class Portfolio:
@@ -17,15 +39,32 @@ class Portfolio:
 
     Defines a :class:`.Portfolio` of :class:`.Asset` s and :class:`.Cash` and performs rebalancing of the portfolio.
 
+    The assets are stored in a columnar :class:`.Holdings` store, so valuations are vectorized over all assets.
+
     """
     def __init__(self):
         """
         Initialization.
         """
-        self._assets = {}
+        self._holdings = Holdings()
+        self._pending_assets = ()
         self._cash = {}
         self._is_selling_allowed = False
         self._common_currency = "CAD"
+        self._solver_state = None
+        self._conversion_spreads = None
+
+    @property
+    def _holdings(self):
+        # the lazy assets are priced, all at once, on first access to the holdings
+        if len(self._pending_assets) > 0:
+            self._resolve_pending_assets()
+
+        return self._holdings_store
+
+    @_holdings.setter
+    def _holdings(self, holdings):
+        self._holdings_store = holdings
 
     @property
     def cash(self):
@@ -73,10 +112,10 @@ class Portfolio:
         """ 
         Dict[str, Asset]: Dictionary of assets in portfolio. The keys of the dictionary are the tickers of the assets.
 
-        
+        The assets are views of the portfolio's holdings: modifying their quantity modifies the portfolio.
         No setter allowed.
         """
-        return self._assets
+        return self._holdings.views()
 
     @property
     def selling_allowed(self):
@@ -89,76 +128,200 @@ class Portfolio:
     def selling_allowed(self, flag):
         self._is_selling_allowed = flag
 
+    @property
+    def conversion_spreads(self):
+        """
+        Dict[tuple, float]: Cost of converting between two currencies (as a fraction of the amount converted), keyed by ``(from_currency, to_currency)`` pairs.
+        If specified, rebalancing makes the cheapest currency conversions. Otherwise (None, default), it makes the fewest conversions.
+        """
+        return self._conversion_spreads
+
+    @conversion_spreads.setter
+    def conversion_spreads(self, spreads):
+        self._conversion_spreads = None if spreads is None else \
+            {(from_currency.upper(), to_currency.upper()): spread for (from_currency, to_currency), spread in spreads.items()}
+
     def add_asset(self, asset):
         """
         Adds specified :class:`.Asset` to the portfolio.
 
+        If the asset is lazy and not priced yet, its quote is fetched on first use of the portfolio's assets,
+        together with the quotes of the other lazy assets.
+
         Args:
             asset (Asset): Asset to add to portfolio.
         """
-        self._assets[asset.ticker] = copy.deepcopy(asset)
+        if not asset.is_priced:
+            self._pending_assets += ((asset.ticker, asset.quantity, None, asset),)
+            return
+
+        self._add_quoted_assets([asset.ticker], [asset.quantity],
+                                {asset.ticker: Quote(asset.price, asset.currency, asset._name)})
 
-    def easy_add_assets(self, tickers, quantities):
+    def easy_add_assets(self, tickers, quantities, lazy=False):
         """
         An easy way to add multiple assets to portfolio.
 
+        The quotes of all assets are fetched at once from ``Asset.quote_provider``.
+
         Args:
             tickers (Sequence[str]): Ticker of assets in portfolio.
             quantities (Sequence[float]): Quantities of respective assets in portfolio. Must be in the same order as ``tickers``.
+            lazy (bool, optional): If True, the quotes are only fetched on first use of the portfolio's assets. Default is False.
         """
 
         assert len(tickers) == len(quantities), \
                "`names` and `quantities` must be of the same length."
 
-        for ticker, quantity in zip(tickers, quantities):
-            self._assets[ticker] = Asset(ticker, quantity)
+        if lazy:
+            self._pending_assets += tuple((ticker, quantity, None, None)
+                                          for ticker, quantity in zip(tickers, quantities))
+            return
+
+        self._add_quoted_assets(tickers, quantities, Asset.quote_provider.get_quotes(tickers))
 
-    def asset_allocation(self):
+    async def aeasy_add_assets(self, tickers, quantities, max_concurrency=8):
+        """
+        Asynchronous counterpart of :meth:`easy_add_assets`, which does not block the event loop.
+
+        The quotes are fetched with ``Asset.quote_provider.aget_quotes``. Then the exchange rates between the portfolio's
+        common currency and the currencies of its assets and cash are fetched concurrently (and cached),
+        so that a subsequent rebalancing does not wait on them.
+
+        Args:
+            tickers (Sequence[str]): Ticker of assets in portfolio.
+            quantities (Sequence[float]): Quantities of respective assets in portfolio. Must be in the same order as ``tickers``.
+            max_concurrency (int, optional): Maximum number of concurrent exchange rate lookups. Default is 8.
+        """
+
+        assert len(tickers) == len(quantities), \
+               "`names` and `quantities` must be of the same length."
+
+        # the quotes of the lazy assets are fetched in the same request, as pricing them later would block the event loop
+        quotes = await Asset.quote_provider.aget_quotes(list(tickers) + self._unpriced_pending_tickers())
+        self._add_quoted_assets(tickers, quantities, quotes)
+        if len(self._pending_assets) > 0:
+            self._resolve_pending_assets(quotes=quotes)
+
+        currencies = set(self._holdings.currency_list) | set(self.cash.keys())
+        await fetch_rates([(self._common_currency, currency) for currency in currencies], max_concurrency)
+
+    def _add_quoted_assets(self, tickers, quantities, quotes):
+        """
+        Adds assets whose quotes are known.
+
+        Args:
+            tickers (Sequence[str]): Tickers of the assets.
+            quantities (Sequence[int]): Quantities of the assets.
+            quotes (Dict[str, Quote]): Quote of each asset. The keys of the dictionary are the tickers.
+        """
+        if len(self._pending_assets) > 0:
+            # queued behind the lazy assets, to keep the assets in the order they were added
+            self._pending_assets += tuple((ticker, quantity, quotes[ticker], None)
+                                          for ticker, quantity in zip(tickers, quantities))
+            return
+
+        self._holdings_store.extend(tickers, quantities,
+                                    [quotes[ticker].price for ticker in tickers],
+                                    [quotes[ticker].currency for ticker in tickers],
+                                    [quotes[ticker].name for ticker in tickers])
+
+    def _unpriced_pending_tickers(self):
+        """
+        Tickers of the lazy assets whose quotes must be fetched.
+
+        Lazy assets priced on their own (through ``Asset.price``) are not fetched again.
+
+        Returns:
+            List[str]: Tickers of the assets.
+        """
+        return [ticker for ticker, _, quote, asset in self._pending_assets
+                if quote is None and (asset is None or not asset.is_priced)]
+
+    def _resolve_pending_assets(self, deadline=None, quotes=None):
+        """
+        Fetches the quotes of all lazy assets in one request and adds them to the holdings.
+
+        Args:
+            deadline (Deadline, optional): If specified, the request takes at most half of the time left,
+                and the assets stay pending if it does not complete.
+            quotes (Dict[str, Quote], optional): Quotes fetched beforehand. Only the quotes of the lazy assets missing from it are requested.
+
+        Raises:
+            DeadlineExceeded: If the quotes could not be fetched before the deadline.
+        """
+        pending = self._pending_assets
+        quotes = {} if quotes is None else dict(quotes)
+        missing = [ticker for ticker in self._unpriced_pending_tickers() if ticker not in quotes]
+        if len(missing) > 0 and deadline is None:
+            quotes.update(Asset.quote_provider.get_quotes(missing))
+        elif len(missing) > 0:
+            # only the request runs in the deadline's thread: the holdings are never changed by an abandoned request
+            quotes.update(deadline.run(Asset.quote_provider.get_quotes, missing, timeout=0.5 * deadline.remaining()))
+
+        tickers = []
+        quantities = []
+        pending_quotes = []
+        for ticker, quantity, quote, asset in pending:
+            if quote is None and asset is not None and asset.is_priced:
+                quote = Quote(asset.price, asset.currency, asset._name)
+            elif quote is None:
+                quote = quotes[ticker]
+            if asset is not None and not asset.is_priced:
+                asset._set_quote(quote)
+
+            tickers.append(ticker)
+            quantities.append(quantity)
+            pending_quotes.append(quote)
+
+        self._pending_assets = ()
+        self._holdings_store.extend(tickers, quantities,
+                                    [quote.price for quote in pending_quotes],
+                                    [quote.currency for quote in pending_quotes],
+                                    [quote.name for quote in pending_quotes])
+
+    def asset_allocation(self, snapshot=None):
         """
         Computes the portfolio's asset allocation.
 
+        Args:
+            snapshot (MarketSnapshot, optional): If specified, the exchange rates are taken from it.
 
         Returns: 
             Dict[str, Asset]: Asset allocation of the portfolio (in %). The keys of the dictionary are the tickers of the assets.
         """
 
         # Obtain all market values in 1 currency (doesn't matter which)
-        total_value = self.market_value(self._common_currency)
+        market_values = self._holdings.market_values_in(self._common_currency, snapshot)
 
         total_value = max(
-            1., total_value
+            1., np.sum(market_values)
         )  # protect against division by 0 (total_value = 0, means new portfolio)
 
-        asset_allocation = {}
-        for name, asset in self._assets.items():
-            asset_allocation[name] = asset.market_value_in(
-                self._common_currency) / total_value * 100.
+        return dict(zip(self._holdings.tickers,
+                        (market_values / total_value * 100.).tolist()))
 
-        return asset_allocation
-
-    def market_value(self, currency):
+    def market_value(self, currency, snapshot=None):
         """
         Computes the total market value of the assets in the portfolio.
 
         Args:
             currency (str): The currency in which to obtain the value.
+            snapshot (MarketSnapshot, optional): If specified, the exchange rates are taken from it.
 
         Returns:
             float: The total market value of the assets in the portfolio.
         """
 
-        mv = 0.
-        for asset in self.assets.values():
-            mv += asset.market_value_in(currency)
-
-        return mv
+        return float(np.sum(self._holdings.market_values_in(currency, snapshot)))
 
-    def cash_value(self, currency):
+    def cash_value(self, currency, snapshot=None):
         """
         Computes the cash value in the portfolio.
 
         Args:
             currency (str): The currency in which to obtain the value.
+            snapshot (MarketSnapshot, optional): If specified, the exchange rates are taken from it.
 
         Returns:
             float: The total cash value in the portfolio.
@@ -166,22 +329,23 @@ class Portfolio:
 
         cv = 0.
         for cash in self.cash.values():
-            cv += cash.amount_in(currency)
+            cv += cash.amount_in(currency, snapshot)
 
         return cv
 
-    def value(self, currency):
+    def value(self, currency, snapshot=None):
         """
         Computes the total value (cash and assets) in the portfolio.
 
         Args:
             currency (str): The currency in which to obtain the value.
+            snapshot (MarketSnapshot, optional): If specified, the exchange rates are taken from it.
 
         Returns:
             float: The total value in the portfolio.
         """
 
-        return self.market_value(currency) + self.cash_value(currency)
+        return self.market_value(currency, snapshot) + self.cash_value(currency, snapshot)
 
     def buy_asset(self, ticker, quantity):
         """
@@ -198,16 +362,18 @@ class Portfolio:
         if quantity == 0:
             return 0.00
 
-        asset = self.assets[ticker]
-        cost = asset.buy(quantity)
-        self.add_cash(-cost, asset.currency)
+        i = self._holdings.index(ticker)
+        self._holdings.quantities[i] += quantity
+        cost = float(self._holdings.prices[i]) * quantity
+        self.add_cash(-cost, self._holdings.currency(i))
         return cost
 
     def exchange_currency(self,
                           to_currency,
                           from_currency,
                           to_amount=None,
-                          from_amount=None):
+                          from_amount=None,
+                          snapshot=None):
         """
         Performs currency exchange in Portfolio.
 
@@ -216,6 +382,7 @@ class Portfolio:
             from_currency (str): Currency from which to perform the exchange
             to_amount (float, optional): If specified, it is the amount to which we want to convert
             from_amount (float, optional): If specified, it is the amount from which we want to convert
+            snapshot (MarketSnapshot, optional): If specified, the exchange rate is taken from it.
 
         Note: either the `to_amount` or `from_amount` needs to be specifed.
         """
@@ -237,35 +404,81 @@ class Portfolio:
         
         if to_amount is not None:
             from_amount = self.cash[to_currency].exchange_rate(
-                from_currency) * to_amount
+                from_currency, snapshot) * to_amount
         elif from_amount is not None:
             to_amount = self.cash[from_currency].exchange_rate(
-                to_currency) * from_amount
+                to_currency, snapshot) * from_amount
 
         self.add_cash(to_amount, to_currency)
         self.add_cash(-from_amount, from_currency)
 
-    def rebalance(self, target_allocation, verbose=False):
+    def rebalance(self, target_allocation, verbose=False, snapshot=None, solver="auto", gradient="analytic",
+                  integer_allocation="greedy", tracer=None, incremental=False, tolerance=None, cache=None,
+                  time_budget=None, risk_model=None):
         """
         Rebalances the portfolio using the specified target allocation, the portfolio's current allocation,
         and the available cash.
 
+        All prices and exchange rates used during the rebalancing are taken from one :class:`.MarketSnapshot`,
+        captured at the start of the call (unless one is specified).
+
         Args:
             target_allocation (Dict[str, float]): Target asset allocation of the portfolio (in %). The keys of the dictionary are the tickers of the assets.
             verbose (bool, optional): Verbosity flag. Default is False. 
+            snapshot (MarketSnapshot, optional): Snapshot of the market to use. The assets are valued at its prices. Default is a snapshot captured at the start of the call.
+            solver (str, optional): Solver of the optimization problem: "auto" (default), "exact" or "slsqp". See :func:`.rebalance_optimizer`.
+            gradient (str, optional): How the SLSQP solver obtains gradients: "analytic" (default) or "numeric" (finite differences).
+            integer_allocation (str, optional): How the solution is turned into whole units: "greedy" (default, spends leftover cash) or "floor".
+            tracer (Tracer, optional): If specified, receives the spans (one per stage) and counters of the rebalancing,
+                which are also returned in the result's ``metrics``.
+            incremental (bool, optional): If True, the solution is kept on the portfolio and the next incremental rebalancing starts from it,
+                which makes repeated rebalancings after small deposits or price moves cheaper. If selling is not allowed and the cash is worth
+                less than the cheapest asset, nothing can be bought and the optimization is skipped. Default is False.
+            tolerance (ToleranceBands, optional): If specified, the portfolio is only rebalanced if an asset breached its tolerance bands.
+                Otherwise, a result without trades is returned right away. The assets which breached are listed in the result's ``breached``.
+            cache (SolutionCache, optional): If specified, the optimizer's solution is shared with the other portfolios rebalanced with the same cache
+                whose normalized inputs (target allocation, weights of the assets and of the cash) and options are the same.
+            time_budget (float, optional): If specified, the rebalancing answers within this time (in seconds) instead of blocking:
+                the exchange rate lookups give up when it runs out (and no trade is made), and so does the SLSQP solver (the best feasible solution found so far is used).
+                The result is then flagged as ``approximate``.
+            risk_model (RiskModel, optional): If specified, the ex-ante tracking error to the target allocation (according to this covariance model)
+                is minimized instead of the squared allocation error. See :func:`.rebalance_optimizer`.
 
         Returns:
-            (tuple): tuple containing:
+            RebalanceResult: tuple containing:
                 * new_units (Dict[str, int]): Units of each asset to buy. The keys of the dictionary are the tickers of the assets.
                 * prices (Dict[str, [float, str]]): The keys of the dictionary are the tickers of the assets. Each value of the dictionary is a 2-entry list. The first entry is the price of the asset during the rebalancing computation. The second entry is the currency of the asset.
                 * exchange_rates (Dict[str, float]): The keys of the dictionary are currencies. Each value is the exchange rate to CAD during the rebalancing computation.
                 * max_diff (float): Largest difference between target allocation and optimized asset allocation.
         """
+        if tracer is None:
+            return self._rebalance(target_allocation, verbose, snapshot, solver, gradient, integer_allocation,
+                                   incremental, tolerance, cache, time_budget, risk_model)
+
+        # metrics of this call only, while the tracer may accumulate those of many calls
+        recorder = Tracer()
+        with instrumentation.tracing(recorder, tracer), instrumentation.span("rebalance"):
+            result = self._rebalance(target_allocation, verbose, snapshot, solver, gradient, integer_allocation,
+                                     incremental, tolerance, cache, time_budget, risk_model)
+        result.metrics = recorder.metrics
+        return result
+
+    def _rebalance(self, target_allocation, verbose, snapshot, solver, gradient, integer_allocation, incremental,
+                   tolerance, cache, time_budget, risk_model):
+        """
+        Rebalances the portfolio. See :meth:`rebalance`.
+        """
+
+        # the time budget starts before the holdings are used, since pricing the lazy assets may block
+        deadline = None if time_budget is None else Deadline(time_budget)
 
         # order target_allocation dict in the same order as assets dict and upper key
+        # (the lazy assets come last, as once priced, so their quotes are not needed yet)
         target_allocation_reordered = {}
         try:
-            for key in self.assets:
+            for key in self._holdings_store.tickers:
+                target_allocation_reordered[key] = target_allocation[key]
+            for key, _, _, _ in self._pending_assets:
                 target_allocation_reordered[key] = target_allocation[key]
         except:
             raise Exception(
@@ -278,16 +491,76 @@ class Portfolio:
         assert abs(np.sum(target_allocation_np) -
                    100.) <= 1E-2, "target allocation must sum up to 100%."
 
+        if deadline is not None and len(self._pending_assets) > 0:
+            try:
+                self._resolve_pending_assets(deadline)
+            except DeadlineExceeded:
+                deadline.mark("quotes")
+                instrumentation.count("deadline_exceeded")
+                result = self._no_trade_result(target_allocation_np, None, verbose,
+                                               "The quotes could not be fetched in time: no trade is made.")
+                result.approximate = True
+                return result
+
+        # capture prices and exchange rates once for the whole rebalancing
+        if snapshot is None:
+            try:
+                snapshot = MarketSnapshot.capture(self, deadline=deadline)
+            except DeadlineExceeded:
+                # without exchange rates, the only plan at hand is to make no trade
+                deadline.mark("snapshot")
+                instrumentation.count("deadline_exceeded")
+                result = self._no_trade_result(target_allocation_np, None, verbose,
+                                               "The market data could not be fetched in time: no trade is made.")
+                result.approximate = True
+                return result
+            original_prices = None
+        else:
+            # the portfolio is valued at the snapshot's prices for the duration of the call only
+            original_prices = self._holdings.prices.copy()
+            with instrumentation.span("reprice"):
+                self._holdings.prices = snapshot.prices_of(self._holdings.tickers)
+
+        try:
+            return self._rebalance_at(target_allocation, target_allocation_np, verbose, snapshot, solver, gradient,
+                                      integer_allocation, incremental, tolerance, cache, deadline, risk_model)
+        finally:
+            if original_prices is not None:
+                self._holdings.prices = original_prices
+
+    def _rebalance_at(self, target_allocation, target_allocation_np, verbose, snapshot, solver, gradient,
+                      integer_allocation, incremental, tolerance, cache, deadline, risk_model):
+        """
+        Rebalances the portfolio, valued at the prices of the snapshot. See :meth:`rebalance`.
+        """
+
+        # portfolios within their tolerance bands are left as they are
+        breached = None
+        if tolerance is not None:
+            with instrumentation.span("drift_check"):
+                check = tolerance.check(self, target_allocation, snapshot)
+            breached = check.breached
+            if check.in_band:
+                instrumentation.count("in_band")
+                result = self._no_trade_result(target_allocation_np, snapshot, verbose,
+                                               "The asset allocation is within the tolerance bands: no trade is required.")
+                result.breached = []
+                return result
+
         # offload heavy work
-        (balanced_portfolio, new_units, prices, cost, exchange_history) = rebalancing_helper.rebalance(self, target_allocation_np)
+        (balanced_portfolio, new_units, prices, cost, exchange_history) = rebalancing_helper.rebalance(
+            self, target_allocation_np, snapshot, solver=solver, gradient=gradient,
+            integer_allocation=integer_allocation, incremental=incremental, cache=cache,
+            deadline=deadline, risk_model=risk_model)
 
         # compute old and new asset allocation
         # and largest diff between new and target asset allocation
-        old_alloc = self.asset_allocation()
-        new_alloc = balanced_portfolio.asset_allocation()
-        max_diff = max(
-            abs(target_allocation_np -
-                np.fromiter(new_alloc.values(), dtype=float)))
+        with instrumentation.span("evaluate"):
+            old_alloc = self.asset_allocation(snapshot)
+            new_alloc = balanced_portfolio.asset_allocation(snapshot)
+            max_diff = max(
+                abs(target_allocation_np -
+                    np.fromiter(new_alloc.values(), dtype=float)))
 
         if verbose:
             print("")
@@ -301,7 +574,7 @@ class Portfolio:
             print(
                 "---------------------------------------------------------------------------------------------------------------"
             )
-            for ticker in balanced_portfolio.assets:
+            for ticker in balanced_portfolio._holdings.tickers:
                 print("%8s  %7.2f   %6.d        %8.2f     %4s          %5.2f            %5.2f               %5.2f" % \
                 (ticker, prices[ticker][0], new_units[ticker], cost[ticker], prices[ticker][1], \
                  old_alloc[ticker], new_alloc[ticker], target_allocation[ticker]))
@@ -339,23 +612,122 @@ class Portfolio:
         # Now that we're done, we can replace old portfolio with the new one
         self.__dict__.update(balanced_portfolio.__dict__)
 
-        return (new_units, prices, exchange_history, max_diff)
+        result = RebalanceResult(new_units, prices, exchange_history, max_diff)
+        result.breached = breached
+        result.approximate = deadline is not None and len(deadline.exceeded) > 0
+        return result
+
+    def _no_trade_result(self, target_allocation, snapshot, verbose, message):
+        """
+        Result of a rebalancing without trades.
+
+        Args:
+            target_allocation (np.ndarray): Target allocation of the assets (in %), in the same order as the holdings.
+            snapshot (MarketSnapshot): Prices and exchange rates of the rebalancing. If None, the largest difference to the target allocation is unknown (NaN).
+            verbose (bool): Verbosity flag.
+            message (str): Reason why no trade is made, printed if ``verbose``.
+
+        Returns:
+            RebalanceResult: Result without trades.
+        """
+        holdings = self._holdings_store
+        new_units = dict.fromkeys(holdings.tickers, 0)
+        prices = {ticker: [float(holdings.prices[i]), holdings.currency(i)]
+                  for i, ticker in enumerate(holdings.tickers)}
+        # lazy assets still pending, whose quotes could not be fetched in time, have no known price
+        for ticker, _, quote, _ in self._pending_assets:
+            new_units[ticker] = 0
+            prices[ticker] = [np.nan, None] if quote is None else [quote.price, quote.currency]
+        max_diff = np.nan
+        if snapshot is not None and len(holdings) > 0:
+            max_diff = max(abs(target_allocation -
+                               np.fromiter(self.asset_allocation(snapshot).values(), dtype=float)))
+
+        if verbose:
+            print("")
+            print(message)
+
+        return RebalanceResult(new_units, prices, [], max_diff)
+
+    def rebalance_stream(self, events, target_allocation, snapshot=None, **options):
+        """
+        Rebalances the portfolio after each event of a stream of cash flows and price updates. See :func:`.rebalance_stream`.
+
+        Args:
+            events (Iterable[CashFlow or PriceUpdate]): Stream of events.
+            target_allocation (Dict[str, float]): Target asset allocation of the portfolio (in %). The keys of the dictionary are the tickers of the assets.
+            snapshot (MarketSnapshot, optional): Snapshot of the market at the start of the stream. Default is a snapshot captured with :meth:`.MarketSnapshot.capture`.
+            **options: Other keyword arguments of :meth:`rebalance`, used for every rebalancing.
+
+        Yields:
+            (tuple): The event processed and the :class:`RebalanceResult` of the rebalancing which followed it.
+        """
+        from rebalance.portfolio.stream import rebalance_stream
+        return rebalance_stream(self, events, target_allocation, snapshot, **options)
+
+    def save(self, path, snapshot=None):
+        """
+        Saves the portfolio, and a snapshot of the market, to a ``.npz`` file. See :func:`.save_portfolios`.
+
+        Args:
+            path (str): Path of the file.
+            snapshot (MarketSnapshot, optional): Snapshot of the market to save. Default is a snapshot captured with :meth:`.MarketSnapshot.capture`.
+        """
+        from rebalance.portfolio.storage import save_portfolios
+        save_portfolios(path, [self], snapshot)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Loads a portfolio saved by :meth:`save`. No network access is made.
+
+        Use :func:`.load_portfolios` to also load the snapshot of the market, or to load many portfolios.
+
+        Args:
+            path (str): Path of the file.
+
+        Returns:
+            Portfolio: The portfolio (the first one of the file).
+        """
+        from rebalance.portfolio.storage import load_portfolios
+        return load_portfolios(path, indices=[0]).portfolios[0]
+
+    def _scratch_copy(self):
+        """
+        Makes a lightweight copy of the portfolio, to be modified without affecting the original.
+
+        Only the numeric state (quantities, prices, and cash amounts) is copied; everything else is shared.
+
+        Returns:
+            Portfolio: Copy of the portfolio.
+        """
+        holdings = self._holdings.copy()
+        scratch = Portfolio.__new__(Portfolio)
+        scratch.__dict__.update(self.__dict__)
+        scratch._holdings = holdings
+        scratch._cash = {currency: Cash(cash.amount, currency) for currency, cash in self._cash.items()}
+        return scratch
 
     def _sell_everything(self):
         """
             Sells all assets in the portfolio and converts them to cash. 
         """
 
-        for ticker, asset in self._assets.items():
-            self.buy_asset(ticker, - asset.quantity)
+        holdings = self._holdings
+        proceeds = holdings.values_per_currency(holdings.quantities * holdings.prices)
+        for currency, amount in proceeds.items():
+            self.add_cash(amount, currency)
+
+        holdings.quantities = 0
 
 
-    def _combine_cash(self, currency=None):
+    def _combine_cash(self, currency=None, snapshot=None):
         """
         Converts cash in portfolio to one currency.
 
         Args:
             currency (str, optional) If specified, it is the currency to which convert all cash. If None, it is set to `_common_currency`.
+            snapshot (MarketSnapshot, optional): If specified, the exchange rates are taken from it.
         """
 
         if currency is None:
@@ -366,15 +738,20 @@ class Portfolio:
             if cash.currency == currency:
                 continue
             
-            self.exchange_currency(to_currency=currency, from_currency=cash.currency, from_amount=cash.amount)
+            self.exchange_currency(to_currency=currency, from_currency=cash.currency, from_amount=cash.amount, snapshot=snapshot)
 
 
-    def _smart_exchange(self, currency_amount):
+    def _smart_exchange(self, currency_amount, snapshot=None):
         """
         Performs currency exchange between Portfolio's different sources of cash based on amount required per currency.
 
+        The conversions are planned by :func:`.plan_conversions`: the fewest conversions,
+        or the cheapest ones if :attr:`conversion_spreads` is specified.
+
         Args:
             currency_amount (Dict[str, float]): Amount needed per currency. The keys of the dictionary are the currency.
+            snapshot (MarketSnapshot, optional): If specified, the exchange rates are taken from it.
+                Otherwise, a snapshot is captured, which looks up one rate per currency.
     
         Returns:
             List[tuple]: tuple containing:
@@ -384,87 +761,13 @@ class Portfolio:
                     *  to_currency (str): Currency to which to perform the exchange
                     *  rate (float): Currency exchange rate from `from_currency` to `to_currency`
         """
+        if snapshot is None:
+            snapshot = MarketSnapshot.capture(self, currencies=list(currency_amount.keys()))
 
-        # first, compute amount we have to convert to and amount we have for conversion
-        
-
-        to_conv = {}
-        from_conv = copy.deepcopy(self.cash)
-        for curr in currency_amount:
-            if curr not in self.cash:
-                from_conv[curr] = Cash(0.00, curr)
-
-            to = currency_amount[curr] - from_conv[curr].amount
-
-            if to > 0:
-                to_conv[curr] = Cash(to, curr)
-                del from_conv[curr]  # no extra cash available for conversion
-            else:
-                # no conversion will be necessary
-                from_conv[curr].amount -= currency_amount[curr]
-
-        # perform currency exchange
-        exchange_history = []
-        for to_cash in to_conv.values():
-            one_exchange = False
-            # Try converting one shot if possible
-            for from_cash in from_conv.values():
-                if from_cash.amount_in(to_cash.currency) >= to_cash.amount:
-                    # perform conversion
-                    self.exchange_currency(to_currency=to_cash.currency,
-                                           from_currency=from_cash.currency,
-                                           to_amount=to_cash.amount)
-
-                    # update amount we have to convert to or amount we have for conversion
-                    amt = to_cash.amount_in(from_cash.currency)
-
-                    rate = from_cash.exchange_rate(to_cash.currency)
-                    exchange_history.append(
-                        (amt, from_cash.currency, to_cash.amount,
-                         to_cash.currency, rate))
-
-                    from_cash.amount -= amt
-                    to_cash.amount = 0.00
-
-                    # move to next 'to_cash'
-                    one_exchange = True
-                    break
-
-            # If we reached here,
-            # it means we couldn't perform one currency exchange to meet our 'to_cash'
-            # So we'll just convert whatever we can
-            if not one_exchange:
-                for from_cash in from_conv.values():
-                    if from_cash.amount_in(to_cash.currency) >= to_cash.amount:
-                        # perform conversion
-                        self.exchange_currency(
-                            to_currency=to_cash.currency,
-                            from_currency=from_cash.currency,
-                            to_amount=to_cash.amount)
-
-                        amt = to_cash.amount_in(from_cash.currency)
-                        rate = from_cash.exchange_rate(to_cash.currency)
-                        exchange_history.append(
-                            (amt, from_cash.currency, to_cash.amount,
-                             to_cash.currency, rate))
-
-                        # update amount we have to convert to and amount we have for conversion
-                        from_cash.amount -= amt
-                        to_cash.amount = 0.00
-                    else:
-                        self.exchange_currency(
-                            to_currency=to_cash.currency,
-                            from_currency=from_cash.currency,
-                            from_amount=from_cash.amount)
-                        amt = from_cash.amount_in(to_cash.currency)
-
-                        rate = from_cash.exchange_rate(to_cash.currency)
-                        exchange_history.append(
-                            (from_cash.amount, from_cash.currency, amt,
-                             to_cash.currency, rate))
-
-                        # update amount we have to convert to and amount we have for conversion
-                        to_cash.amount -= amt
-                        from_cash.amount = 0.00
+        available = {currency: cash.amount for currency, cash in self.cash.items()}
+        exchange_history = plan_conversions(available, currency_amount, snapshot, self._conversion_spreads)
+        for from_amount, from_currency, to_amount, to_currency, _ in exchange_history:
+            self.add_cash(to_amount, to_currency)
+            self.add_cash(-from_amount, from_currency)
 
         return exchange_history
@@ -1,10 +1,26 @@
-import copy
-import math
+from collections import namedtuple
 
 import numpy as np
-from scipy.optimize import minimize
 
-def rebalance(portfolio, target_allocation):
+from rebalance import instrumentation
+from rebalance.portfolio import share_allocation
+from rebalance.portfolio import solvers
+
+
+SolverState = namedtuple("SolverState", ["tickers", "target_allocation", "selling_allowed", "positions"])
+SolverState.__doc__ = """
+Solution of the last incremental rebalancing of a portfolio, kept to warm-start the next one.
+
+Attributes:
+    tickers (List[str]): Tickers of the assets, in the order of the other fields.
+    target_allocation (np.ndarray): Target asset allocation (in %).
+    selling_allowed (bool): Whether selling was allowed.
+    positions (np.ndarray): Units of each asset held according to the optimizer's (continuous) solution.
+"""
+
+
+def rebalance(portfolio, target_allocation, snapshot, solver="auto", gradient="analytic",
+              integer_allocation="greedy", incremental=False, cache=None, deadline=None, risk_model=None):
     """
     Rebalances the portfolio using the specified target allocation, the portfolio's current allocation,
     and the available cash.
@@ -12,6 +28,17 @@ def rebalance(portfolio, target_allocation):
     Args:
         portfolio (:class:`.Portfolio`): Object of portfolio to rebalance.
         target_allocation (Dict[str, float]): Target asset allocation of the portfolio (in %). The keys of the dictionary are the tickers of the assets.
+        snapshot (:class:`.MarketSnapshot`): Prices and exchange rates used throughout the rebalancing.
+        solver (str, optional): Solver of the optimization problem. See :func:`rebalance_optimizer`.
+        gradient (str, optional): How the optimizer obtains gradients. See :func:`rebalance_optimizer`.
+        integer_allocation (str, optional): How the optimizer's solution is turned into whole units.
+            "floor" rounds down the units of each asset.
+            "greedy" (default) then spends the leftover cash on the units which reduce the allocation error the most (see :func:`.greedy_units`).
+        incremental (bool, optional): If True, the solution is kept on the portfolio (see :class:`SolverState`) and the SLSQP solver starts from the solution of the previous incremental rebalancing.
+            If selling is not allowed and the cash is worth less than the cheapest asset, no unit can be bought and the optimization is skipped altogether. Default is False.
+        cache (:class:`.SolutionCache`, optional): If specified, the optimizer's solution is taken from (or added to) the cache. See :func:`rebalance_optimizer`.
+        deadline (:class:`.Deadline`, optional): If specified, the optimizer stops when it passes. See :func:`rebalance_optimizer`.
+        risk_model (:class:`.RiskModel`, optional): If specified, the optimizer minimizes the tracking error to the target allocation. See :func:`rebalance_optimizer`.
 
     Returns:
         (tuple): tuple containing:
@@ -21,83 +48,184 @@ def rebalance(portfolio, target_allocation):
             * exchange_rates (Dict[str, float]): The keys of the dictionary are currencies. Each value is the exchange rate to CAD during the rebalancing computation.
     """
 
-    # Make a new instance of portfolio
-    # This is the one that is going to be rebalanced
-    # We do not modify the current portfolio
-    balanced_portfolio = copy.deepcopy(portfolio)
-
-    # If selling is allowed, "sell everything" in new portfolio
-    if portfolio.selling_allowed:
-        balanced_portfolio._sell_everything()
-
-    # Convert all cash to one currency
-    balanced_portfolio._combine_cash()
-    
-    # Solve optimization problem
-    to_buy_vals = rebalance_optimizer(balanced_portfolio, target_allocation)
-    
+    cmn_curr = portfolio._common_currency
+    holdings = portfolio._holdings
+    prices_cmn = holdings.prices_in(cmn_curr, snapshot)
+    state = getattr(portfolio, "_solver_state", None)
+
+    if incremental and not portfolio.selling_allowed and len(holdings) > 0 and \
+            portfolio.cash_value(cmn_curr, snapshot) < np.min(prices_cmn):
+        # Not even one unit of the cheapest asset can be bought, so the positions remain unchanged
+        instrumentation.count("skipped_solves")
+        to_buy_vals = np.zeros(len(holdings))
+    else:
+        # Make a scratch copy of the portfolio's quantities and cash for the optimization problem
+        # We do not modify the current portfolio
+        with instrumentation.span("scratch_copy"):
+            scratch_portfolio = portfolio._scratch_copy()
+
+        # If selling is allowed, "sell everything" in scratch portfolio
+        if portfolio.selling_allowed:
+            with instrumentation.span("sell_everything"):
+                scratch_portfolio._sell_everything()
+
+        # Convert all cash to one currency
+        with instrumentation.span("combine_cash"):
+            scratch_portfolio._combine_cash(snapshot=snapshot)
+
+        # Solve optimization problem
+        with instrumentation.span("optimize"):
+            current_vals = scratch_portfolio._holdings.market_values_in(cmn_curr, snapshot)
+            x0 = None
+            # with selling allowed and the squared allocation error, the exact solution is closed-form and needs no starting point
+            warm_startable = solver == "slsqp" or risk_model is not None or not portfolio.selling_allowed
+            if incremental and warm_startable and state is not None and \
+                    state.tickers == holdings.tickers and \
+                    state.selling_allowed == portfolio.selling_allowed and \
+                    np.array_equal(state.target_allocation, target_allocation):
+                # start from the previous solution, repriced and adjusted to the cash available
+                instrumentation.count("warm_starts")
+                x0 = solvers.project_simplex(state.positions * prices_cmn - current_vals,
+                                             scratch_portfolio.cash[cmn_curr].amount)
+
+            to_buy_vals = rebalance_optimizer(scratch_portfolio, target_allocation, snapshot,
+                                              solver=solver, gradient=gradient, x0=x0, cache=cache,
+                                              deadline=deadline, risk_model=risk_model)
+
+        if incremental:
+            state = SolverState(list(holdings.tickers), np.array(target_allocation, dtype=float),
+                                portfolio.selling_allowed, (current_vals + to_buy_vals) / prices_cmn)
+
     # See how many units of each asset you need to buy based on optimization solution
     # and total cost/currency
-    cmn_curr = portfolio._common_currency
-    new_units = {}
-    currency_cost = {}
-    for sol_mv, ticker in zip(to_buy_vals,
-                              balanced_portfolio.assets.keys()):
+    with instrumentation.span("integer_allocation"):
         if portfolio.selling_allowed:
-            new_units[ticker] = math.floor(
-                (sol_mv - portfolio.assets[ticker].market_value_in(
-                    cmn_curr)) / portfolio.assets[ticker].price_in(
-                        cmn_curr))
-        else:
-            new_units[ticker] = math.floor(
-                sol_mv /
-                portfolio.assets[ticker].price_in(cmn_curr))
-
-        asset_i = portfolio.assets[ticker]
-        if asset_i.currency not in currency_cost:
-            currency_cost[asset_i.currency] = asset_i.cost_of(
-                new_units[ticker])
+            units = share_allocation.floor_units(
+                to_buy_vals - holdings.quantities * prices_cmn, prices_cmn)
         else:
-            currency_cost[asset_i.currency] += asset_i.cost_of(
-                new_units[ticker])
+            units = share_allocation.floor_units(to_buy_vals, prices_cmn)
 
-    # Since we converted the cash to one common currency for the rebalancing calculation, revert back
-    balanced_portfolio.cash = copy.deepcopy(portfolio.cash)
+        if integer_allocation == "greedy":
+            target_values = target_allocation / np.sum(target_allocation) * portfolio.value(cmn_curr, snapshot)
+            shortfalls = target_values - (holdings.quantities + units) * prices_cmn
+            leftover_cash = portfolio.cash_value(cmn_curr, snapshot) - np.sum(units * prices_cmn)
+            units = share_allocation.greedy_units(units, prices_cmn, shortfalls, leftover_cash)
+        elif integer_allocation != "floor":
+            raise Exception("Unknown integer allocation option '%s'." % integer_allocation)
 
-    # Since we might have sold all assets for the rebalancing calculation, revert back
-    balanced_portfolio._assets = copy.deepcopy(portfolio.assets)
+    new_units = dict(zip(holdings.tickers, units.tolist()))
+    currency_cost = holdings.values_per_currency(units * holdings.prices)
+
+    # The trades are applied to a fresh scratch copy of the portfolio
+    # (the first one had its cash combined and might have had all its assets sold)
+    # This is the one that is going to be rebalanced
+    with instrumentation.span("scratch_copy"):
+        balanced_portfolio = portfolio._scratch_copy()
+    balanced_portfolio._solver_state = state
 
     # Make necessary currency conversions
-    exchange_history = balanced_portfolio._smart_exchange(currency_cost)
+    with instrumentation.span("smart_exchange"):
+        exchange_history = balanced_portfolio._smart_exchange(currency_cost, snapshot)
 
     # Buy new units
-    prices = {}
-    cost = {}
-    for ticker, asset in balanced_portfolio.assets.items():
-        prices[ticker] = [asset.price,
-                          asset.currency]  # price and currency of price
-        cost[ticker] = balanced_portfolio.buy_asset(
-            ticker, new_units[ticker])
+    with instrumentation.span("apply_trades"):
+        balanced_holdings = balanced_portfolio._holdings
+        balanced_holdings.quantities += units
+        costs = units * balanced_holdings.prices
+        traded = np.bincount(balanced_holdings.currency_codes, weights=np.abs(units),
+                             minlength=len(balanced_holdings.currency_list))
+        for (currency, amount), nb_traded in zip(
+                balanced_holdings.values_per_currency(costs).items(), traded):
+            if nb_traded > 0:
+                balanced_portfolio.add_cash(-amount, currency)
+
+        prices = {}
+        for i, ticker in enumerate(balanced_holdings.tickers):
+            prices[ticker] = [float(balanced_holdings.prices[i]),
+                              balanced_holdings.currency(i)]  # price and currency of price
+        cost = dict(zip(balanced_holdings.tickers, costs.tolist()))
 
 
     return balanced_portfolio, new_units, prices, cost, exchange_history
 
 
-def rebalance_optimizer(portfolio, target_alloc):
+def rebalance_optimizer(portfolio, target_alloc, snapshot=None, solver="auto", gradient="analytic", x0=None,
+                        cache=None, deadline=None, risk_model=None):
     """
     Handles the optimization algorithm for the rebalancing procedure
 
     Args:
         portfolio (:class:`.Portfolio`): Object of portfolio to rebalance.
         target_alloc (np.ndarray): Target allocation of Portfolio's assets (in %).
+        snapshot (:class:`.MarketSnapshot`, optional): If specified, the exchange rates are taken from it.
+        solver (str, optional): Solver of the optimization problem.
+            "exact" uses the closed-form solution when all assets were sold and the water-filling solution otherwise (see :mod:`.solvers`); both invest all the cash.
+            "slsqp" minimizes :func:`rebalance_objective` with scipy's SLSQP.
+            "auto" (default) uses the exact solvers, and falls back to SLSQP if their solution cannot be used
+            (not finite, negative, or spending more than the cash available), which may happen with degenerate inputs.
+        gradient (str, optional): How the SLSQP solver obtains the gradient of the objective and the Jacobian of the constraint.
+            Either "analytic" (closed-form expressions, default) or "numeric" (finite differences, one objective evaluation per asset).
+        x0 (np.ndarray, optional): Initial guess of the market value of each asset to purchase, such as the solution of the previous rebalancing.
+            SLSQP and :func:`.solve_tracking_error` start from it, and the water-filling solution takes the assets it buys as its first guess
+            (the closed-form solution with selling needs none). Default is the value needed by each asset to reach its target allocation.
+        cache (:class:`.SolutionCache`, optional): If specified, the solution of a portfolio with the same normalized inputs and options is reused
+            (rescaled to this portfolio) whatever the solver, and new solutions are added to the cache.
+        deadline (:class:`.Deadline`, optional): If specified, the SLSQP solver stops at the first iteration which ends after the deadline
+            (or does not start if it has passed), and the best feasible solution at hand is returned: the last iterate (clipped to the cash available)
+            or the exact solution, whichever has the lower objective. The "optimize" stage is then marked on the deadline.
+        risk_model (:class:`.RiskModel`, optional): If specified, the ex-ante tracking error to the target allocation is minimized
+            instead of the squared allocation error: "auto" and "exact" use :func:`.solve_tracking_error`,
+            and "slsqp" minimizes :func:`tracking_error_objective`. The risk model must cover the assets of the portfolio.
 
     Returns:
         (np.ndarray): Optimizer's solution, which is the total market value of each asset to purchase.
     """
 
     cmn_curr = portfolio._common_currency
-    nb_assets = len(portfolio.assets)
+    nb_assets = len(portfolio._holdings)
     total_cash = portfolio.cash[cmn_curr].amount
+    current_asset_values = portfolio._holdings.market_values_in(cmn_curr, snapshot)
+
+    if solver not in ("auto", "exact", "slsqp"):
+        raise Exception("Unknown solver '%s'." % solver)
+
+    if risk_model is not None:
+        risk_model = risk_model.select(portfolio._holdings.tickers)
+
+    if cache is not None:
+        # the risk model is part of the key through its content, so equal models built apart share solutions
+        options = (solver, gradient, None if risk_model is None else risk_model.fingerprint)
+        key = cache.key(current_asset_values, target_alloc, total_cash, options)
+        total_value = np.sum(current_asset_values) + total_cash
+        solution = cache.get(key, total_value, total_cash)
+        if solution is not None:
+            return solution
+
+    if solver in ("auto", "exact"):
+        solution = _exact_solution(current_asset_values, target_alloc, total_cash, risk_model, x0)
+        if solver == "exact" or _is_feasible(solution, total_cash):
+            if cache is not None:
+                cache.put(key, solution, total_value)
+            return solution
+
+        instrumentation.count("exact_fallbacks")
+        solver = "slsqp"
+
+    if deadline is not None and deadline.expired():
+        # no time left for SLSQP: the exact solution is at hand
+        deadline.mark("optimize")
+        instrumentation.count("deadline_exceeded")
+        return _exact_solution(current_asset_values, target_alloc, total_cash, risk_model)
+
+    if risk_model is None:
+        objective = rebalance_objective
+        objective_gradient = rebalance_objective_gradient
+        args = (current_asset_values, target_alloc / 100., total_cash)
+    else:
+        objective = tracking_error_objective
+        objective_gradient = tracking_error_objective_gradient
+        args = (current_asset_values, target_alloc / 100., total_cash, risk_model)
+
     bound = (0.00, total_cash)
     bounds = ((bound, ) * nb_assets)
     constraints = [{
@@ -107,24 +235,91 @@ def rebalance_optimizer(portfolio, target_alloc):
         lambda new_asset_values: total_cash - np.sum(new_asset_values)
     }]  # Can't buy more than available cash
 
-    current_asset_values = np.array([
-        asset.market_value_in(cmn_curr)
-        for asset in portfolio.assets.values()
-    ])
-    new_asset_values0 = target_alloc / 100. * portfolio.value(
-        cmn_curr) - current_asset_values
-
-    solution = minimize(rebalance_objective,
-                        new_asset_values0,
-                        args=(current_asset_values,
-                              target_alloc / 100., 
-                              total_cash),
-                        method='SLSQP',
-                        bounds=bounds,
-                        constraints=constraints)
+    if gradient == "analytic":
+        jac = objective_gradient
+        constraints[0]['jac'] = lambda new_asset_values: -np.ones((1, len(new_asset_values)))
+    elif gradient == "numeric":
+        jac = None
+    else:
+        raise Exception("Unknown gradient option '%s'." % gradient)
+
+    from scipy.optimize import minimize  # only needed (and imported) when SLSQP runs
+
+    if x0 is None:
+        new_asset_values0 = target_alloc / 100. * portfolio.value(
+            cmn_curr, snapshot) - current_asset_values
+    else:
+        new_asset_values0 = x0
+
+    # last iterate of the solver, checked against the deadline after each iteration
+    iterate = [np.asarray(new_asset_values0, dtype=float)]
+
+    def _check_deadline(new_asset_values):
+        iterate[0] = np.array(new_asset_values)
+        if deadline.expired():
+            raise _OutOfTime()
+
+    callback = _check_deadline if deadline is not None else None
+
+    try:
+        solution = minimize(objective,
+                            new_asset_values0,
+                            args=args,
+                            method='SLSQP',
+                            jac=jac,
+                            bounds=bounds,
+                            constraints=constraints,
+                            callback=callback)
+    except _OutOfTime:
+        deadline.mark("optimize")
+        instrumentation.count("deadline_exceeded")
+        return _best_feasible(iterate[0], objective, args, risk_model)
+
+    instrumentation.count("optimizer_iterations", solution.nit)
+    instrumentation.count("objective_evaluations", solution.nfev)
+    instrumentation.count("gradient_evaluations", solution.njev)
+
+    if cache is not None:
+        cache.put(key, solution.x, total_value)
 
     return solution.x
 
+class _OutOfTime(Exception):
+    # stops the SLSQP solver when the deadline passes
+    pass
+
+
+def _exact_solution(current_asset_values, target_alloc, total_cash, risk_model=None, x0=None):
+    instrumentation.count("exact_solves")
+    if risk_model is not None:
+        return solvers.solve_tracking_error(current_asset_values, target_alloc / 100., total_cash, risk_model, x0=x0)
+
+    if not np.any(current_asset_values):
+        return solvers.solve_with_selling(target_alloc / 100., total_cash)
+
+    return solvers.solve_buy_only(current_asset_values, target_alloc / 100., total_cash, x0=x0)
+
+
+def _is_feasible(new_asset_values, total_cash):
+    # purchases which are finite, non-negative and within the cash available (up to rounding errors)
+    tolerance = 1E-9 * max(1., abs(total_cash))
+    return bool(np.all(np.isfinite(new_asset_values)) and np.all(new_asset_values >= -tolerance) and
+                np.sum(new_asset_values) <= total_cash + tolerance)
+
+
+def _best_feasible(new_asset_values, objective, args, risk_model):
+    # the iterate may break the bounds or the cash constraint: clip it, then scale it down to the cash available
+    current_asset_values, target_allocation, total_cash = args[:3]
+    iterate = np.clip(new_asset_values, 0., total_cash)
+    spent = np.sum(iterate)
+    if spent > total_cash:
+        iterate *= total_cash / spent
+
+    exact = _exact_solution(current_asset_values, target_allocation * 100., total_cash, risk_model)
+    objectives = [objective(candidate, *args) for candidate in (iterate, exact)]
+    return iterate if objectives[0] <= objectives[1] else exact
+
+
 def rebalance_objective(new_asset_values, current_asset_values, 
                          target_allocation, total_cash):
     """
@@ -157,4 +352,100 @@ def rebalance_objective(new_asset_values, current_asset_values,
                      np.sum(new_asset_values))
     j2 = cash_diff * cash_diff  # range: (0, 1)
 
-    return j1 + j2
\ No newline at end of file
+    return j1 + j2
+
+def rebalance_objective_gradient(new_asset_values, current_asset_values,
+                                 target_allocation, total_cash):
+    """
+    Gradient of :func:`rebalance_objective` with respect to ``new_asset_values``.
+
+    Args:
+        new_asset_values (np.ndarray): Market value of assets to buy.
+        current_asset_vales (np.ndarray): Portfolio's current Market values of assets (in same currency as ``new_asset_values``).
+        target_allocation (np.ndarray): Target asset allocation (in decimal).
+        total_cash (float): Total cash available for investing.
+
+    Returns:
+        np.ndarray: Gradient of the objective function.
+    """
+
+    asset_vals = current_asset_values + new_asset_values
+    tot_asset_val = np.sum(asset_vals)
+    current_allocation = asset_vals / tot_asset_val
+    asset_alloc_diff = target_allocation - current_allocation
+
+    # d(current_allocation_i)/d(new_asset_values_k) = (delta_ik - current_allocation_i) / tot_asset_val
+    grad_j1 = -2. / tot_asset_val * (
+        asset_alloc_diff - np.inner(asset_alloc_diff, current_allocation))
+
+    # the cash term only depends on the total amount spent
+    tot_new_val = np.sum(new_asset_values)
+    cash_diff = (total_cash - tot_new_val) / (total_cash + tot_new_val)
+    grad_j2 = -4. * cash_diff * total_cash / (total_cash + tot_new_val)**2
+
+    return grad_j1 + grad_j2
+
+
+def tracking_error_objective(new_asset_values, current_asset_values, target_allocation, total_cash, risk_model):
+    """
+    Objective function which penalizes the ex-ante tracking error to the target allocation instead of the squared allocation error.
+
+    The first term of :func:`rebalance_objective` is replaced by ``a.T @ covariance @ a``, where ``a`` is the difference between
+    the target allocation and the asset allocation, divided by the average variance of the assets so it is commensurate with the cash penalty
+    (a model without any variance, whose tracking error is always zero, is not normalized).
+    With an identity covariance matrix, both objectives are the same. Each evaluation costs O(nk) with a low-rank :class:`.RiskModel`.
+
+    Args:
+        new_asset_values (np.ndarray): Market value of assets to buy.
+        current_asset_values (np.ndarray): Portfolio's current Market values of assets (in same currency as ``new_asset_values``).
+        target_allocation (np.ndarray): Target asset allocation (in decimal).
+        total_cash (float): Total cash available for investing.
+        risk_model (:class:`.RiskModel`): Covariance of the assets, in the same order as ``new_asset_values``.
+
+    Returns:
+        float: Value of objective function.
+    """
+    asset_vals = current_asset_values + new_asset_values
+    asset_alloc_diff = target_allocation - asset_vals / np.sum(asset_vals)
+    j1 = risk_model.variance(asset_alloc_diff) / _variance_scale(risk_model)
+
+    cash_diff = (total_cash - np.sum(new_asset_values)) / (total_cash + np.sum(new_asset_values))
+    j2 = cash_diff * cash_diff
+
+    return j1 + j2
+
+
+def tracking_error_objective_gradient(new_asset_values, current_asset_values, target_allocation, total_cash,
+                                      risk_model):
+    """
+    Gradient of :func:`tracking_error_objective` with respect to ``new_asset_values``.
+
+    Args:
+        new_asset_values (np.ndarray): Market value of assets to buy.
+        current_asset_values (np.ndarray): Portfolio's current Market values of assets (in same currency as ``new_asset_values``).
+        target_allocation (np.ndarray): Target asset allocation (in decimal).
+        total_cash (float): Total cash available for investing.
+        risk_model (:class:`.RiskModel`): Covariance of the assets, in the same order as ``new_asset_values``.
+
+    Returns:
+        np.ndarray: Gradient of the objective function.
+    """
+    asset_vals = current_asset_values + new_asset_values
+    tot_asset_val = np.sum(asset_vals)
+    current_allocation = asset_vals / tot_asset_val
+    # covariance times the allocation error, in place of the allocation error of rebalance_objective_gradient
+    weighted_diff = risk_model.dot(target_allocation - current_allocation) / _variance_scale(risk_model)
+
+    grad_j1 = -2. / tot_asset_val * (weighted_diff - np.inner(weighted_diff, current_allocation))
+
+    tot_new_val = np.sum(new_asset_values)
+    cash_diff = (total_cash - tot_new_val) / (total_cash + tot_new_val)
+    grad_j2 = -4. * cash_diff * total_cash / (total_cash + tot_new_val)**2
+
+    return grad_j1 + grad_j2
+
+
+def _variance_scale(risk_model):
+    # normalization of the tracking error terms; a model without variance would divide zero by zero
+    average_variance = risk_model.average_variance()
+    return average_variance if average_variance > 0. else 1.
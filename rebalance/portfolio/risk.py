@@ -0,0 +1,205 @@
+import hashlib
+
+import numpy as np
+
+
+class RiskModel:
+    """
+    Covariance of the returns of a set of assets, in factored low-rank form.
+
+    The covariance matrix is ``factors @ factors.T + diag(specific_variance)``, with one row of ``factors`` per asset
+    and one column per factor. It is never formed: products with it cost O(nk) for n assets and k factors, instead of O(n^2).
+    """
+    def __init__(self, tickers, loadings, factor_covariance=None, specific_variance=None):
+        """
+        Initialization.
+
+        Args:
+            tickers (Sequence[str]): Tickers of the assets.
+            loadings (np.ndarray): Exposure of each asset to each factor, one row per asset (in the same order as ``tickers``) and one column per factor.
+            factor_covariance (np.ndarray, optional): Covariance of the factors. Default is the identity (uncorrelated factors with unit variance).
+            specific_variance (np.ndarray, optional): Variance of each asset which is not explained by the factors. Default is zero.
+        """
+        self._tickers = tuple(tickers)
+        nb_assets = len(self._tickers)
+        loadings = np.array(loadings, dtype=float).reshape(nb_assets, -1)
+        if factor_covariance is not None:
+            # the factor covariance is folded into the loadings: B F B^T = (B F^1/2) (B F^1/2)^T
+            eigenvalues, eigenvectors = np.linalg.eigh(np.asarray(factor_covariance, dtype=float))
+            assert np.all(eigenvalues >= -1E-12 * max(1., np.max(np.abs(eigenvalues)))), \
+                   "factor_covariance must be positive semi-definite."
+            loadings = loadings @ (eigenvectors * np.sqrt(np.maximum(eigenvalues, 0.)))
+        if specific_variance is None:
+            specific_variance = np.zeros(nb_assets)
+
+        self._factors = loadings
+        self._specific_variance = np.array(specific_variance, dtype=float).reshape(nb_assets)
+        assert np.all(self._specific_variance >= 0.), "specific_variance must be non-negative."
+        self._factors.flags.writeable = False
+        self._specific_variance.flags.writeable = False
+        self._ticker_index = {ticker: i for i, ticker in enumerate(self._tickers)}
+        self._selections = {}
+        self._fingerprint = None
+
+    @classmethod
+    def from_covariance(cls, tickers, covariance, rank=None):
+        """
+        Factors a dense covariance matrix.
+
+        The ``rank`` largest principal components are kept as factors, and the variance they do not explain is kept as specific variance,
+        so the variance of each asset is preserved.
+
+        Args:
+            tickers (Sequence[str]): Tickers of the assets.
+            covariance (np.ndarray): Covariance matrix, in the same order as ``tickers``.
+            rank (int, optional): Number of factors kept. Default is all of them (the covariance is then exact).
+
+        Returns:
+            RiskModel: Risk model of the assets.
+        """
+        covariance = np.asarray(covariance, dtype=float)
+        assert covariance.shape == (len(tickers), len(tickers)), "covariance must be a square matrix matching `tickers`."
+
+        eigenvalues, eigenvectors = np.linalg.eigh(covariance)
+        if rank is not None:
+            assert rank >= 0, "rank must be non-negative."
+            eigenvalues = eigenvalues[len(eigenvalues) - rank:]
+            eigenvectors = eigenvectors[:, len(eigenvectors) - rank:]
+        factors = eigenvectors * np.sqrt(np.maximum(eigenvalues, 0.))
+        specific_variance = np.maximum(np.diag(covariance) - np.sum(factors * factors, axis=1), 0.)
+
+        return cls(tickers, factors, specific_variance=specific_variance)
+
+    @property
+    def tickers(self):
+        """
+        (Tuple[str]): Tickers of the assets.
+        """
+        return self._tickers
+
+    @property
+    def factors(self):
+        """
+        (np.ndarray): Read-only matrix of factors (loadings scaled by the factor covariance). One row per asset, one column per factor.
+        """
+        return self._factors
+
+    @property
+    def specific_variance(self):
+        """
+        (np.ndarray): Read-only vector of specific variances, in the same order as ``tickers``.
+        """
+        return self._specific_variance
+
+    @property
+    def rank(self):
+        """
+        (int): Number of factors.
+        """
+        return self._factors.shape[1]
+
+    @property
+    def fingerprint(self):
+        """
+        (str): Digest of the factors and specific variances. Risk models with the same covariance, in the same order, have the same fingerprint.
+        """
+        if self._fingerprint is None:
+            digest = hashlib.blake2b(digest_size=16)
+            digest.update(np.array(self._factors.shape, dtype=np.int64).tobytes())
+            digest.update(np.ascontiguousarray(self._factors).tobytes())
+            digest.update(self._specific_variance.tobytes())
+            self._fingerprint = digest.hexdigest()
+
+        return self._fingerprint
+
+    def select(self, tickers):
+        """
+        Risk model of some of the assets. The last selections are kept, so selecting the same assets again costs a lookup.
+
+        Args:
+            tickers (Sequence[str]): Tickers of the assets, in the order of interest.
+
+        Returns:
+            RiskModel: Risk model of the assets.
+        """
+        tickers = tuple(tickers)
+        if tickers == self._tickers:
+            return self
+        if tickers in self._selections:
+            return self._selections[tickers]
+
+        try:
+            rows = [self._ticker_index[ticker] for ticker in tickers]
+        except KeyError as e:
+            raise Exception("Asset is not part of the risk model: %s." % e)
+
+        selection = RiskModel(tickers, self._factors[rows], specific_variance=self._specific_variance[rows])
+        if len(self._selections) >= 16:
+            self._selections.pop(next(iter(self._selections)))
+        self._selections[tickers] = selection
+        return selection
+
+    def dot(self, weights):
+        """
+        Product of the covariance matrix with a vector, in O(nk).
+
+        Args:
+            weights (np.ndarray): Vector of interest, in the same order as ``tickers``.
+
+        Returns:
+            np.ndarray: Product of the covariance matrix with ``weights``.
+        """
+        return self._factors @ (self._factors.T @ weights) + self._specific_variance * weights
+
+    def variance(self, weights):
+        """
+        Variance of a portfolio (or of active weights), in O(nk).
+
+        Args:
+            weights (np.ndarray): Weight of each asset, in the same order as ``tickers``.
+
+        Returns:
+            float: ``weights.T @ covariance @ weights``.
+        """
+        exposures = self._factors.T @ weights
+        return float(np.inner(exposures, exposures) + np.inner(self._specific_variance * weights, weights))
+
+    def tracking_error(self, allocation, target_allocation):
+        """
+        Ex-ante tracking error of an asset allocation with respect to a target allocation.
+
+        Args:
+            allocation (np.ndarray): Asset allocation (in decimal), in the same order as ``tickers``.
+            target_allocation (np.ndarray): Target asset allocation (in decimal).
+
+        Returns:
+            float: Standard deviation of the difference of returns (in the unit of the covariance's square root).
+        """
+        return np.sqrt(self.variance(np.asarray(allocation) - np.asarray(target_allocation)))
+
+    def average_variance(self):
+        """
+        Average variance of the assets (the mean of the diagonal of the covariance matrix).
+
+        Returns:
+            float: Average variance.
+        """
+        if len(self._tickers) == 0:
+            return 0.
+
+        return (np.sum(self._factors * self._factors) + np.sum(self._specific_variance)) / len(self._tickers)
+
+    def largest_eigenvalue_bound(self):
+        """
+        Upper bound of the largest eigenvalue of the covariance matrix, in O(nk^2).
+
+        Returns:
+            float: Largest eigenvalue of ``factors.T @ factors`` plus the largest specific variance.
+        """
+        if len(self._tickers) == 0:
+            return 0.
+
+        bound = np.max(self._specific_variance)
+        if self.rank > 0:
+            bound += np.linalg.eigvalsh(self._factors.T @ self._factors)[-1]
+        return float(bound)
@@ -0,0 +1,99 @@
+import heapq
+
+import numpy as np
+
+
+def floor_units(values, prices):
+    """
+    Largest number of whole units of each asset worth at most the specified values.
+
+    Args:
+        values (np.ndarray): Market value of each asset.
+        prices (np.ndarray): Price of each asset (in the same currency as ``values``).
+
+    Returns:
+        np.ndarray: Number of units of each asset (int64).
+    """
+    return np.floor(values / prices).astype(np.int64)
+
+
+def greedy_units(units, prices, shortfalls, cash):
+    """
+    Spends leftover cash on whole units, one unit at a time, where it reduces the allocation error the most.
+
+    The allocation error is the sum of the squared shortfalls (target value minus value held) of the assets.
+    Buying one unit of asset i reduces it by ``prices[i] * (2 * shortfalls[i] - prices[i])``.
+    The best purchases are kept in a heap, so each unit bought costs O(log n).
+
+    Args:
+        units (np.ndarray): Number of units of each asset to buy so far.
+        prices (np.ndarray): Price of each asset.
+        shortfalls (np.ndarray): Target value of each asset minus its value once ``units`` are bought (in the same currency as ``prices``).
+        cash (float): Leftover cash (in the same currency as ``prices``).
+
+    Returns:
+        np.ndarray: Number of units of each asset to buy (int64).
+    """
+    units = np.array(units, dtype=np.int64)
+    shortfalls = np.array(shortfalls, dtype=float)
+
+    gains = prices * (2. * shortfalls - prices)
+    heap = [(-gain, i) for i, gain in enumerate(gains.tolist()) if gain > 0.]
+    heapq.heapify(heap)
+
+    while len(heap) > 0:
+        _, i = heapq.heappop(heap)
+        price = prices[i]
+        if price > cash:
+            # cash only decreases, so this asset will never be affordable again
+            continue
+
+        units[i] += 1
+        cash -= price
+        shortfalls[i] -= price
+        gain = price * (2. * shortfalls[i] - price)
+        if gain > 0.:
+            heapq.heappush(heap, (-gain, i))
+
+    return units
+
+
+def greedy_units_rows(units, prices, shortfalls, cash):
+    """
+    Row-wise counterpart of :func:`greedy_units`, for many portfolios holding the same assets.
+
+    At each step, every portfolio which can still reduce its allocation error buys one unit of its best asset,
+    so the units bought are the same as with :func:`greedy_units` applied to each row.
+
+    Args:
+        units (np.ndarray): Number of units of each asset to buy so far, one row per portfolio.
+        prices (np.ndarray): Price of each asset (shared by all portfolios).
+        shortfalls (np.ndarray): Target value of each asset minus its value once ``units`` are bought, one row per portfolio.
+        cash (np.ndarray): Leftover cash of each portfolio.
+
+    Returns:
+        np.ndarray: Number of units of each asset to buy (int64), one row per portfolio.
+    """
+    units = np.array(units, dtype=np.int64)
+    shortfalls = np.array(shortfalls, dtype=float)
+    cash = np.array(cash, dtype=float)
+
+    gains = prices * (2. * shortfalls - prices)
+    rows = np.arange(len(units))
+    while len(rows) > 0:
+        # cash only decreases, so a portfolio which cannot buy anything is done
+        eligible = (gains[rows] > 0.) & (prices <= cash[rows, np.newaxis])
+        active = np.any(eligible, axis=1)
+        rows = rows[active]
+        eligible = eligible[active]
+        if len(rows) == 0:
+            break
+
+        best = np.argmax(np.where(eligible, gains[rows], -np.inf), axis=1)
+        price = prices[best]
+        units[rows, best] += 1
+        cash[rows] -= price
+        shortfalls[rows, best] -= price
+        gains[rows, best] = price * (2. * shortfalls[rows, best] - price)
+
+    return units
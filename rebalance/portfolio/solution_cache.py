@@ -0,0 +1,138 @@
+from collections import OrderedDict
+
+import numpy as np
+
+from rebalance import instrumentation
+
+
+class SolutionCache:
+    """
+    Caches the solutions of :func:`.rebalance_optimizer`, to share them between portfolios which follow the same model.
+
+    :func:`.rebalance_objective` only depends on the values of the assets and the cash relative to the total value of the portfolio,
+    so a solution is stored relative to the total value and rescaled for every portfolio with the same normalized inputs:
+    the target allocation, the current weights of the assets and the weight of the cash (the weights are rounded to ``tolerance``).
+
+    The cache is looked up before any solver runs, so the solutions of all the solvers are cached.
+    At most ``maxsize`` solutions are kept (least recently used solutions are evicted first).
+    """
+    def __init__(self, maxsize=1024, tolerance=1E-4):
+        """
+        Initialization.
+
+        Args:
+            maxsize (int, optional): Maximum number of solutions kept in the cache. Default is 1024.
+            tolerance (float, optional): Precision to which the weights of the assets and of the cash are rounded (as a fraction of the total value).
+                Portfolios whose weights round to the same values share a solution. Default is 1E-4 (0.01%).
+        """
+        assert maxsize > 0, "maxsize must be positive."
+        assert tolerance > 0., "tolerance must be positive."
+
+        self._maxsize = maxsize
+        self._tolerance = tolerance
+        self._cache = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+
+    @property
+    def hits(self):
+        """
+        (int): Number of optimizations answered from the cache.
+        """
+        return self._hits
+
+    @property
+    def misses(self):
+        """
+        (int): Number of optimizations which were solved (and then cached).
+        """
+        return self._misses
+
+    @property
+    def hit_rate(self):
+        """
+        (float): Share of the lookups answered from the cache. Zero if there was no lookup.
+        """
+        lookups = self._hits + self._misses
+        return self._hits / lookups if lookups > 0 else 0.
+
+    def __len__(self):
+        return len(self._cache)
+
+    def key(self, current_asset_values, target_allocation, total_cash, options=()):
+        """
+        Normalized inputs of an optimization.
+
+        Args:
+            current_asset_values (np.ndarray): Current market value of each asset.
+            target_allocation (np.ndarray): Target allocation of each asset (in %).
+            total_cash (float): Cash available for investing (in the same currency as ``current_asset_values``).
+            options (tuple, optional): Options of the solver, which are part of the key.
+
+        Returns:
+            (tuple): Key of the solution, or None if the portfolio has no value.
+        """
+        total_value = np.sum(current_asset_values) + total_cash
+        if total_value <= 0.:
+            return None
+
+        weights = np.append(current_asset_values, total_cash) / total_value
+        return (tuple(options),
+                np.asarray(target_allocation, dtype=float).tobytes(),
+                np.round(weights / self._tolerance).astype(np.int64).tobytes())
+
+    def get(self, key, total_value, total_cash):
+        """
+        Cached solution, rescaled to a portfolio.
+
+        Args:
+            key (tuple): Key of the solution (see :meth:`key`).
+            total_value (float): Total value of the portfolio, cash included.
+            total_cash (float): Cash available for investing. The solution never spends more.
+
+        Returns:
+            (np.ndarray): Market value of each asset to purchase, or None if the solution is not cached.
+        """
+        if key is None or key not in self._cache:
+            self._misses += 1
+            instrumentation.count("solution_cache_misses")
+            return None
+
+        self._cache.move_to_end(key)
+        self._hits += 1
+        instrumentation.count("solution_cache_hits")
+
+        # the weights were rounded, so the rescaled solution may slightly exceed the cash
+        solution = np.clip(self._cache[key] * total_value, 0., total_cash)
+        spent = np.sum(solution)
+        if spent > total_cash:
+            solution *= total_cash / spent
+
+        return solution
+
+    def put(self, key, solution, total_value):
+        """
+        Caches a solution.
+
+        Args:
+            key (tuple): Key of the solution (see :meth:`key`).
+            solution (np.ndarray): Market value of each asset to purchase.
+            total_value (float): Total value of the portfolio, cash included.
+        """
+        if key is None:
+            return
+
+        normalized = np.array(solution, dtype=float) / total_value
+        normalized.flags.writeable = False
+        self._cache[key] = normalized
+        self._cache.move_to_end(key)
+        if len(self._cache) > self._maxsize:
+            self._cache.popitem(last=False)
+
+    def clear(self):
+        """
+        Empties the cache and resets the hit and miss counters.
+        """
+        self._cache.clear()
+        self._hits = 0
+        self._misses = 0
@@ -0,0 +1,177 @@
+import numpy as np
+
+from rebalance import instrumentation
+
+
+def project_simplex(values, total, support=None):
+    """
+    Euclidean projection onto the scaled simplex ``{x : x >= 0, sum(x) = total}``.
+
+    Uses the sort-based water-filling algorithm, in O(n log n).
+    If the positive entries of the projection are guessed right by ``support``, the projection costs O(n) instead.
+
+    Args:
+        values (np.ndarray): Point to project.
+        total (float): Sum of the entries of the projection.
+        support (np.ndarray, optional): Guess of the positive entries of the projection (boolean mask),
+            such as those of the projection of a nearby point. A wrong guess is detected, and the sort is then used.
+
+    Returns:
+        np.ndarray: Projection of ``values``. All zeros if ``total`` is not positive.
+    """
+    if total <= 0. or len(values) == 0:
+        return np.zeros(len(values))
+
+    if support is not None and np.any(support):
+        # the water level of the guessed support is right if it splits the values along the support
+        theta = (np.sum(values[support]) - total) / np.count_nonzero(support)
+        if np.all(values[support] > theta) and np.all(values[~support] <= theta):
+            return np.maximum(values - theta, 0.)
+
+    # find the water level theta such that sum(max(values - theta, 0)) = total
+    sorted_values = np.sort(values)[::-1]
+    excess = np.cumsum(sorted_values) - total
+    counts = np.arange(1, len(values) + 1)
+    rho = np.nonzero(sorted_values - excess / counts > 0.)[0][-1]
+    theta = excess[rho] / (rho + 1.)
+
+    return np.maximum(values - theta, 0.)
+
+
+def project_simplex_rows(values, totals):
+    """
+    Row-wise counterpart of :func:`project_simplex`: projects each row of ``values`` onto its own scaled simplex.
+
+    Args:
+        values (np.ndarray): Points to project, one per row.
+        totals (np.ndarray): Sum of the entries of each projection.
+
+    Returns:
+        np.ndarray: Projections of the rows of ``values``. Rows whose total is not positive are all zeros.
+    """
+    values = np.asarray(values, dtype=float)
+    totals = np.asarray(totals, dtype=float)
+    if values.shape[1] == 0:
+        return np.zeros(values.shape)
+
+    sorted_values = -np.sort(-values, axis=1)
+    excess = np.cumsum(sorted_values, axis=1) - totals[:, np.newaxis]
+    counts = np.arange(1, values.shape[1] + 1)
+    positive = sorted_values - excess / counts > 0.
+    # index of the last positive entry of each row (the first entry is positive whenever the total is)
+    rho = values.shape[1] - 1 - np.argmax(positive[:, ::-1], axis=1)
+    theta = excess[np.arange(len(values)), rho] / (rho + 1.)
+
+    projections = np.maximum(values - theta[:, np.newaxis], 0.)
+    projections[totals <= 0.] = 0.
+    return projections
+
+
+def solve_with_selling(target_allocation, total_cash):
+    """
+    Exact solution of the rebalancing problem when all assets may be sold.
+
+    Once everything is sold, the best allocation is simply the target allocation of the total cash.
+
+    Args:
+        target_allocation (np.ndarray): Target asset allocation (in decimal).
+        total_cash (float): Total cash available for investing (including the proceeds of the sales).
+
+    Returns:
+        np.ndarray: Market value of each asset to buy.
+    """
+    if total_cash <= 0.:
+        return np.zeros(len(target_allocation))
+
+    return target_allocation / np.sum(target_allocation) * total_cash
+
+
+def solve_buy_only(current_asset_values, target_allocation, total_cash, x0=None):
+    """
+    Exact solution of the rebalancing problem when assets may only be bought.
+
+    All the cash is invested and the allocation error is minimized:
+    the values to buy are the projection of the shortfall of each asset (target value minus current value)
+    onto the set of non-negative purchases summing up to ``total_cash`` (water-filling).
+
+    Args:
+        current_asset_values (np.ndarray): Portfolio's current market values of assets.
+        target_allocation (np.ndarray): Target asset allocation (in decimal).
+        total_cash (float): Total cash available for investing.
+        x0 (np.ndarray, optional): Solution of a nearby problem, such as the previous rebalancing of the portfolio.
+            The assets it buys are taken as the guess of the assets to buy, which skips the sort of the water-filling when right.
+
+    Returns:
+        np.ndarray: Market value of each asset to buy.
+    """
+    total_value = np.sum(current_asset_values) + total_cash
+    shortfall = target_allocation / np.sum(target_allocation) * total_value - current_asset_values
+
+    return project_simplex(shortfall, total_cash, None if x0 is None else x0 > 0.)
+
+
+def solve_tracking_error(current_asset_values, target_allocation, total_cash, risk_model, max_iterations=1000,
+                         tolerance=1E-10, x0=None):
+    """
+    Solution of the rebalancing problem which minimizes the ex-ante tracking error to the target allocation.
+
+    All the cash is invested and ``a.T @ covariance @ a`` is minimized, where ``a`` is the difference between
+    the asset allocation and the target allocation. This is a convex quadratic program over a scaled simplex,
+    solved with accelerated projected gradient steps (FISTA with adaptive restarts), starting from the solution of :func:`solve_buy_only`
+    (or from ``x0``).
+    Each iteration costs one product with the covariance matrix (O(nk) with a low-rank :class:`.RiskModel`) and one projection (O(n log n)).
+
+    If all assets were sold (``current_asset_values`` are all zero), this solves the problem with selling as well.
+
+    Args:
+        current_asset_values (np.ndarray): Portfolio's current market values of assets.
+        target_allocation (np.ndarray): Target asset allocation (in decimal).
+        total_cash (float): Total cash available for investing.
+        risk_model (:class:`.RiskModel`): Covariance of the assets, in the same order as ``current_asset_values``.
+        max_iterations (int, optional): Maximum number of iterations. Default is 1000.
+        tolerance (float, optional): The iterations stop when a step changes the allocation by less than this (in decimal). Default is 1E-10.
+        x0 (np.ndarray, optional): Market value of each asset to buy to start from, such as the solution of the previous rebalancing of the portfolio.
+
+    Returns:
+        np.ndarray: Market value of each asset to buy.
+    """
+    if total_cash <= 0. or len(current_asset_values) == 0:
+        return np.zeros(len(current_asset_values))
+
+    # work with allocations: the purchases u (in decimal of the total value) sum up to the cash weight
+    total_value = np.sum(current_asset_values) + total_cash
+    cash_weight = total_cash / total_value
+    active_target = target_allocation / np.sum(target_allocation) - current_asset_values / total_value
+
+    if x0 is None:
+        allocation = project_simplex(active_target, cash_weight)
+    else:
+        allocation = project_simplex(np.asarray(x0, dtype=float) / total_value, cash_weight)
+    lipschitz = 2. * risk_model.largest_eigenvalue_bound()
+    if lipschitz <= 0.:
+        return allocation * total_value
+
+    step = 1. / lipschitz
+    momentum = allocation
+    theta = 1.
+    iterations = 0
+    for iterations in range(1, max_iterations + 1):
+        gradient = -2. * risk_model.dot(active_target - momentum)
+        new_allocation = project_simplex(momentum - step * gradient, cash_weight)
+        change = new_allocation - allocation
+        if np.sqrt(np.inner(change, change)) <= tolerance:
+            allocation = new_allocation
+            break
+
+        if np.inner(momentum - new_allocation, change) > 0.:
+            # the momentum points uphill: restart the acceleration
+            theta = 1.
+            momentum = new_allocation
+        else:
+            new_theta = (1. + np.sqrt(1. + 4. * theta * theta)) / 2.
+            momentum = new_allocation + (theta - 1.) / new_theta * change
+            theta = new_theta
+        allocation = new_allocation
+
+    instrumentation.count("tracking_error_iterations", iterations)
+    return allocation * total_value
@@ -0,0 +1,230 @@
+import struct
+import zipfile
+from collections import namedtuple
+
+import numpy as np
+
+from rebalance import Cash
+from rebalance.market.snapshot import MarketSnapshot
+from rebalance.portfolio.holdings import Holdings
+
+
+_FORMAT_VERSION = 1
+
+LoadedPortfolios = namedtuple("LoadedPortfolios", ["portfolios", "snapshot"])
+LoadedPortfolios.__doc__ = """
+Outcome of :func:`load_portfolios`.
+
+Attributes:
+    portfolios (List[:class:`.Portfolio`]): Portfolios loaded, in the order they were saved (or of ``indices``).
+    snapshot (MarketSnapshot): Snapshot of the market saved with the portfolios.
+"""
+
+
+def save_portfolios(path, portfolios, snapshot=None):
+    """
+    Saves many portfolios, and a snapshot of the market, to one ``.npz`` file.
+
+    The file is columnar: the holdings and cash of all portfolios are stored in a few flat arrays
+    (with offsets delimiting each portfolio), and tickers and currencies are stored once, as codes.
+    It is written uncompressed, so it can be memory-mapped by :func:`load_portfolios`.
+
+    Args:
+        path (str): Path of the file.
+        portfolios (Sequence[:class:`.Portfolio`]): Portfolios to save.
+        snapshot (MarketSnapshot, optional): Snapshot of the market to save. Default is a snapshot captured with :meth:`.MarketSnapshot.capture_many`.
+    """
+    portfolios = list(portfolios)
+    if snapshot is None:
+        snapshot = MarketSnapshot.capture_many(portfolios)
+
+    ticker_codes = {}
+    names = []
+    currency_codes = {}
+
+    def ticker_code(ticker, name=None):
+        if ticker not in ticker_codes:
+            ticker_codes[ticker] = len(ticker_codes)
+            names.append(name)
+        return ticker_codes[ticker]
+
+    def currency_code(currency):
+        return currency_codes.setdefault(currency, len(currency_codes))
+
+    holding_offsets = [0]
+    holding_tickers = []
+    holding_quantities = []
+    holding_prices = []
+    holding_currencies = []
+    cash_offsets = [0]
+    cash_currencies = []
+    cash_amounts = []
+    common_currencies = []
+    selling_allowed = []
+    for portfolio in portfolios:
+        holdings = portfolio._holdings
+        holding_tickers.append(np.array(
+            [ticker_code(ticker, holdings.name(i)) for i, ticker in enumerate(holdings.tickers)], dtype=np.int32))
+        holding_quantities.append(holdings.quantities)
+        holding_prices.append(holdings.prices)
+        codes = np.array([currency_code(currency) for currency in holdings.currency_list], dtype=np.int32)
+        holding_currencies.append(codes[holdings.currency_codes])
+        holding_offsets.append(holding_offsets[-1] + len(holdings))
+
+        for currency, cash in portfolio.cash.items():
+            cash_currencies.append(currency_code(currency))
+            cash_amounts.append(cash.amount)
+        cash_offsets.append(len(cash_amounts))
+
+        common_currencies.append(currency_code(portfolio._common_currency.upper()))
+        selling_allowed.append(portfolio.selling_allowed)
+
+    arrays = {
+        "format_version": np.array([_FORMAT_VERSION]),
+        "holding_offsets": np.array(holding_offsets, dtype=np.int64),
+        "holding_tickers": _concatenate(holding_tickers, np.int32),
+        "holding_quantities": _concatenate(holding_quantities, np.int64),
+        "holding_prices": _concatenate(holding_prices, float),
+        "holding_currencies": _concatenate(holding_currencies, np.int32),
+        "cash_offsets": np.array(cash_offsets, dtype=np.int64),
+        "cash_currencies": np.array(cash_currencies, dtype=np.int32),
+        "cash_amounts": np.array(cash_amounts, dtype=float),
+        "common_currencies": np.array(common_currencies, dtype=np.int32),
+        "selling_allowed": np.array(selling_allowed, dtype=bool),
+        "snapshot_currencies": np.array([currency_code(currency) for currency in snapshot.currencies], dtype=np.int32),
+        "snapshot_rates": snapshot.rates,
+        "snapshot_tickers": np.array([ticker_code(ticker) for ticker in snapshot.tickers], dtype=np.int32),
+        "snapshot_prices": snapshot.prices,
+        "snapshot_asset_currencies": np.array(
+            [currency_code(currency) for currency in snapshot.asset_currencies], dtype=np.int32),
+    }
+    # the codes are assigned in order, so the dictionaries' keys are sorted by code
+    arrays["tickers"] = _strings(ticker_codes.keys())
+    arrays["names"] = _strings("" if name is None else name for name in names)
+    arrays["currencies"] = _strings(currency_codes.keys())
+
+    with open(path, "wb") as f:
+        np.savez(f, **arrays)
+
+
+def load_portfolios(path, indices=None, mmap=True):
+    """
+    Loads portfolios (and the snapshot of the market) saved by :func:`save_portfolios`. No network access is made.
+
+    Args:
+        path (str): Path of the file.
+        indices (Sequence[int], optional): Positions (in the file) of the portfolios to load. Default is all of them.
+        mmap (bool, optional): If True, the arrays of the file are memory-mapped rather than read, so only the pages
+            of the portfolios loaded are read from disk. Default is True.
+
+    Returns:
+        LoadedPortfolios: Portfolios and snapshot of the market.
+    """
+    from rebalance import Portfolio
+
+    arrays = _read_npz(path, mmap)
+    if int(arrays["format_version"][0]) != _FORMAT_VERSION:
+        raise Exception("Unsupported portfolio file format: %d." % int(arrays["format_version"][0]))
+
+    tickers = arrays["tickers"].tolist()
+    names = [None if name == "" else name for name in arrays["names"].tolist()]
+    currencies = arrays["currencies"].tolist()
+
+    holding_offsets = arrays["holding_offsets"].tolist()
+    cash_offsets = arrays["cash_offsets"].tolist()
+    common_currencies = arrays["common_currencies"].tolist()
+    selling_allowed = arrays["selling_allowed"].tolist()
+    if indices is None:
+        indices = range(len(holding_offsets) - 1)
+
+    portfolios = []
+    for i in indices:
+        start, end = holding_offsets[i], holding_offsets[i + 1]
+        codes = arrays["holding_tickers"][start:end].tolist()
+        row_currencies = np.asarray(arrays["holding_currencies"][start:end])
+        # currencies of the portfolio, in order of first appearance, as in Holdings.extend
+        currency_list = list(dict.fromkeys(row_currencies.tolist()))
+        local_codes = np.zeros(len(currencies), dtype=np.intp)
+        local_codes[currency_list] = np.arange(len(currency_list))
+
+        portfolio = Portfolio()
+        portfolio._holdings = Holdings.from_columns(
+            [tickers[code] for code in codes],
+            np.array(arrays["holding_quantities"][start:end], dtype=np.int64),
+            np.array(arrays["holding_prices"][start:end], dtype=float),
+            [currencies[code] for code in currency_list],
+            local_codes[row_currencies],
+            [names[code] for code in codes])
+
+        start, end = cash_offsets[i], cash_offsets[i + 1]
+        for code, amount in zip(arrays["cash_currencies"][start:end].tolist(),
+                                arrays["cash_amounts"][start:end].tolist()):
+            portfolio._cash[currencies[code]] = Cash(amount, currencies[code])
+
+        portfolio._common_currency = currencies[common_currencies[i]]
+        portfolio.selling_allowed = selling_allowed[i]
+        portfolios.append(portfolio)
+
+    snapshot = MarketSnapshot([currencies[code] for code in arrays["snapshot_currencies"].tolist()],
+                              np.array(arrays["snapshot_rates"]),
+                              tickers=[tickers[code] for code in arrays["snapshot_tickers"].tolist()],
+                              prices=np.array(arrays["snapshot_prices"]),
+                              asset_currencies=[currencies[code]
+                                                for code in arrays["snapshot_asset_currencies"].tolist()])
+
+    return LoadedPortfolios(portfolios, snapshot)
+
+
+def _concatenate(arrays, dtype):
+    if len(arrays) == 0:
+        return np.zeros(0, dtype=dtype)
+
+    return np.concatenate(arrays).astype(dtype, copy=False)
+
+
+def _strings(values):
+    values = list(values)
+    return np.array(values, dtype="U%d" % max([1] + [len(value) for value in values]))
+
+
+def _read_npz(path, mmap):
+    """
+    Reads the arrays of an uncompressed ``.npz`` file, optionally memory-mapped.
+
+    ``np.load`` ignores ``mmap_mode`` for ``.npz`` files. Since the members of an uncompressed archive
+    are stored contiguously, each one can be mapped at the offset of its data instead.
+    """
+    if not mmap:
+        with np.load(path, allow_pickle=False) as data:
+            return {key: data[key] for key in data.files}
+
+    arrays = {}
+    with zipfile.ZipFile(path) as archive, open(path, "rb") as f:
+        for info in archive.infolist():
+            key = info.filename[:-len(".npy")]
+            if info.compress_type != zipfile.ZIP_STORED:
+                with archive.open(info) as member:
+                    arrays[key] = np.lib.format.read_array(member, allow_pickle=False)
+                continue
+
+            # skip the local file header (30 bytes, then the file name and the extra field)
+            f.seek(info.header_offset)
+            name_length, extra_length = struct.unpack("<HH", f.read(30)[26:30])
+            f.seek(info.header_offset + 30 + name_length + extra_length)
+
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+
+            if dtype.hasobject:
+                raise Exception("Arrays of objects are not supported.")
+            if int(np.prod(shape)) == 0:
+                arrays[key] = np.zeros(shape, dtype=dtype)
+            else:
+                # plain view of the mapped memory: slicing np.memmap objects is much slower
+                arrays[key] = np.asarray(np.memmap(f, dtype=dtype, mode="r", offset=f.tell(), shape=shape,
+                                                   order="F" if fortran_order else "C"))
+
+    return arrays
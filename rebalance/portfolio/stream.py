@@ -0,0 +1,70 @@
+from collections import namedtuple
+
+from rebalance.market.snapshot import MarketSnapshot
+
+
+CashFlow = namedtuple("CashFlow", ["amount", "currency"])
+CashFlow.__doc__ = """
+Deposit (positive amount) or withdrawal (negative amount) of cash.
+
+Attributes:
+    amount (float): Amount of cash deposited or withdrawn.
+    currency (str): Currency of the amount.
+"""
+
+PriceUpdate = namedtuple("PriceUpdate", ["ticker", "price"])
+PriceUpdate.__doc__ = """
+New price of an asset.
+
+Attributes:
+    ticker (str): Ticker of the asset.
+    price (float): New price of the asset (in its own currency).
+"""
+
+
+def rebalance_stream(portfolio, events, target_allocation, snapshot=None, **options):
+    """
+    Rebalances a portfolio after each event of a stream of cash flows and price updates.
+
+    The events are consumed one at a time and a result is yielded as soon as each one is processed,
+    so the stream may be unbounded (e.g. read from a queue) and memory use does not grow with its length.
+    The rebalancings are incremental (see :meth:`.Portfolio.rebalance`): events which do not allow buying anything
+    (e.g. a small deposit) skip the optimization altogether.
+
+    Args:
+        portfolio (:class:`.Portfolio`): Portfolio to rebalance. It is rebalanced in place, after each event.
+        events (Iterable[CashFlow or PriceUpdate]): Stream of events.
+        target_allocation (Dict[str, float]): Target asset allocation of the portfolio (in %). The keys of the dictionary are the tickers of the assets.
+        snapshot (MarketSnapshot, optional): Snapshot of the market at the start of the stream. It is updated by the price updates.
+            Default is a snapshot captured with :meth:`.MarketSnapshot.capture`.
+        **options: Other keyword arguments of :meth:`.Portfolio.rebalance` (e.g. ``solver``), used for every rebalancing.
+
+    Yields:
+        (tuple): tuple containing:
+            * event (CashFlow or PriceUpdate): Event processed.
+            * result (RebalanceResult): Outcome of the rebalancing which followed the event.
+    """
+    assert "snapshot" not in options and "incremental" not in options, \
+           "snapshot and incremental are managed by the stream."
+
+    if snapshot is None:
+        snapshot = MarketSnapshot.capture(portfolio)
+
+    for event in events:
+        if isinstance(event, CashFlow):
+            currency = event.currency.upper()
+            if currency not in snapshot.currencies:
+                snapshot = MarketSnapshot.capture(portfolio, snapshot.currencies + (currency,))
+            # the withdrawal is checked before the portfolio is changed
+            common_currency = portfolio._common_currency
+            if not portfolio.selling_allowed and portfolio.cash_value(common_currency, snapshot) + \
+                    event.amount * snapshot.get_rate(currency, common_currency) < 0.:
+                raise Exception("Withdrawal of %.2f %s exceeds the cash available and selling is not allowed." %
+                                (-event.amount, currency))
+            portfolio.add_cash(event.amount, currency)
+        elif isinstance(event, PriceUpdate):
+            snapshot = snapshot.with_prices({event.ticker: event.price})
+        else:
+            raise Exception("Unknown event %r." % (event,))
+
+        yield event, portfolio.rebalance(target_allocation, snapshot=snapshot, incremental=True, **options)
@@ -0,0 +1,127 @@
+"""
+Test suite.
+
+By default, the tests run offline: quotes and exchange rates are replayed from ``fixtures/market_data.json``.
+The ``REBALANCE_MARKET_DATA`` environment variable selects the source of market data:
+
+* "replay" (default): the recorded quotes and rates are served back. No network access is made.
+* "live": quotes and rates are fetched from Yahoo Finance and forex_python.
+* "record": as "live", and every quote and rate fetched is added to the fixture file when the tests end.
+
+The shipped fixture file is synthetic: its values were written by hand, not recorded. Run ``make record_fixtures``
+with network access to replace them with real market data.
+
+The fixtures shared by the test modules (sources of quotes and rates, synthetic portfolios) are defined here too.
+Test cases which replace ``Asset.quote_provider`` or ``Cash.currency_rates`` derive from :class:`ProviderIsolation`.
+"""
+import atexit
+import os
+
+import numpy as np
+
+from rebalance import Asset
+from rebalance import Cash
+from rebalance import Portfolio
+from rebalance import QuoteProvider
+from rebalance import StaticQuoteProvider
+from rebalance.market import recording
+
+
+FIXTURE_PATH = os.path.join(os.path.dirname(__file__), "fixtures", "market_data.json")
+MARKET_DATA = os.environ.get("REBALANCE_MARKET_DATA", "replay")
+
+if MARKET_DATA == "replay":
+    _market_data = recording.replaying(FIXTURE_PATH)
+elif MARKET_DATA == "record":
+    _market_data = recording.recording(FIXTURE_PATH)
+elif MARKET_DATA == "live":
+    _market_data = None
+else:
+    raise Exception("Unknown REBALANCE_MARKET_DATA mode '%s' (replay, live or record)." % MARKET_DATA)
+
+if _market_data is not None:
+    _market_data.__enter__()
+    atexit.register(_market_data.__exit__, None, None, None)
+
+
+class ProviderIsolation:
+    """
+    Mixin of test cases which replace ``Asset.quote_provider`` or ``Cash.currency_rates``: both are restored after each test.
+
+    Must come before ``unittest.TestCase`` in the bases, and ``setUp`` must call ``super().setUp()``.
+    """
+    def setUp(self):
+        super().setUp()
+        quote_provider, currency_rates = Asset.quote_provider, Cash.currency_rates
+
+        def restore():
+            Asset.quote_provider, Cash.currency_rates = quote_provider, currency_rates
+
+        self.addCleanup(restore)
+
+
+class TableRates:
+    """
+    Source of rates defined by the value of each currency in CAD. Counts the lookups made to it.
+    """
+    cad_values = {"CAD": 1., "USD": 1.25, "GBP": 1.7, "EUR": 1.5}
+
+    def __init__(self):
+        self.nb_lookups = 0
+
+    def get_rate(self, from_currency, to_currency):
+        self.nb_lookups += 1
+        return self.cad_values[from_currency] / self.cad_values[to_currency]
+
+
+class OfflineRates:
+    """
+    Source of rates failing every lookup, as when the network is unreachable.
+    """
+    def get_rate(self, from_currency, to_currency):
+        raise ConnectionError("offline")
+
+
+class CountingQuoteProvider(QuoteProvider):
+    """
+    Wraps a provider, counts the number of requests made to it and keeps the tickers of the last one.
+    """
+    def __init__(self, provider):
+        self.provider = provider
+        self.nb_requests = 0
+        self.last_tickers = None
+
+    def get_quotes(self, tickers):
+        self.nb_requests += 1
+        self.last_tickers = list(tickers)
+        return self.provider.get_quotes(tickers)
+
+
+class OfflineQuoteProvider(StaticQuoteProvider):
+    """
+    Provider failing every request, as when the network is unreachable.
+    """
+    def get_quotes(self, tickers):
+        raise ConnectionError("offline")
+
+
+def make_portfolio(nb_assets, seed=0):
+    """
+    Portfolio of ``nb_assets`` synthetic assets (in CAD and USD) with CAD cash.
+    ``Asset.quote_provider`` is replaced by a provider of their quotes.
+    """
+    rng = np.random.default_rng(seed)
+    tickers = ["T%d" % i for i in range(nb_assets)]
+    prices = rng.uniform(10., 100., nb_assets)
+    Asset.quote_provider = StaticQuoteProvider(
+        {ticker: (price, "USD" if i % 2 else "CAD")
+         for i, (ticker, price) in enumerate(zip(tickers, prices))})
+
+    p = Portfolio()
+    p.easy_add_assets(tickers=tickers,
+                      quantities=rng.integers(0, 50, nb_assets).tolist())
+    p.add_cash(1000. * nb_assets, "CAD")
+
+    target = rng.uniform(0., 1., nb_assets)
+    target = target / np.sum(target) * 100.
+    return p, target
@@ -3,8 +3,6 @@ import unittest
 from rebalance import Asset
 from rebalance import Price
 
-import yfinance as yf
-
 
 class TestAsset(unittest.TestCase):
     def test_interface(self):
@@ -18,14 +16,14 @@ class TestAsset(unittest.TestCase):
         quantity = 2
         asset = Asset(ticker, quantity)
 
-        ticker_info = yf.Ticker(ticker).info
+        quote = Asset.quote_provider.get_quote(ticker)
 
         self.assertEqual(asset.quantity, quantity)
-        self.assertEqual(asset.price, yf.Ticker(ticker).info["regularMarketPrice"])
+        self.assertEqual(asset.price, quote.price)
         self.assertEqual(asset.ticker, ticker)
-        self.assertEqual(asset.currency, yf.Ticker(ticker).info["currency"])
+        self.assertEqual(asset.currency, quote.currency)
         self.assertEqual(asset.market_value(),
-                         yf.Ticker(ticker).info["regularMarketPrice"] * quantity)
+                         quote.price * quantity)
 
     def test_interface2(self):
         """
@@ -41,8 +39,8 @@ class TestAsset(unittest.TestCase):
 
         self.assertEqual(asset.quantity, quantity)
 
-        ticker_info = yf.Ticker(ticker).info
-        price = Price(ticker_info["regularMarketPrice"], currency=ticker_info["currency"])
+        quote = Asset.quote_provider.get_quote(ticker)
+        price = Price(quote.price, currency=quote.currency)
 
         self.assertEqual(asset.price_in("CAD"), price.price_in("CAD"))
         self.assertEqual(asset.market_value(), price.price * quantity)
@@ -60,8 +58,8 @@ class TestAsset(unittest.TestCase):
         quantity = 10
         asset = Asset(ticker, quantity)
 
-        ticker_info = yf.Ticker(ticker).info
-        price = Price(ticker_info["regularMarketPrice"], currency=ticker_info["currency"])
+        quote = Asset.quote_provider.get_quote(ticker)
+        price = Price(quote.price, currency=quote.currency)
 
         to_buy = 4
         self.assertEqual(asset.cost_of(to_buy), price.price * to_buy)
@@ -0,0 +1,186 @@
+import asyncio
+import threading
+import time
+import unittest
+
+import numpy as np
+
+from rebalance import Asset
+from rebalance import Cash
+from rebalance import CachedCurrencyRates
+from rebalance import MarketSnapshot
+from rebalance import Portfolio
+from rebalance import Quote
+from rebalance import StaticQuoteProvider
+from rebalance import YahooQuoteProvider
+from rebalance.tests import ProviderIsolation
+from rebalance.tests import TableRates
+
+
+class Concurrency:
+    """
+    Tracks the largest number of calls in flight at the same time.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.nb_calls = 0
+
+    def __enter__(self):
+        with self._lock:
+            self.nb_calls += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def __exit__(self, *args):
+        with self._lock:
+            self.in_flight -= 1
+
+
+class SlowYahooQuoteProvider(YahooQuoteProvider):
+    """
+    Yahoo provider whose requests take ``latency`` seconds and never reach the network.
+    """
+    latency = 0.01
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.concurrency = Concurrency()
+
+    def _fetch_batch(self, batch):
+        with self.concurrency:
+            time.sleep(self.latency)
+            return {ticker: Quote(10. + i, "USD" if i % 2 else "CAD", None)
+                    for ticker, i in ((ticker, int(ticker[1:])) for ticker in batch)}
+
+
+class SlowRates(TableRates):
+    """
+    Source of rates whose lookups take ``latency`` seconds.
+    """
+    latency = 0.01
+
+    def __init__(self):
+        super().__init__()
+        self.concurrency = Concurrency()
+
+    def get_rate(self, from_currency, to_currency):
+        with self.concurrency:
+            time.sleep(self.latency)
+            return super().get_rate(from_currency, to_currency)
+
+
+class TestAsync(ProviderIsolation, unittest.TestCase):
+    def test_quotes(self):
+        """
+        Test that batches of quotes are fetched concurrently, within the concurrency bound.
+        """
+        tickers = ["T%d" % i for i in range(40)]
+        provider = SlowYahooQuoteProvider(batch_size=5, max_concurrency=4)
+
+        start = time.perf_counter()
+        quotes = asyncio.run(provider.aget_quotes(tickers + tickers[:3]))
+        elapsed = time.perf_counter() - start
+
+        self.assertEqual(list(quotes.keys()), tickers)
+        self.assertEqual(quotes["T3"], Quote(13., "USD", None))
+        self.assertEqual(provider.concurrency.nb_calls, 8)
+        self.assertLessEqual(provider.concurrency.max_in_flight, 4)
+        # faster than the 8 requests in a row
+        self.assertLess(elapsed, 8 * SlowYahooQuoteProvider.latency)
+
+        # same quotes as the blocking interface
+        self.assertEqual(provider.get_quotes(tickers), quotes)
+
+        # default implementation runs the blocking interface in an executor
+        static = StaticQuoteProvider({"VCN.TO": (35.5, "CAD")})
+        self.assertEqual(asyncio.run(static.aget_quotes(["VCN.TO"]))["VCN.TO"].price, 35.5)
+        with self.assertRaises(Exception):
+            asyncio.run(static.aget_quotes(["TSLA"]))
+
+    def test_rates(self):
+        """
+        Test that missing exchange rates are fetched concurrently and cached.
+        """
+        source = SlowRates()
+        rates = CachedCurrencyRates(source)
+        pairs = [("cad", "usd"), ("CAD", "GBP"), ("CAD", "EUR"), ("USD", "EUR"), ("CAD", "USD"), ("CAD", "CAD")]
+
+        start = time.perf_counter()
+        fetched = asyncio.run(rates.aget_rates(pairs, max_concurrency=2))
+        elapsed = time.perf_counter() - start
+
+        self.assertEqual(source.concurrency.nb_calls, 4)
+        self.assertEqual(source.concurrency.max_in_flight, 2)
+        # faster than the 4 lookups in a row
+        self.assertLess(elapsed, 4 * SlowRates.latency)
+        self.assertAlmostEqual(fetched[("CAD", "USD")], 1. / 1.25)
+        self.assertEqual(fetched[("CAD", "CAD")], 1.)
+        self.assertEqual(rates.misses, 4)
+
+        # rates are cached
+        self.assertAlmostEqual(rates.get_rate("USD", "EUR"), 1.25 / 1.5)
+        asyncio.run(rates.aget_rates(pairs))
+        self.assertEqual(source.concurrency.nb_calls, 4)
+
+    def test_portfolio(self):
+        """
+        Test loading a portfolio and capturing a snapshot asynchronously.
+        """
+        Asset.quote_provider = SlowYahooQuoteProvider(batch_size=50)
+        source = SlowRates()
+        Cash.currency_rates = CachedCurrencyRates(source)
+
+        tickers = ["T%d" % i for i in range(200)]
+        p = Portfolio()
+        p.add_cash(1000., "cad")
+        p.add_cash(200., "gbp")
+        asyncio.run(p.aeasy_add_assets(tickers, list(range(200))))
+
+        self.assertEqual(Asset.quote_provider.concurrency.nb_calls, 4)
+        self.assertEqual(Asset.quote_provider.concurrency.max_in_flight, 4)
+        self.assertEqual(p.assets["T5"].quantity, 5)
+        self.assertEqual(p.assets["T5"].price, 15.)
+        self.assertEqual(source.concurrency.nb_calls, 2)  # CAD to USD and to GBP
+
+        # the snapshot is captured from the cache
+        snapshot = asyncio.run(MarketSnapshot.acapture_many([p], currencies=["EUR"]))
+        self.assertEqual(source.concurrency.nb_calls, 3)
+        expected = MarketSnapshot.capture(p, currencies=["EUR"])
+        self.assertEqual(snapshot.currencies, expected.currencies)
+        np.testing.assert_allclose(snapshot.rates, expected.rates)
+        np.testing.assert_array_equal(snapshot.prices, expected.prices)
+
+        # a source of rates without asynchronous interface
+        Cash.currency_rates = source
+        source.concurrency = Concurrency()
+        snapshot = asyncio.run(MarketSnapshot.acapture_many([p], refresh_quotes=True, max_concurrency=1))
+        self.assertEqual(source.concurrency.nb_calls, 3)
+        self.assertEqual(source.concurrency.max_in_flight, 1)
+        self.assertEqual(snapshot.tickers, expected.tickers)
+        np.testing.assert_allclose(snapshot.get_rate("GBP", "USD"), 1.7 / 1.25)
+
+
+    def test_lazy_assets(self):
+        """
+        Test that lazy assets are priced asynchronously too, in the same request as the assets added.
+        """
+        class AsyncOnlyQuoteProvider(SlowYahooQuoteProvider):
+            def get_quotes(self, tickers):
+                raise AssertionError("the event loop would be blocked")
+
+        Asset.quote_provider = AsyncOnlyQuoteProvider()
+        Cash.currency_rates = CachedCurrencyRates(SlowRates())
+
+        p = Portfolio()
+        p.easy_add_assets(["T1", "T2"], [1, 2], lazy=True)
+        asyncio.run(p.aeasy_add_assets(["T3"], [3]))
+
+        self.assertEqual(Asset.quote_provider.concurrency.nb_calls, 1)
+        self.assertEqual(list(p.assets.keys()), ["T1", "T2", "T3"])
+        self.assertEqual(p.assets["T2"].price, 12.)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from rebalance import Asset
+from rebalance import MarketSnapshot
+from rebalance import Portfolio
+from rebalance import PriceHistory
+from rebalance import StaticQuoteProvider
+from rebalance import backtest
+from rebalance import synthetic_history
+from rebalance.tests import ProviderIsolation
+
+
+class TestBacktest(ProviderIsolation, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.tickers = ["T%d" % i for i in range(6)]
+        self.history = synthetic_history(self.tickers, 250)
+
+    def test_price_history(self):
+        """
+        Test interface of PriceHistory class.
+        """
+        history = self.history
+        self.assertEqual(history.prices.shape, (250, 6))
+        self.assertEqual(history.currencies, ("CAD", "USD"))
+        self.assertEqual(str(history.dates[0]), "2000-01-03")
+        self.assertEqual(str(history.dates[5]), "2000-01-10")  # weekdays only
+        np.testing.assert_array_equal(history.rates[:, 0], 1.)
+        usd = history.asset_currencies.index("USD")
+        np.testing.assert_allclose(history.base_prices()[:, usd], history.prices[:, usd] * history.rates[:, 1])
+
+        # the history of a ticker does not depend on the other tickers
+        np.testing.assert_array_equal(synthetic_history(["T3"], 250).prices[:, 0], history.prices[:, 3])
+        np.testing.assert_array_equal(history.select(["T3", "T1"]).prices, history.prices[:, [3, 1]])
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "history.npz")
+            history.save(path)
+            loaded = PriceHistory.load(path)
+        self.assertEqual(loaded.tickers, history.tickers)
+        self.assertEqual(loaded.asset_currencies, history.asset_currencies)
+        np.testing.assert_array_equal(loaded.dates, history.dates)
+        np.testing.assert_array_equal(loaded.prices, history.prices)
+        np.testing.assert_array_equal(loaded.rates, history.rates)
+
+        # error handling
+        with self.assertRaises(Exception):
+            history.select(["TSLA"])
+        with self.assertRaises(AssertionError):
+            PriceHistory(["2020-01-02", "2020-01-01"], ["A"], [[1.], [2.]], ["CAD"])
+        with self.assertRaises(AssertionError):
+            PriceHistory(["2020-01-01"], ["A", "B"], [[1., 2.]], ["CAD", "USD"])
+
+    def test_matches_rebalance(self):
+        """
+        Test that the backtest rebalances as Portfolio.rebalance does, in both selling modes.
+        """
+        history = self.history
+        rates = history.rates[0]
+        snapshot = MarketSnapshot(history.currencies, rates[:, np.newaxis] / rates[np.newaxis, :],
+                                  self.tickers, history.prices[0], history.asset_currencies)
+        Asset.quote_provider = StaticQuoteProvider(
+            {ticker: (price, currency)
+             for ticker, price, currency in zip(self.tickers, history.prices[0], history.asset_currencies)})
+
+        rng = np.random.default_rng(0)
+        quantities = rng.integers(0, 30, (20, 6))
+        cash = rng.uniform(0., 5000., 20)
+        targets = rng.uniform(0., 1., (20, 6))
+        targets = targets / np.sum(targets, axis=1, keepdims=True) * 100.
+
+        for selling_allowed in (False, True):
+            result = backtest(history, quantities, cash, targets, every=1000, selling_allowed=selling_allowed)
+            for i in range(20):
+                p = Portfolio()
+                p.easy_add_assets(self.tickers, quantities[i].tolist())
+                p.add_cash(cash[i], "CAD")
+                p.selling_allowed = selling_allowed
+                new_units = p.rebalance(dict(zip(self.tickers, targets[i])), snapshot=snapshot).new_units
+                np.testing.assert_array_equal(result.units[i] - quantities[i],
+                                              [new_units[ticker] for ticker in self.tickers])
+                self.assertAlmostEqual(result.cash[i], p.cash_value("CAD", snapshot))
+
+    def test_policies(self):
+        """
+        Test calendar, threshold and buy-and-hold policies with contributions.
+        """
+        history = self.history
+        prices = history.base_prices()
+        target = np.full(6, 100. / 6.)
+        contributions = np.where(np.arange(250) % 21 == 0, 1000., 0.)
+        quantities = np.zeros((3, 6))
+        cash = [10000., 20000., 0.]
+
+        calendar = backtest(history, quantities, cash, target, contributions, every=21)
+        np.testing.assert_array_equal(calendar.nb_rebalances, [12, 12, 12])
+        self.assertGreater(calendar.turnover[0], 0.)
+        self.assertLess(calendar.cash_drag[1], 1.)
+
+        threshold = backtest(history, quantities, cash, target, contributions, threshold=[2., 10., 2.])
+        self.assertGreater(threshold.nb_rebalances[0], threshold.nb_rebalances[1])
+        self.assertLess(threshold.drift[0], threshold.drift[1])
+
+        hold = backtest(history, quantities, cash, target, contributions)
+        np.testing.assert_array_equal(hold.nb_rebalances, [0, 0, 0])
+        np.testing.assert_array_equal(hold.units, quantities)
+        np.testing.assert_allclose(hold.cash_drag, [100., 100., 100.])
+
+        # a portfolio fully invested on every date has no cash drag
+        single = PriceHistory(history.dates[:5], ["T0"], np.full(5, 10.), ["CAD"])
+        invested = backtest(single, [[0]], [1000.], [100.], every=1)
+        np.testing.assert_array_equal(invested.units, [[100]])
+        np.testing.assert_allclose(invested.cash, [0.])
+        np.testing.assert_allclose(invested.cash_drag, [0.], atol=1e-12)
+
+        # the value is that of the holdings and cash, and contributions are all accounted for
+        for result in (calendar, threshold, hold):
+            np.testing.assert_allclose(result.values[-1], result.units @ prices[-1] + result.cash)
+            self.assertTrue(np.all(result.cash >= -1e-9))
+        np.testing.assert_allclose(hold.cash, np.array(cash) + np.sum(contributions))
+
+        # error handling
+        with self.assertRaises(AssertionError):
+            backtest(history, quantities, cash, np.full(6, 10.), every=21)
+        with self.assertRaises(AssertionError):
+            backtest(history, quantities, cash, target, integer_allocation="round")
+
+
+if __name__ == '__main__':
+    unittest.main()
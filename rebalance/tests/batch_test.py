@@ -0,0 +1,74 @@
+import unittest
+
+from rebalance import Asset
+from rebalance import Cash
+from rebalance import CachedCurrencyRates
+from rebalance import Portfolio
+from rebalance import StaticQuoteProvider
+from rebalance import rebalance_many
+from rebalance.tests import CountingQuoteProvider
+from rebalance.tests import ProviderIsolation
+from rebalance.tests import TableRates
+
+
+class TestRebalanceMany(ProviderIsolation, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.provider = CountingQuoteProvider(StaticQuoteProvider({
+            "XBB.TO": (33.4, "CAD"),
+            "XIC.TO": (24.3, "CAD"),
+            "ITOT": (69.4, "USD"),
+            "IEFA": (57.7, "USD"),
+        }))
+        Asset.quote_provider = self.provider
+        self.rates = TableRates()
+        Cash.currency_rates = CachedCurrencyRates(self.rates)
+
+    def make_portfolios(self, nb_portfolios):
+        portfolios = []
+        for i in range(nb_portfolios):
+            p = Portfolio()
+            p.easy_add_assets(tickers=["XBB.TO", "XIC.TO", "ITOT", "IEFA"],
+                              quantities=[i, 2 * i, 3, 0])
+            p.add_cash(1000. + 100. * i, "USD" if i % 2 else "CAD")
+            p.selling_allowed = i % 3 == 0
+            portfolios.append(p)
+        return portfolios
+
+    def test_rebalance_many(self):
+        """
+        Test that rebalancing many portfolios gives the same results as rebalancing them one by one.
+        """
+        target = {"XBB.TO": 25, "XIC.TO": 25, "ITOT": 30, "IEFA": 20}
+
+        expected = []
+        expected_values = []
+        for p in self.make_portfolios(10):
+            expected.append(p.rebalance(target))
+            expected_values.append(p.value("CAD"))
+
+        for processes in (1, 2):
+            portfolios = self.make_portfolios(10)
+            self.provider.nb_requests = 0
+            self.rates.nb_lookups = 0
+            Cash.currency_rates.clear()
+            batch = rebalance_many(portfolios, target, processes=processes, chunksize=3,
+                                   refresh_quotes=True)
+
+            self.assertEqual(self.provider.nb_requests, 1)
+            self.assertEqual(self.rates.nb_lookups, 1)  # CAD to USD
+            self.assertEqual(len(batch.results), 10)
+            for result, expected_result in zip(batch.results, expected):
+                self.assertEqual(result[0], expected_result[0])
+                self.assertAlmostEqual(result[3], expected_result[3])
+            for p, value in zip(portfolios, expected_values):
+                self.assertAlmostEqual(p.value("CAD"), value)
+            self.assertGreaterEqual(batch.timings["total"], batch.timings["solve"])
+
+        # error handling
+        with self.assertRaises(Exception):
+            rebalance_many(self.make_portfolios(2), [target])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,35 @@
+import contextlib
+import glob
+import io
+import os
+import runpy
+import unittest
+
+import rebalance
+
+
+CASES_DIRECTORY = os.path.join(os.path.dirname(rebalance.__file__), "cases")
+
+
+class TestCases(unittest.TestCase):
+    def test_cases(self):
+        """
+        Test that every scenario of the cases directory runs.
+        """
+        paths = sorted(glob.glob(os.path.join(CASES_DIRECTORY, "*.py")))
+        paths = [path for path in paths if not path.endswith("__init__.py")]
+        self.assertGreater(len(paths), 0)
+
+        for path in paths:
+            with self.subTest(case=os.path.basename(path)):
+                output = io.StringIO()
+                with contextlib.redirect_stdout(output):
+                    variables = runpy.run_path(path, run_name="__main__")
+
+                self.assertIn("Remaining cash:", output.getvalue())
+                portfolio = variables["p"]
+                self.assertAlmostEqual(sum(portfolio.asset_allocation().values()), 100., 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,8 +2,7 @@ import unittest
 
 from rebalance import Cash
 from rebalance import Price
-
-from forex_python.converter import CurrencyRates
+from rebalance import CachedCurrencyRates
 
 
 class TestCash(unittest.TestCase):
@@ -20,7 +19,7 @@ class TestCash(unittest.TestCase):
         # currency coversion to itself
         self.assertEqual(cash.amount_in(currency), amount)
 
-        ex_rate = CurrencyRates()
+        ex_rate = Cash.currency_rates
         self.assertEqual(cash.exchange_rate("usd"),
                          ex_rate.get_rate(currency, "USD"))
         self.assertEqual(cash.amount_in("usd"),
@@ -41,10 +40,65 @@ class TestPrice(unittest.TestCase):
         # currency conversion to itself
         self.assertEqual(cash.price_in(currency), price)
 
-        ex_rate = CurrencyRates()
+        ex_rate = Cash.currency_rates
         self.assertEqual(cash.price_in("usd"),
                          ex_rate.get_rate(currency, "USD") * price)
 
 
+class FixedRates:
+    """
+    Source of constant rates which counts the lookups made to it.
+    """
+    def __init__(self):
+        self.nb_lookups = 0
+
+    def get_rate(self, from_currency, to_currency):
+        self.nb_lookups += 1
+        return 2.0
+
+
+class TestCachedCurrencyRates(unittest.TestCase):
+    def test_interface(self):
+        """
+        Test caching of rates, identity lookups, and hit/miss counters.
+        """
+        source = FixedRates()
+        rates = CachedCurrencyRates(source)
+
+        self.assertEqual(rates.get_rate("cad", "CAD"), 1.0)
+        self.assertEqual(rates.get_rate("CAD", "USD"), 2.0)
+        self.assertEqual(rates.get_rate("cad", "usd"), 2.0)
+        self.assertEqual(source.nb_lookups, 1)
+        self.assertEqual(rates.hits, 2)
+        self.assertEqual(rates.misses, 1)
+
+        rates.clear()
+        self.assertEqual(rates.hits, 0)
+        rates.get_rate("CAD", "USD")
+        self.assertEqual(source.nb_lookups, 2)
+
+    def test_eviction(self):
+        """
+        Test TTL expiry and LRU eviction.
+        """
+        source = FixedRates()
+        rates = CachedCurrencyRates(source, ttl=0.)
+        rates.get_rate("CAD", "USD")
+        rates.get_rate("CAD", "USD")
+        self.assertEqual(source.nb_lookups, 2)
+
+        source = FixedRates()
+        rates = CachedCurrencyRates(source, maxsize=2)
+        rates.get_rate("CAD", "USD")
+        rates.get_rate("CAD", "EUR")
+        rates.get_rate("CAD", "USD")  # CAD->EUR is now the least recently used
+        rates.get_rate("CAD", "GBP")
+        self.assertEqual(source.nb_lookups, 3)
+        rates.get_rate("CAD", "USD")
+        self.assertEqual(source.nb_lookups, 3)
+        rates.get_rate("CAD", "EUR")
+        self.assertEqual(source.nb_lookups, 4)
+
+
 if __name__ == '__main__':
     unittest.main()
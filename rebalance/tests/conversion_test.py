@@ -0,0 +1,102 @@
+import unittest
+
+from rebalance import Cash
+from rebalance import MarketSnapshot
+from rebalance import Portfolio
+from rebalance.cash.conversion import plan_conversions
+from rebalance.tests import ProviderIsolation
+from rebalance.tests import TableRates
+
+
+class TestConversion(ProviderIsolation, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.rates = TableRates()
+        Cash.currency_rates = self.rates
+        currencies = ["CAD", "USD", "GBP", "EUR"]
+        self.snapshot = MarketSnapshot(currencies, [[TableRates.cad_values[from_currency] / TableRates.cad_values[to_currency]
+                                                     for to_currency in currencies] for from_currency in currencies])
+
+    def test_fewest_conversions(self):
+        """
+        Test that each deficit is covered in as few conversions as possible.
+        """
+        available = {"CAD": 1000., "GBP": 100., "EUR": 200., "USD": 50.}
+
+        # the smallest currency which covers the deficit on its own
+        history = plan_conversions(available, {"USD": 150.}, self.snapshot)
+        self.assertEqual(len(history), 1)
+        (from_amount, from_currency, to_amount, to_currency, rate) = history[0]
+        self.assertEqual((from_currency, to_currency), ("GBP", "USD"))
+        self.assertAlmostEqual(to_amount, 100.)
+        self.assertAlmostEqual(from_amount * 1.7, 100. * 1.25)
+        self.assertAlmostEqual(rate, 1.7 / 1.25)
+
+        # no currency covers the deficit on its own: the largest ones are used up first
+        history = plan_conversions({"CAD": 100., "GBP": 100., "EUR": 100.}, {"USD": 300.}, self.snapshot)
+        self.assertEqual([conversion[1] for conversion in history], ["GBP", "EUR", "CAD"])
+        self.assertAlmostEqual(history[0][0], 100.)
+        self.assertAlmostEqual(history[1][0], 100.)
+        self.assertAlmostEqual(history[2][0], 300. * 1.25 - 170. - 150.)
+        self.assertAlmostEqual(sum(conversion[2] for conversion in history), 300.)
+
+        # not enough cash: everything is converted
+        history = plan_conversions({"CAD": 100., "GBP": 10.}, {"USD": 1000.}, self.snapshot)
+        self.assertEqual([conversion[0] for conversion in history], [100., 10.])
+
+        # nothing to convert
+        self.assertEqual(plan_conversions(available, {"CAD": 1000.}, self.snapshot), [])
+        self.assertEqual(plan_conversions({"CAD": 10.}, {"USD": 0.}, self.snapshot), [])
+
+        # deterministic, whatever the order of the currencies
+        self.assertEqual(plan_conversions(available, {"USD": 150., "CAD": 1100.}, self.snapshot),
+                         plan_conversions(dict(reversed(list(available.items()))),
+                                          {"CAD": 1100., "usd": 150.}, self.snapshot))
+
+    def test_cheapest_conversions(self):
+        """
+        Test that the conversions of lowest total spread are planned when spreads are specified.
+        """
+        available = {"CAD": 1000., "GBP": 100., "EUR": 200.}
+        needed = {"USD": 150.}
+        spreads = {("GBP", "USD"): 0.02, ("EUR", "USD"): 0.01, ("CAD", "USD"): 0.005}
+
+        history = plan_conversions(available, needed, self.snapshot, spreads)
+        self.assertEqual(len(history), 1)
+        self.assertEqual(history[0][1], "CAD")
+        self.assertAlmostEqual(history[0][2], 150.)
+
+        # the cheapest currency does not cover the deficit on its own
+        history = plan_conversions({"CAD": 100., "GBP": 100., "EUR": 200.}, needed, self.snapshot, spreads)
+        self.assertEqual([conversion[1] for conversion in history], ["CAD", "EUR"])
+        self.assertAlmostEqual(history[0][0], 100.)
+        self.assertAlmostEqual(sum(conversion[2] for conversion in history), 150.)
+
+        # not enough cash
+        history = plan_conversions({"CAD": 100., "GBP": 10.}, {"USD": 1000.}, self.snapshot, spreads)
+        self.assertAlmostEqual(sum(conversion[2] for conversion in history), (100. + 17.) / 1.25)
+
+    def test_portfolio(self):
+        """
+        Test the currency conversions of a portfolio, with one rate lookup per currency.
+        """
+        p = Portfolio()
+        p.easy_add_cash([1000., 100., 200.], ["CAD", "GBP", "EUR"])
+        initial_value = p.cash_value("CAD")
+
+        self.rates.nb_lookups = 0
+        history = p._smart_exchange({"USD": 150., "CAD": 50.})
+        self.assertLessEqual(self.rates.nb_lookups, 4)
+        self.assertEqual(len(history), 1)
+        self.assertAlmostEqual(p.cash["USD"].amount, 150.)
+        self.assertAlmostEqual(p.cash["EUR"].amount, 200. - 150. * 1.25 / 1.5)
+        self.assertAlmostEqual(p.cash_value("CAD"), initial_value)
+
+        p.conversion_spreads = {("gbp", "usd"): 0.02, ("EUR", "USD"): 0.01}
+        self.assertEqual(p.conversion_spreads[("GBP", "USD")], 0.02)
+        history = p._smart_exchange({"USD": 300.})
+        self.assertEqual([conversion[1] for conversion in history], ["CAD"])
+
+
+if __name__ == '__main__':
+    unittest.main()
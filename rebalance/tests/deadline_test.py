@@ -0,0 +1,197 @@
+import time
+import unittest
+
+import numpy as np
+
+from rebalance import Asset
+from rebalance import Cash
+from rebalance import CachedCurrencyRates
+from rebalance import Deadline
+from rebalance import DeadlineExceeded
+from rebalance import MarketSnapshot
+from rebalance import Portfolio
+from rebalance import StaticQuoteProvider
+from rebalance import Tracer
+from rebalance import rebalance_many
+from rebalance.portfolio import rebalancing_helper
+from rebalance.tests import ProviderIsolation
+from rebalance.tests import TableRates
+from rebalance.tests import make_portfolio
+
+
+class SlowRates(TableRates):
+    """
+    Source of rates which stalls on every lookup.
+    """
+    def get_rate(self, from_currency, to_currency):
+        time.sleep(1.)
+        return super().get_rate(from_currency, to_currency)
+
+
+class SlowQuoteProvider(StaticQuoteProvider):
+    """
+    Source of quotes which stalls on every request.
+    """
+    def get_quotes(self, tickers):
+        time.sleep(1.)
+        return super().get_quotes(tickers)
+
+
+class IterationDeadline(Deadline):
+    """
+    Deadline which passes after a number of checks, to stop the solver at a known iteration.
+    """
+    def __init__(self, nb_checks):
+        super().__init__(60.)
+        self.nb_checks = nb_checks
+
+    def expired(self):
+        self.nb_checks -= 1
+        return self.nb_checks < 0
+
+
+class TestDeadline(ProviderIsolation, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        Asset.quote_provider = StaticQuoteProvider({
+            "XBB.TO": (25., "CAD"),
+            "XIC.TO": (20., "CAD"),
+            "ITOT": (80., "USD"),
+        })
+        Cash.currency_rates = CachedCurrencyRates(TableRates())
+        self.target = {"XBB.TO": 40., "XIC.TO": 40., "ITOT": 20.}
+
+    def make_portfolio(self):
+        p = Portfolio()
+        p.easy_add_assets(tickers=["XBB.TO", "XIC.TO", "ITOT"], quantities=[10, 10, 2])
+        p.add_cash(1000., "CAD")
+        return p
+
+    def test_run(self):
+        """
+        Test that calls within a deadline give up when it passes.
+        """
+        deadline = Deadline(0.05)
+        self.assertEqual(deadline.run(max, 1, 2), 2)
+        with self.assertRaises(ZeroDivisionError):
+            deadline.run(lambda: 1 / 0)
+
+        start = time.monotonic()
+        with self.assertRaises(DeadlineExceeded):
+            deadline.run(time.sleep, 1.)
+        self.assertLess(time.monotonic() - start, 0.5)
+        self.assertTrue(deadline.expired())
+        self.assertEqual(deadline.remaining(), 0.)
+
+        # nothing is called once the deadline has passed
+        calls = []
+        with self.assertRaises(DeadlineExceeded):
+            deadline.run(calls.append, 1)
+        self.assertEqual(calls, [])
+
+    def test_stalled_rates(self):
+        """
+        Test that a rebalancing answers in time, without trades, when the exchange rates stall.
+        """
+        p = self.make_portfolio()
+        Cash.currency_rates = CachedCurrencyRates(SlowRates())
+
+        start = time.monotonic()
+        result = p.rebalance(self.target, tracer=Tracer(), time_budget=0.1)
+        self.assertLess(time.monotonic() - start, 0.5)
+        self.assertTrue(result.approximate)
+        self.assertEqual(result.new_units, {"XBB.TO": 0, "XIC.TO": 0, "ITOT": 0})
+        self.assertTrue(np.isnan(result.max_diff))
+        self.assertEqual(result.metrics.counters["deadline_exceeded"], 1)
+        self.assertAlmostEqual(p.cash["CAD"].amount, 1000.)
+
+        # with a budget large enough, nothing is approximate
+        Cash.currency_rates = CachedCurrencyRates(TableRates())
+        result = p.rebalance(self.target, solver="slsqp", time_budget=10.)
+        self.assertFalse(result.approximate)
+        self.assertGreater(sum(result.new_units.values()), 0)
+
+    def test_stalled_lazy_quotes(self):
+        """
+        Test that the time budget also bounds the pricing of lazy assets, which are left pending when their quotes stall.
+        """
+        p = Portfolio()
+        p.easy_add_assets(tickers=["XBB.TO", "XIC.TO"], quantities=[10, 10])
+        p.easy_add_assets(tickers=["ITOT"], quantities=[2], lazy=True)
+        p.add_cash(1000., "CAD")
+        Asset.quote_provider = SlowQuoteProvider({"ITOT": (80., "USD")})
+
+        start = time.monotonic()
+        result = p.rebalance(self.target, tracer=Tracer(), time_budget=0.1)
+        self.assertLess(time.monotonic() - start, 0.5)
+        self.assertTrue(result.approximate)
+        self.assertEqual(result.new_units, {"XBB.TO": 0, "XIC.TO": 0, "ITOT": 0})
+        self.assertEqual(result.prices["XBB.TO"], [25., "CAD"])
+        self.assertTrue(np.isnan(result.prices["ITOT"][0]))
+        self.assertEqual(result.metrics.counters["deadline_exceeded"], 1)
+        self.assertEqual(len(p._pending_assets), 1)
+
+        # an invalid target is still reported
+        with self.assertRaises(Exception):
+            p.rebalance({"XBB.TO": 50., "XIC.TO": 50.}, time_budget=0.1)
+
+        # the quotes are fetched once the budget allows it
+        Asset.quote_provider = StaticQuoteProvider({"ITOT": (80., "USD")})
+        result = p.rebalance(self.target, time_budget=10.)
+        self.assertFalse(result.approximate)
+        self.assertEqual(result.prices["ITOT"], [80., "USD"])
+
+    def test_solver(self):
+        """
+        Test that the SLSQP solver returns the best feasible solution at hand when the deadline passes.
+        """
+        p, target = make_portfolio(50)
+        snapshot = MarketSnapshot.capture(p)
+        current_values = p._holdings.market_values_in("CAD", snapshot)
+        total_cash = p.cash["CAD"].amount
+        exact = rebalancing_helper.rebalance_optimizer(p, target, snapshot, solver="exact")
+        exact_objective = rebalancing_helper.rebalance_objective(exact, current_values, target / 100., total_cash)
+
+        for nb_checks in (0, 1, 2):
+            deadline = IterationDeadline(nb_checks)
+            tracer = Tracer()
+            with tracer:
+                solution = rebalancing_helper.rebalance_optimizer(p, target, snapshot, solver="slsqp", deadline=deadline)
+
+            self.assertEqual(deadline.exceeded, ["optimize"])
+            self.assertEqual(tracer.metrics.counters["deadline_exceeded"], 1)
+            self.assertTrue(np.all(solution >= 0.))
+            self.assertLessEqual(np.sum(solution), total_cash * (1. + 1E-12))
+            objective = rebalancing_helper.rebalance_objective(solution, current_values, target / 100., total_cash)
+            self.assertLessEqual(objective, exact_objective)
+
+        # the deadline does not change the solution when it does not pass
+        deadline = Deadline(60.)
+        np.testing.assert_allclose(
+            rebalancing_helper.rebalance_optimizer(p, target, snapshot, solver="slsqp", deadline=deadline),
+            rebalancing_helper.rebalance_optimizer(p, target, snapshot, solver="slsqp"))
+        self.assertEqual(deadline.exceeded, [])
+
+    def test_rebalance_many(self):
+        """
+        Test that a batch falls back to the prices held by the portfolios when the quotes stall.
+        """
+        portfolios = [self.make_portfolio() for _ in range(3)]
+        expected = self.make_portfolio().rebalance(self.target)
+        Asset.quote_provider = SlowQuoteProvider({
+            "XBB.TO": (30., "CAD"),
+            "XIC.TO": (20., "CAD"),
+            "ITOT": (80., "USD"),
+        })
+
+        start = time.monotonic()
+        batch = rebalance_many(portfolios, self.target, processes=1, refresh_quotes=True, time_budget=0.2)
+        self.assertLess(time.monotonic() - start, 0.8)
+        for result in batch.results:
+            self.assertTrue(result.approximate)
+            self.assertEqual(result.new_units, expected.new_units)
+            self.assertEqual(result.prices["XBB.TO"], [25., "CAD"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+import unittest
+
+import numpy as np
+
+from rebalance import Asset
+from rebalance import Cash
+from rebalance import CachedCurrencyRates
+from rebalance import Portfolio
+from rebalance import StaticQuoteProvider
+from rebalance import ToleranceBands
+from rebalance import Tracer
+from rebalance import rebalance_many
+from rebalance.tests import ProviderIsolation
+from rebalance.tests import TableRates
+
+
+class TestToleranceBands(ProviderIsolation, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        Asset.quote_provider = StaticQuoteProvider({
+            "XBB.TO": (25., "CAD"),
+            "XIC.TO": (20., "CAD"),
+            "ITOT": (80., "USD"),
+        })
+        Cash.currency_rates = CachedCurrencyRates(TableRates())
+        self.target = {"XBB.TO": 40., "XIC.TO": 40., "ITOT": 20.}
+
+    def make_portfolio(self, quantities, cash=0.):
+        p = Portfolio()
+        p.easy_add_assets(tickers=["XBB.TO", "XIC.TO", "ITOT"], quantities=quantities)
+        p.add_cash(cash, "CAD")
+        return p
+
+    def test_widths(self):
+        """
+        Test the width of the bands of each asset.
+        """
+        tickers = ["A", "B", "C"]
+        targets = np.array([60., 30., 10.])
+
+        np.testing.assert_allclose(ToleranceBands(absolute=5.).widths(tickers, targets), [5., 5., 5.])
+        np.testing.assert_allclose(ToleranceBands(relative=0.25).widths(tickers, targets), [15., 7.5, 2.5])
+        # 5/25 rule: the narrower band applies
+        np.testing.assert_allclose(ToleranceBands(absolute=5., relative=0.25).widths(tickers, targets), [5., 5., 2.5])
+        # per asset bands: assets which are not specified have no band
+        np.testing.assert_allclose(ToleranceBands(absolute={"A": 1., "B": 2.}).widths(tickers, targets), [1., 2., np.inf])
+
+        with self.assertRaises(AssertionError):
+            ToleranceBands()
+
+    def test_check(self):
+        """
+        Test which assets breach their bands.
+        """
+        # 40% / 40% / 20% (ITOT is worth 100 CAD)
+        p = self.make_portfolio([16, 20, 2])
+        check = ToleranceBands(absolute=1.).check(p, self.target)
+        self.assertTrue(check.in_band)
+        self.assertEqual(check.breached, [])
+        for ticker in self.target:
+            self.assertAlmostEqual(check.deviations[ticker], 0.)
+
+        # 50% / 30% / 20%: XBB.TO and XIC.TO drifted by 10%
+        p = self.make_portfolio([20, 15, 2])
+        check = ToleranceBands(absolute=5.).check(p, self.target)
+        self.assertFalse(check.in_band)
+        self.assertEqual(check.breached, ["XBB.TO", "XIC.TO"])
+        self.assertAlmostEqual(check.deviations["XBB.TO"], 10.)
+        self.assertAlmostEqual(check.deviations["XIC.TO"], -10.)
+        self.assertTrue(ToleranceBands(absolute=10.5).check(p, self.target).in_band)
+        self.assertFalse(ToleranceBands(absolute=10.5, relative=0.2).check(p, self.target).in_band)
+
+        # uninvested cash counts as drift
+        p = self.make_portfolio([16, 20, 2], cash=100.)
+        self.assertEqual(ToleranceBands(absolute=3.).check(p, self.target).breached, ["XBB.TO", "XIC.TO"])
+
+        # error handling
+        with self.assertRaises(Exception):
+            ToleranceBands(absolute=5.).check(p, {"XBB.TO": 50., "XIC.TO": 50.})
+
+    def test_rebalance(self):
+        """
+        Test that portfolios within their bands are not rebalanced, and that the others are.
+        """
+        bands = ToleranceBands(absolute=5., relative=0.25)
+        p = self.make_portfolio([16, 20, 2], cash=50.)
+        tracer = Tracer()
+        result = p.rebalance(self.target, tracer=tracer, tolerance=bands)
+        self.assertEqual(result.new_units, {"XBB.TO": 0, "XIC.TO": 0, "ITOT": 0})
+        self.assertEqual(result.exchange_history, [])
+        self.assertEqual(result.breached, [])
+        self.assertEqual(result.prices["ITOT"], [80., "USD"])
+        self.assertEqual(result.metrics.counters["in_band"], 1)
+        self.assertIn("drift_check", result.metrics.spans)
+        self.assertNotIn("optimize", result.metrics.spans)
+        self.assertAlmostEqual(p.cash["CAD"].amount, 50.)
+        self.assertEqual(p.assets["XBB.TO"].quantity, 16)
+
+        # a large deposit breaches the bands
+        p.add_cash(1000., "CAD")
+        result = p.rebalance(self.target, tolerance=bands)
+        self.assertEqual(result.breached, ["XBB.TO", "XIC.TO", "ITOT"])
+        expected = self.make_portfolio([16, 20, 2], cash=1050.).rebalance(self.target)
+        self.assertEqual(result.new_units, expected.new_units)
+        self.assertIsNone(expected.breached)
+
+    def test_rebalance_many(self):
+        """
+        Test that only the portfolios outside their bands are sent to the worker processes.
+        """
+        bands = ToleranceBands(absolute=5.)
+        portfolios = [self.make_portfolio([16, 20, 2], cash=500. * (i % 2)) for i in range(6)]
+        expected = [self.make_portfolio([16, 20, 2], cash=500. * (i % 2)).rebalance(self.target)
+                    for i in range(6)]
+
+        tracer = Tracer()
+        batch = rebalance_many(portfolios, self.target, processes=2, tracer=tracer, tolerance=bands)
+        self.assertEqual(tracer.metrics.counters["in_band"], 3)
+        self.assertEqual(tracer.metrics.spans["drift_check"]["count"], 1 + 6)
+        for i, (result, expected_result) in enumerate(zip(batch.results, expected)):
+            self.assertEqual(result.new_units, expected_result.new_units)
+            self.assertEqual(result.breached == [], i % 2 == 0)
+            self.assertAlmostEqual(portfolios[i].value("CAD"), 1000. + 500. * (i % 2))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+import unittest
+
+import numpy as np
+
+from rebalance import Asset
+from rebalance import Cash
+from rebalance import CachedCurrencyRates
+from rebalance import Portfolio
+from rebalance import Quote
+from rebalance import StaticQuoteProvider
+from rebalance.tests import ProviderIsolation
+from rebalance.tests import TableRates
+
+
+class TestHoldings(ProviderIsolation, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        Asset.quote_provider = StaticQuoteProvider({
+            "VCN.TO": (35.5, "CAD"),
+            "ZAG.TO": (16.2, "CAD"),
+            "TSLA": (700.1, "USD"),
+        })
+        Cash.currency_rates = CachedCurrencyRates(TableRates())
+
+    def test_valuation(self):
+        """
+        Test vectorized valuation against per-asset valuation.
+        """
+        p = Portfolio()
+        p.easy_add_assets(tickers=["VCN.TO", "ZAG.TO", "TSLA"], quantities=[2, 20, 4])
+
+        self.assertAlmostEqual(p.market_value("CAD"),
+                               2 * 35.5 + 20 * 16.2 + 4 * 700.1 * 1.25)
+        self.assertAlmostEqual(p.market_value("USD"),
+                               sum(asset.market_value_in("USD") for asset in p.assets.values()))
+
+        asset_alloc = p.asset_allocation()
+        self.assertEqual(list(asset_alloc.keys()), ["VCN.TO", "ZAG.TO", "TSLA"])
+        self.assertAlmostEqual(asset_alloc["TSLA"], 4 * 700.1 * 1.25 / p.market_value("CAD") * 100.)
+
+    def test_asset_views(self):
+        """
+        Test that the assets of the portfolio write through to its holdings.
+        """
+        p = Portfolio()
+        asset = Asset("TSLA", 4)
+        p.add_asset(asset)
+        p.add_asset(Asset("ZAG.TO", 1, quote=Quote(16.2, "CAD", "BMO Aggregate Bond")))
+
+        # portfolio holds a copy of the asset
+        asset.quantity = 10
+        self.assertEqual(p.assets["TSLA"].quantity, 4)
+
+        p.assets["TSLA"].quantity = 6
+        self.assertAlmostEqual(p.market_value("USD"), 6 * 700.1 + 16.2 / 1.25)
+        self.assertEqual(p.assets["TSLA"].currency, "USD")
+        self.assertEqual(str(p.assets["ZAG.TO"]), "BMO Aggregate Bond(ZAG.TO)")
+
+        self.assertEqual(p.buy_asset("TSLA", 2), 2 * 700.1)
+        self.assertEqual(p.assets["TSLA"].quantity, 8)
+        self.assertAlmostEqual(p.cash["USD"].amount, -2 * 700.1)
+
+        # adding an asset already held replaces it
+        p.add_asset(Asset("TSLA", 1))
+        self.assertEqual(len(p.assets), 2)
+        self.assertEqual(p.assets["TSLA"].quantity, 1)
+
+        # a ticker added twice at once is added once, with its last quantity
+        p.easy_add_assets(tickers=["VCN.TO", "TSLA", "VCN.TO"], quantities=[1, 3, 2])
+        self.assertEqual(list(p.assets.keys()), ["TSLA", "ZAG.TO", "VCN.TO"])
+        self.assertEqual(p.assets["VCN.TO"].quantity, 2)
+        self.assertEqual(p.assets["TSLA"].quantity, 3)
+
+    def test_scratch_copy(self):
+        """
+        Test that a scratch copy of the portfolio can be modified without affecting the original.
+        """
+        p = Portfolio()
+        p.easy_add_assets(tickers=["VCN.TO", "TSLA"], quantities=[2, 4])
+        p.add_cash(100., "CAD")
+
+        scratch = p._scratch_copy()
+        scratch._sell_everything()
+        scratch.add_cash(50., "USD")
+        scratch.add_asset(Asset("ZAG.TO", 3))
+
+        self.assertEqual(p.assets["TSLA"].quantity, 4)
+        self.assertEqual(p.cash["CAD"].amount, 100.)
+        self.assertNotIn("USD", p.cash)
+        self.assertNotIn("ZAG.TO", p.assets)
+        self.assertEqual(scratch.assets["TSLA"].quantity, 0)
+        self.assertAlmostEqual(scratch.cash["USD"].amount, 4 * 700.1 + 50.)
+
+    def test_large_portfolio(self):
+        """
+        Test valuation of a portfolio with thousands of assets.
+        """
+        n = 5000
+        tickers = ["T%d" % i for i in range(n)]
+        Asset.quote_provider = StaticQuoteProvider(
+            {ticker: (1. + i, "USD" if i % 2 else "CAD") for i, ticker in enumerate(tickers)})
+
+        p = Portfolio()
+        p.easy_add_assets(tickers=tickers, quantities=[2] * n)
+        prices = 1. + np.arange(n)
+        expected = np.sum(2 * prices[::2]) + np.sum(2 * prices[1::2]) * 1.25
+        self.assertAlmostEqual(p.market_value("CAD") / expected, 1.)
+        self.assertAlmostEqual(sum(p.asset_allocation().values()), 100.)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,36 @@
+import subprocess
+import sys
+import unittest
+
+
+def imported_modules(code):
+    """
+    Runs ``code`` in a fresh interpreter and returns the top-level modules it imported.
+    """
+    script = code + "\nimport sys\nprint(' '.join(sorted({name.split('.')[0] for name in sys.modules})))"
+    output = subprocess.check_output([sys.executable, "-c", script])
+    return set(output.decode().split())
+
+
+class TestImports(unittest.TestCase):
+    def test_lazy_imports(self):
+        """
+        Test that importing the package (and using it without the network) does not import the heavy dependencies.
+        """
+        modules = imported_modules("import rebalance")
+        for module in ("numpy", "scipy", "forex_python", "requests", "pandas", "yfinance"):
+            self.assertNotIn(module, modules)
+
+        modules = imported_modules(
+            "from rebalance import Asset, Portfolio, StaticQuoteProvider\n"
+            "Asset.quote_provider = StaticQuoteProvider({'VCN.TO': (35.5, 'CAD')})\n"
+            "p = Portfolio()\n"
+            "p.easy_add_assets(['VCN.TO'], [2])\n"
+            "p.add_cash(100., 'CAD')\n"
+            "p.rebalance({'VCN.TO': 100.})\n")
+        for module in ("scipy", "forex_python", "requests", "pandas", "yfinance", "asyncio"):
+            self.assertNotIn(module, modules)
+
+
+if __name__ == '__main__':
+    unittest.main()
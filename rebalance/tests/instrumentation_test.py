@@ -0,0 +1,158 @@
+import pickle
+import unittest
+
+from rebalance import Asset
+from rebalance import Cash
+from rebalance import CachedCurrencyRates
+from rebalance import Metrics
+from rebalance import Portfolio
+from rebalance import RebalanceResult
+from rebalance import StaticQuoteProvider
+from rebalance import Tracer
+from rebalance import rebalance_many
+from rebalance import instrumentation
+from rebalance.tests import ProviderIsolation
+from rebalance.tests import TableRates
+
+
+class RecordingTracer(Tracer):
+    """
+    Tracer which also records the order in which spans start and end.
+    """
+    def __init__(self):
+        super().__init__()
+        self.events = []
+
+    def on_span_start(self, name):
+        super().on_span_start(name)
+        self.events.append(("start", name))
+
+    def on_span_end(self, name, seconds):
+        super().on_span_end(name, seconds)
+        self.events.append(("end", name))
+
+
+class TestInstrumentation(ProviderIsolation, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        Asset.quote_provider = StaticQuoteProvider({
+            "XBB.TO": (33.4, "CAD"),
+            "ITOT": (69.4, "USD"),
+            "IEFA": (57.7, "USD"),
+        })
+        Cash.currency_rates = CachedCurrencyRates(TableRates())
+
+    def make_portfolio(self):
+        p = Portfolio()
+        p.easy_add_assets(["XBB.TO", "ITOT", "IEFA"], [10, 5, 0])
+        p.easy_add_cash([1000., 500.], ["CAD", "USD"])
+        return p
+
+    def test_tracer(self):
+        """
+        Test spans and counters outside of a rebalancing.
+        """
+        # no active tracer
+        with instrumentation.span("ignored"):
+            instrumentation.count("ignored")
+
+        tracer = RecordingTracer()
+        with tracer:
+            with instrumentation.span("outer"):
+                with instrumentation.span("inner"):
+                    instrumentation.count("calls")
+                instrumentation.count("calls", 2)
+            with instrumentation.tracing(tracer):
+                # already active: not recorded twice
+                instrumentation.count("calls")
+        instrumentation.count("calls")
+
+        self.assertEqual(tracer.events, [("start", "outer"), ("start", "inner"), ("end", "inner"), ("end", "outer")])
+        self.assertEqual(tracer.metrics.counters, {"calls": 4})
+        self.assertEqual(tracer.metrics.spans["outer"]["count"], 1)
+        self.assertGreaterEqual(tracer.metrics.spans["outer"]["seconds"], tracer.metrics.spans["inner"]["seconds"])
+
+        # merge
+        metrics = Metrics()
+        metrics.merge(tracer.metrics)
+        metrics.merge(tracer.metrics)
+        self.assertEqual(metrics.counters["calls"], 8)
+        self.assertEqual(metrics.spans["inner"]["count"], 2)
+
+    def test_rebalance(self):
+        """
+        Test the metrics of a rebalancing.
+        """
+        p = self.make_portfolio()
+        target = {"XBB.TO": 40., "ITOT": 40., "IEFA": 20.}
+
+        # no tracer: plain result
+        result = p.rebalance(target)
+        self.assertIsInstance(result, RebalanceResult)
+        self.assertIsNone(result.metrics)
+        (new_units, _, _, max_diff) = result
+        self.assertEqual(new_units, result.new_units)
+
+        Cash.currency_rates.clear()
+        p = self.make_portfolio()
+        tracer = Tracer()
+        result = p.rebalance(target, tracer=tracer, solver="slsqp")
+        spans = result.metrics.spans
+        for name in ("rebalance", "snapshot", "scratch_copy", "combine_cash", "optimize", "integer_allocation",
+                     "smart_exchange", "apply_trades", "evaluate"):
+            self.assertIn(name, spans)
+        self.assertEqual(spans["scratch_copy"]["count"], 2)
+        self.assertNotIn("sell_everything", spans)
+        self.assertGreater(result.metrics.counters["optimizer_iterations"], 0)
+        self.assertGreater(result.metrics.counters["objective_evaluations"], 0)
+        self.assertGreater(result.metrics.counters["fx_cache_hits"], 0)
+        self.assertEqual(result.metrics.counters["fx_cache_misses"], 1)  # CAD to USD
+
+        # the result only holds the metrics of its rebalancing, while the tracer accumulates
+        p.selling_allowed = True
+        result = p.rebalance(target, tracer=tracer)
+        self.assertEqual(result.metrics.spans["rebalance"]["count"], 1)
+        self.assertEqual(result.metrics.counters["exact_solves"], 1)
+        self.assertIn("sell_everything", result.metrics.spans)
+        self.assertEqual(tracer.metrics.spans["rebalance"]["count"], 2)
+
+        # results can be sent between processes
+        self.assertEqual(pickle.loads(pickle.dumps(result)).metrics.spans, result.metrics.spans)
+
+    def test_rebalance_many(self):
+        """
+        Test the metrics of a batch of rebalancings, in this process and in worker processes.
+        """
+        target = {"XBB.TO": 40., "ITOT": 40., "IEFA": 20.}
+        for processes in (1, 2):
+            tracer = Tracer()
+            batch = rebalance_many([self.make_portfolio() for _ in range(4)], target,
+                                   processes=processes, tracer=tracer)
+            self.assertEqual(tracer.metrics.spans["snapshot"]["count"], 1)
+            self.assertEqual(tracer.metrics.spans["rebalance"]["count"], 4)
+            self.assertEqual(tracer.metrics.counters["exact_solves"], 4)
+            self.assertEqual(batch.results[0].metrics.counters["exact_solves"], 1)
+
+    def test_prometheus(self):
+        """
+        Test the Prometheus text format.
+        """
+        metrics = Metrics()
+        metrics.add_span("optimize", 0.5)
+        metrics.add_span("optimize", 0.25)
+        metrics.add_span('odd "name"', 1.)
+        metrics.add_count("fx_cache_hits", 3)
+        metrics.add_count("quote-requests")
+
+        text = metrics.to_prometheus()
+        self.assertIn("# TYPE rebalance_span_seconds_total counter\n", text)
+        self.assertIn('rebalance_span_seconds_total{span="optimize"} 0.75\n', text)
+        self.assertIn('rebalance_span_count_total{span="optimize"} 2\n', text)
+        self.assertIn('rebalance_span_count_total{span="odd \\"name\\""} 1\n', text)
+        self.assertIn("# TYPE rebalance_fx_cache_hits_total counter\nrebalance_fx_cache_hits_total 3\n", text)
+        self.assertIn("rebalance_quote_requests_total 1\n", text)
+        self.assertTrue(Metrics().to_prometheus("app").strip() == "")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,9 +5,7 @@ import numpy as np
 
 from rebalance import Portfolio
 from rebalance import Asset
-
-import yfinance as yf
-from forex_python.converter import CurrencyRates
+from rebalance import Cash
 
 
 class TestPortfolio(unittest.TestCase):
@@ -50,8 +48,7 @@ class TestPortfolio(unittest.TestCase):
 
         ticker = "VCN.TO"
         quantity = 2
-        ticker_info = yf.Ticker(ticker).info
-        price = ticker_info["regularMarketPrice"]
+        price = Asset.quote_provider.get_quote(ticker).price
         asset = Asset(ticker=ticker, quantity=quantity)
 
         p.add_asset(asset)
@@ -86,7 +83,7 @@ class TestPortfolio(unittest.TestCase):
             self.assertEqual(tickers[i], p.assets[tickers[i]].ticker)
             self.assertEqual(quantities[i], p.assets[tickers[i]].quantity)
             self.assertEqual(
-                yf.Ticker(tickers[i]).info["regularMarketPrice"], p.assets[tickers[i]].price)
+                Asset.quote_provider.get_quote(tickers[i]).price, p.assets[tickers[i]].price)
 
     def test_portfolio_value(self):
         """
@@ -112,7 +109,7 @@ class TestPortfolio(unittest.TestCase):
 
         cv = p.cash_value("CAD")
 
-        usd_to_cad = CurrencyRates().get_rate("USD", "CAD")
+        usd_to_cad = Cash.currency_rates.get_rate("USD", "CAD")
         total_cv = np.sum(amounts[0] + amounts[1] * usd_to_cad)
         self.assertAlmostEqual(cv, total_cv, 1)
 
@@ -131,11 +128,12 @@ class TestPortfolio(unittest.TestCase):
         asset_alloc = p.asset_allocation()
         self.assertAlmostEqual(sum(asset_alloc.values()), 100., 7)
 
-        rates = CurrencyRates()
+        rates = Cash.currency_rates
+        quotes = Asset.quote_provider.get_quotes(tickers)
 
         prices = [
-            yf.Ticker(ticker).info["regularMarketPrice"] *
-            rates.get_rate(yf.Ticker(ticker).info["currency"], "CAD")
+            quotes[ticker].price *
+            rates.get_rate(quotes[ticker].currency, "CAD")
             for ticker in tickers
         ]
         total = np.sum(np.asarray(quantities) * np.asarray(prices))
@@ -155,7 +153,7 @@ class TestPortfolio(unittest.TestCase):
         currencies = ["CAD", "USD"]
         p.easy_add_cash(amounts, currencies)
 
-        cad_to_usd = CurrencyRates().get_rate("CAD", "USD")
+        cad_to_usd = Cash.currency_rates.get_rate("CAD", "USD")
 
         p.exchange_currency(to_currency="CAD",
                             from_currency="USD",
@@ -0,0 +1,180 @@
+import json
+import os
+import tempfile
+import unittest
+
+from rebalance import Asset
+from rebalance import Portfolio
+from rebalance import StaticQuoteProvider
+from rebalance import YahooQuoteProvider
+from rebalance.tests import CountingQuoteProvider
+from rebalance.tests import ProviderIsolation
+
+
+class TestQuoteProvider(ProviderIsolation, unittest.TestCase):
+    def test_static_provider(self):
+        """
+        Test interface of StaticQuoteProvider class.
+        """
+        provider = StaticQuoteProvider({"VCN.TO": (35.5, "cad", "Vanguard FTSE Canada")})
+        provider.add_quote("TSLA", 700.1, "USD")
+
+        quote = provider.get_quote("VCN.TO")
+        self.assertEqual(quote.price, 35.5)
+        self.assertEqual(quote.currency, "CAD")
+        self.assertEqual(quote.name, "Vanguard FTSE Canada")
+
+        quotes = provider.get_quotes(["TSLA", "VCN.TO"])
+        self.assertEqual(quotes["TSLA"].price, 700.1)
+        self.assertIsNone(quotes["TSLA"].name)
+
+        # error handling
+        with self.assertRaises(Exception):
+            provider.get_quotes(["TSLA", "XIC.TO"])
+
+    def test_static_provider_from_file(self):
+        """
+        Test loading quotes from local json and csv files.
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            json_path = os.path.join(tmp_dir, "quotes.json")
+            with open(json_path, "w") as f:
+                json.dump({"ZAG.TO": {"price": 16.2, "currency": "CAD"}}, f)
+
+            csv_path = os.path.join(tmp_dir, "quotes.csv")
+            with open(csv_path, "w") as f:
+                f.write("ticker,price,currency\nITOT,90.5,USD\n")
+
+            self.assertEqual(StaticQuoteProvider.from_file(json_path).get_quote("ZAG.TO").price, 16.2)
+            self.assertEqual(StaticQuoteProvider.from_file(csv_path).get_quote("ITOT").currency, "USD")
+
+    def test_asset_with_provider(self):
+        """
+        Test Asset's use of the quote provider.
+        """
+        Asset.quote_provider = StaticQuoteProvider({"TSLA": (700.1, "USD", "Tesla")})
+        asset = Asset("TSLA", 3)
+        self.assertEqual(asset.price, 700.1)
+        self.assertEqual(asset.currency, "USD")
+        self.assertEqual(str(asset), "Tesla(TSLA)")
+
+    def test_portfolio_single_fetch(self):
+        """
+        Test that loading many assets in a portfolio costs one request.
+        """
+        tickers = ["T%d" % i for i in range(300)]
+        provider = CountingQuoteProvider(
+            StaticQuoteProvider({ticker: (10. + i, "USD") for i, ticker in enumerate(tickers)}))
+        Asset.quote_provider = provider
+
+        p = Portfolio()
+        p.easy_add_assets(tickers=tickers, quantities=[1] * len(tickers))
+
+        self.assertEqual(provider.nb_requests, 1)
+        self.assertEqual(p.assets["T42"].price, 52.)
+
+    def test_asset_from_quote(self):
+        """
+        Test that an asset created from a known price makes no request.
+        """
+        provider = CountingQuoteProvider(StaticQuoteProvider())
+        Asset.quote_provider = provider
+
+        asset = Asset.from_quote("TSLA", 3, 700.1, "usd", "Tesla")
+        self.assertTrue(asset.is_priced)
+        self.assertEqual(asset.market_value(), 3 * 700.1)
+        self.assertEqual(asset.currency, "USD")
+        self.assertEqual(str(asset), "Tesla(TSLA)")
+
+        p = Portfolio()
+        p.add_asset(asset)
+        self.assertEqual(p.assets["TSLA"].price, 700.1)
+        self.assertEqual(provider.nb_requests, 0)
+
+    def test_lazy_assets(self):
+        """
+        Test that the quotes of lazy assets are fetched on first use, in one request per portfolio.
+        """
+        provider = CountingQuoteProvider(StaticQuoteProvider(
+            {"VCN.TO": (35.5, "CAD"), "ITOT": (69.4, "USD", "iShares Core S&P Total"), "XBB.TO": (33.4, "CAD")}))
+        Asset.quote_provider = provider
+
+        # standalone asset
+        asset = Asset("ITOT", 2, lazy=True)
+        self.assertFalse(asset.is_priced)
+        self.assertEqual(asset.ticker, "ITOT")
+        self.assertEqual(provider.nb_requests, 0)
+        self.assertEqual(asset.price, 69.4)
+        self.assertEqual(str(asset), "iShares Core S&P Total(ITOT)")
+        self.assertEqual(provider.nb_requests, 1)
+        with self.assertRaises(AttributeError):
+            asset.unknown_attribute
+
+        # assets of a portfolio are priced together, in the order they were added
+        provider.nb_requests = 0
+        vcn = Asset("VCN.TO", 4, lazy=True)
+        p = Portfolio()
+        p.add_asset(vcn)
+        p.add_asset(Asset.from_quote("TSLA", 1, 700.1, "USD"))
+        p.easy_add_assets(["ITOT", "XBB.TO"], [2, 3], lazy=True)
+        p.add_cash(10., "CAD")
+        self.assertEqual(provider.nb_requests, 0)
+
+        self.assertEqual(list(p.assets.keys()), ["VCN.TO", "TSLA", "ITOT", "XBB.TO"])
+        self.assertEqual(provider.nb_requests, 1)
+        self.assertEqual(p.assets["XBB.TO"].market_value(), 3 * 33.4)
+        self.assertTrue(vcn.is_priced)
+        self.assertEqual(vcn.price, 35.5)
+        self.assertEqual(provider.nb_requests, 1)
+
+        # assets priced on their own are not fetched again with the rest of the portfolio
+        provider.nb_requests = 0
+        itot = Asset("ITOT", 2, lazy=True)
+        p = Portfolio()
+        p.add_asset(itot)
+        p.easy_add_assets(["XBB.TO"], [3], lazy=True)
+        self.assertEqual(itot.price, 69.4)
+        self.assertEqual(provider.nb_requests, 1)
+        self.assertEqual(p.assets["ITOT"].market_value(), 2 * 69.4)
+        self.assertEqual(p.assets["XBB.TO"].price, 33.4)
+        self.assertEqual(provider.nb_requests, 2)
+        self.assertEqual(provider.last_tickers, ["XBB.TO"])
+
+        # copies made before pricing are priced independently
+        p = Portfolio()
+        p.easy_add_assets(["VCN.TO"], [1], lazy=True)
+        scratch = p._scratch_copy()
+        scratch.buy_asset("VCN.TO", 1)
+        self.assertEqual(p.assets["VCN.TO"].quantity, 1)
+        self.assertEqual(scratch.assets["VCN.TO"].quantity, 2)
+
+
+    def test_yahoo_provider(self):
+        """
+        Test that YahooQuoteProvider reads the quotes from the price history metadata of yfinance, in batches.
+        """
+        metadata = {
+            "VCN.TO": {"regularMarketPrice": 35.5, "currency": "cad", "shortName": "Vanguard FTSE Canada"},
+            "TSLA": {"regularMarketPrice": 700.1, "currency": "USD"},
+        }
+
+        class OfflineYahooQuoteProvider(YahooQuoteProvider):
+            def _history_metadata(self, ticker):
+                # yfinance upper-cases the symbols
+                return metadata.get(ticker.ticker, {})
+
+        provider = OfflineYahooQuoteProvider(batch_size=1)
+        quotes = provider.get_quotes(["vcn.to", "TSLA", "TSLA"])
+        self.assertEqual(list(quotes.keys()), ["vcn.to", "TSLA"])
+        self.assertEqual(quotes["vcn.to"].price, 35.5)
+        self.assertEqual(quotes["vcn.to"].currency, "CAD")
+        self.assertEqual(quotes["vcn.to"].name, "Vanguard FTSE Canada")
+        self.assertIsNone(quotes["TSLA"].name)
+
+        # error handling
+        with self.assertRaises(Exception):
+            provider.get_quotes(["TSLA", "XIC.TO"])
+
+
+if __name__ == '__main__':
+    unittest.main()
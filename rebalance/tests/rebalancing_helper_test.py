@@ -0,0 +1,200 @@
+import unittest
+
+import numpy as np
+from scipy.optimize import check_grad
+
+from rebalance import Cash
+from rebalance import CachedCurrencyRates
+from rebalance import MarketSnapshot
+from rebalance import RiskModel
+from rebalance import Tracer
+from rebalance.portfolio import rebalancing_helper
+from rebalance.portfolio import solvers
+from rebalance.tests import ProviderIsolation
+from rebalance.tests import TableRates
+from rebalance.tests import make_portfolio
+
+
+class TestRebalancingHelper(ProviderIsolation, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        Cash.currency_rates = CachedCurrencyRates(TableRates())
+
+    def test_objective_gradient(self):
+        """
+        Test the analytic gradient of the objective against finite differences.
+        """
+        rng = np.random.default_rng(1)
+        current = rng.uniform(0., 1000., 20)
+        target = rng.uniform(0., 1., 20)
+        target = target / np.sum(target)
+        total_cash = 3000.
+        new = rng.uniform(0., 100., 20)
+
+        error = check_grad(rebalancing_helper.rebalance_objective,
+                           rebalancing_helper.rebalance_objective_gradient,
+                           new, current, target, total_cash, epsilon=1e-4)
+        self.assertLess(error, 1e-8)
+
+    def test_analytic_gradient_evaluations(self):
+        """
+        Test that the analytic gradient reaches the same solution with far fewer objective evaluations.
+        """
+        p, target = make_portfolio(500)
+        snapshot = MarketSnapshot.capture(p)
+
+        objective = rebalancing_helper.rebalance_objective
+        nb_evaluations = [0]
+
+        def counting_objective(*args):
+            nb_evaluations[0] += 1
+            return objective(*args)
+
+        rebalancing_helper.rebalance_objective = counting_objective
+        try:
+            solutions = {}
+            evaluations = {}
+            for gradient in ("analytic", "numeric"):
+                nb_evaluations[0] = 0
+                solutions[gradient] = rebalancing_helper.rebalance_optimizer(
+                    p, target, snapshot, solver="slsqp", gradient=gradient)
+                evaluations[gradient] = nb_evaluations[0]
+        finally:
+            rebalancing_helper.rebalance_objective = objective
+
+        self.assertLess(10 * evaluations["analytic"], evaluations["numeric"])
+        total_cash = p.cash["CAD"].amount
+        self.assertLess(np.max(np.abs(solutions["analytic"] - solutions["numeric"])) / total_cash, 1e-3)
+
+        # error handling
+        with self.assertRaises(Exception):
+            rebalancing_helper.rebalance_optimizer(p, target, snapshot, solver="slsqp", gradient="exact")
+        with self.assertRaises(Exception):
+            rebalancing_helper.rebalance_optimizer(p, target, snapshot, solver="newton")
+
+    def test_exact_solvers(self):
+        """
+        Test that the exact solvers do at least as well as SLSQP.
+        """
+        p, target = make_portfolio(50)
+        snapshot = MarketSnapshot.capture(p)
+
+        for selling_allowed in (False, True):
+            scratch = p._scratch_copy()
+            if selling_allowed:
+                scratch._sell_everything()
+                scratch._combine_cash(snapshot=snapshot)
+            cash = scratch.cash["CAD"].amount
+            values = scratch._holdings.market_values_in("CAD", snapshot)
+
+            exact = rebalancing_helper.rebalance_optimizer(scratch, target, snapshot, solver="exact")
+            slsqp = rebalancing_helper.rebalance_optimizer(scratch, target, snapshot, solver="slsqp")
+
+            self.assertTrue(np.all(exact >= 0.))
+            self.assertAlmostEqual(np.sum(exact) / cash, 1.)
+            self.assertLessEqual(
+                rebalancing_helper.rebalance_objective(exact, values, target / 100., cash),
+                rebalancing_helper.rebalance_objective(slsqp, values, target / 100., cash) + 1e-9)
+
+            # deterministic
+            np.testing.assert_array_equal(
+                exact, rebalancing_helper.rebalance_optimizer(scratch, target, snapshot, solver="exact"))
+
+    def test_auto_fallback(self):
+        """
+        Test that the "auto" solver falls back to SLSQP when the exact solution cannot be used.
+        """
+        p, target = make_portfolio(20)
+        snapshot = MarketSnapshot.capture(p)
+        slsqp = rebalancing_helper.rebalance_optimizer(p, target, snapshot, solver="slsqp")
+
+        solve_buy_only = solvers.solve_buy_only
+        solvers.solve_buy_only = lambda values, target_allocation, total_cash, x0=None: np.full(len(values), np.nan)
+        try:
+            tracer = Tracer()
+            with tracer:
+                auto = rebalancing_helper.rebalance_optimizer(p, target, snapshot, solver="auto")
+            exact = rebalancing_helper.rebalance_optimizer(p, target, snapshot, solver="exact")
+        finally:
+            solvers.solve_buy_only = solve_buy_only
+
+        self.assertEqual(tracer.metrics.counters["exact_fallbacks"], 1)
+        np.testing.assert_allclose(auto, slsqp)
+        self.assertTrue(np.all(np.isnan(exact)))
+
+        # a usable exact solution is kept
+        tracer = Tracer()
+        with tracer:
+            auto = rebalancing_helper.rebalance_optimizer(p, target, snapshot, solver="auto")
+        np.testing.assert_array_equal(auto, rebalancing_helper.rebalance_optimizer(p, target, snapshot, solver="exact"))
+        self.assertNotIn("exact_fallbacks", tracer.metrics.counters)
+
+    def test_incremental(self):
+        """
+        Test that incremental rebalancings warm-start SLSQP and skip the optimization when nothing can be bought.
+        """
+        p, target = make_portfolio(200)
+        snapshot = MarketSnapshot.capture(p)
+        target = dict(zip(p._holdings.tickers, target))
+        self.assertIsNone(p._solver_state)
+
+        p.rebalance(target, snapshot=snapshot, solver="slsqp", incremental=True)
+        self.assertEqual(p._solver_state.tickers, p._holdings.tickers)
+
+        # a deposit worth less than the cheapest asset
+        cheapest = min(p._holdings.prices_in("CAD", snapshot))
+        p.add_cash(cheapest - p.cash_value("CAD", snapshot) - 0.01, "CAD")
+        tracer = Tracer()
+        result = p.rebalance(target, snapshot=snapshot, solver="slsqp", incremental=True, tracer=tracer)
+        self.assertEqual(tracer.metrics.counters["skipped_solves"], 1)
+        self.assertNotIn("optimize", tracer.metrics.spans)
+        self.assertEqual(sum(result.new_units.values()), 0)
+        self.assertAlmostEqual(p.cash["CAD"].amount, cheapest - 0.01)
+
+        # a larger deposit: same quality as a cold solve, in fewer iterations
+        p.add_cash(5000., "CAD")
+        cold = p._scratch_copy()
+        cold._solver_state = None
+        cold_tracer = Tracer()
+        cold_result = cold.rebalance(target, snapshot=snapshot, solver="slsqp", tracer=cold_tracer)
+
+        tracer = Tracer()
+        result = p.rebalance(target, snapshot=snapshot, solver="slsqp", incremental=True, tracer=tracer)
+        self.assertEqual(tracer.metrics.counters["warm_starts"], 1)
+        self.assertLess(tracer.metrics.counters["objective_evaluations"],
+                        cold_tracer.metrics.counters["objective_evaluations"])
+        self.assertLess(abs(result.max_diff - cold_result.max_diff), 0.05)
+
+        # the previous solution is ignored once the target changes
+        target[p._holdings.tickers[0]] += 0.1
+        target[p._holdings.tickers[1]] -= 0.1
+        p.add_cash(5000., "CAD")
+        tracer = Tracer()
+        p.rebalance(target, snapshot=snapshot, solver="slsqp", incremental=True, tracer=tracer)
+        self.assertNotIn("warm_starts", tracer.metrics.counters)
+
+    def test_incremental_exact(self):
+        """
+        Test that incremental rebalancings warm-start the exact solvers, with the same solution as a cold solve.
+        """
+        for risk_model in (None, "identity"):
+            p, target = make_portfolio(50)
+            snapshot = MarketSnapshot.capture(p)
+            target = dict(zip(p._holdings.tickers, target))
+            if risk_model is not None:
+                risk_model = RiskModel(p._holdings.tickers, np.zeros((50, 1)), specific_variance=np.ones(50))
+
+            p.rebalance(target, snapshot=snapshot, incremental=True, risk_model=risk_model)
+            p.add_cash(5000., "CAD")
+            cold = p._scratch_copy()
+            cold._solver_state = None
+            cold_result = cold.rebalance(target, snapshot=snapshot, risk_model=risk_model)
+
+            tracer = Tracer()
+            result = p.rebalance(target, snapshot=snapshot, incremental=True, risk_model=risk_model, tracer=tracer)
+            self.assertEqual(tracer.metrics.counters["warm_starts"], 1)
+            self.assertEqual(result.new_units, cold_result.new_units)
+
+
+if __name__ == '__main__':
+    unittest.main()
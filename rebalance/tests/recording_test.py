@@ -0,0 +1,83 @@
+import os
+import tempfile
+import unittest
+
+from rebalance import Asset
+from rebalance import Cash
+from rebalance import Portfolio
+from rebalance import StaticQuoteProvider
+from rebalance.market import recording
+from rebalance.market.recording import MarketFixture
+from rebalance.tests import CountingQuoteProvider
+from rebalance.tests import OfflineQuoteProvider
+from rebalance.tests import OfflineRates
+from rebalance.tests import ProviderIsolation
+from rebalance.tests import TableRates
+
+
+class TestRecording(ProviderIsolation, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self._directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self._directory.name, "market_data.json")
+
+    def tearDown(self):
+        self._directory.cleanup()
+
+    def make_portfolio(self):
+        p = Portfolio()
+        p.easy_add_assets(["VCN.TO", "ITOT"], [10, 4])
+        p.easy_add_cash([100., 200.], ["GBP", "CAD"])
+        return p
+
+    def test_record_replay(self):
+        """
+        Test that a scenario replays offline what was recorded.
+        """
+        provider = CountingQuoteProvider(StaticQuoteProvider({
+            "VCN.TO": (35.5, "CAD", "Vanguard FTSE Canada"), "ITOT": (69.4, "USD"), "TSLA": (700.1, "USD")}))
+        Asset.quote_provider = provider
+        Cash.currency_rates = TableRates()
+        target = {"VCN.TO": 50., "ITOT": 50.}
+
+        with recording.recording(self.path) as fixture:
+            expected = self.make_portfolio().rebalance(target)
+        self.assertIs(Asset.quote_provider, provider)
+        self.assertEqual(sorted(fixture.quotes.keys()), ["ITOT", "VCN.TO"])
+
+        # recording again keeps what was recorded
+        with recording.recording(self.path):
+            Asset("TSLA")
+        self.assertEqual(sorted(MarketFixture.load(self.path).quotes.keys()), ["ITOT", "TSLA", "VCN.TO"])
+
+        Asset.quote_provider = OfflineQuoteProvider()
+        Cash.currency_rates = OfflineRates()
+        with recording.replaying(self.path):
+            self.assertEqual(str(Asset("VCN.TO")), "Vanguard FTSE Canada(VCN.TO)")
+            result = self.make_portfolio().rebalance(target)
+            self.assertEqual(result.new_units, expected.new_units)
+            self.assertEqual(result.exchange_history, expected.exchange_history)
+
+            with self.assertRaises(Exception):
+                Asset("IEMG")
+            with self.assertRaises(Exception):
+                Cash(1., "CAD").amount_in("JPY")
+
+    def test_fixture(self):
+        """
+        Test interface of MarketFixture class.
+        """
+        fixture = MarketFixture()
+        fixture.add_rate("cad", "usd", 0.8)
+        self.assertEqual(fixture.get_rate("CAD", "USD"), 0.8)
+        self.assertAlmostEqual(fixture.get_rate("USD", "CAD"), 1.25)
+        self.assertEqual(fixture.get_rate("EUR", "eur"), 1.)
+        with self.assertRaises(Exception):
+            fixture.get_rate("CAD", "EUR")
+
+        fixture.save(self.path)
+        self.assertEqual(MarketFixture.load(self.path).get_rate("CAD", "USD"), 0.8)
+
+
+if __name__ == '__main__':
+    unittest.main()
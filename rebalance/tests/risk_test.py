@@ -0,0 +1,152 @@
+import time
+import unittest
+
+import numpy as np
+from scipy.optimize import check_grad
+
+from rebalance import Cash
+from rebalance import CachedCurrencyRates
+from rebalance import MarketSnapshot
+from rebalance import RiskModel
+from rebalance import Tracer
+from rebalance.portfolio import rebalancing_helper
+from rebalance.tests import ProviderIsolation
+from rebalance.tests import TableRates
+from rebalance.tests import make_portfolio
+
+
+def random_risk_model(tickers, nb_factors, seed=0):
+    """
+    Risk model of ``tickers`` with random factors and specific variances.
+    """
+    rng = np.random.default_rng(seed)
+    return RiskModel(tickers, rng.normal(size=(len(tickers), nb_factors)) * 0.05,
+                     specific_variance=rng.uniform(0.01, 0.05, len(tickers)))
+
+
+class TestRiskModel(ProviderIsolation, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        Cash.currency_rates = CachedCurrencyRates(TableRates())
+
+    def test_products(self):
+        """
+        Test the products with the factored covariance against the dense covariance.
+        """
+        rng = np.random.default_rng(0)
+        tickers = ["A", "B", "C", "D"]
+        loadings = rng.normal(size=(4, 2))
+        factor_covariance = np.array([[2., 0.5], [0.5, 1.]])
+        specific_variance = np.array([0.1, 0.2, 0.3, 0.4])
+        covariance = loadings @ factor_covariance @ loadings.T + np.diag(specific_variance)
+        risk_model = RiskModel(tickers, loadings, factor_covariance, specific_variance)
+
+        weights = rng.normal(size=4)
+        self.assertEqual(risk_model.rank, 2)
+        np.testing.assert_allclose(risk_model.dot(weights), covariance @ weights)
+        self.assertAlmostEqual(risk_model.variance(weights), weights @ covariance @ weights)
+        self.assertAlmostEqual(risk_model.tracking_error(weights, np.zeros(4)), np.sqrt(weights @ covariance @ weights))
+        self.assertAlmostEqual(risk_model.average_variance(), np.mean(np.diag(covariance)))
+        self.assertGreaterEqual(risk_model.largest_eigenvalue_bound(), np.linalg.eigvalsh(covariance)[-1])
+
+        # the assets are reordered when selected
+        selection = risk_model.select(["C", "A"])
+        np.testing.assert_allclose(selection.dot(weights[[2, 0]]), covariance[np.ix_([2, 0], [2, 0])] @ weights[[2, 0]])
+        self.assertIs(risk_model.select(["C", "A"]), selection)
+        self.assertIs(risk_model.select(tickers), risk_model)
+        with self.assertRaises(Exception):
+            risk_model.select(["E"])
+
+    def test_from_covariance(self):
+        """
+        Test the factorization of a dense covariance matrix.
+        """
+        rng = np.random.default_rng(1)
+        returns = rng.normal(size=(200, 10)) @ rng.normal(size=(10, 10))
+        covariance = np.cov(returns, rowvar=False)
+        tickers = ["T%d" % i for i in range(10)]
+
+        weights = rng.normal(size=10)
+        np.testing.assert_allclose(RiskModel.from_covariance(tickers, covariance).dot(weights), covariance @ weights)
+
+        # fewer factors preserve the variance of each asset
+        risk_model = RiskModel.from_covariance(tickers, covariance, rank=3)
+        self.assertEqual(risk_model.rank, 3)
+        np.testing.assert_allclose(np.sum(risk_model.factors ** 2, axis=1) + risk_model.specific_variance, np.diag(covariance))
+
+    def test_objective_gradient(self):
+        """
+        Test the tracking error objective: its analytic gradient, and its equivalence with the default objective for an identity covariance.
+        """
+        rng = np.random.default_rng(2)
+        tickers = ["T%d" % i for i in range(20)]
+        current = rng.uniform(0., 1000., 20)
+        target = rng.uniform(0., 1., 20)
+        target = target / np.sum(target)
+        new = rng.uniform(0., 100., 20)
+
+        risk_model = random_risk_model(tickers, 4)
+        error = check_grad(rebalancing_helper.tracking_error_objective,
+                           rebalancing_helper.tracking_error_objective_gradient,
+                           new, current, target, 3000., risk_model, epsilon=1e-4)
+        self.assertLess(error, 1e-8)
+
+        identity = RiskModel(tickers, np.zeros((20, 0)), specific_variance=np.ones(20))
+        self.assertAlmostEqual(rebalancing_helper.tracking_error_objective(new, current, target, 3000., identity),
+                               rebalancing_helper.rebalance_objective(new, current, target, 3000.))
+        np.testing.assert_allclose(
+            rebalancing_helper.tracking_error_objective_gradient(new, current, target, 3000., identity),
+            rebalancing_helper.rebalance_objective_gradient(new, current, target, 3000.))
+
+    def test_rebalance(self):
+        """
+        Test rebalancing with a risk model: both solvers agree, and a large universe rebalances quickly.
+        """
+        p, target = make_portfolio(40)
+        tickers = list(p._holdings.tickers)
+        # the risk model covers more assets than the portfolio, in another order
+        risk_model = random_risk_model(tickers[::-1] + ["X", "Y"], 5)
+        snapshot = MarketSnapshot.capture(p)
+        current = p._holdings.market_values_in("CAD", snapshot)
+        total_cash = p.cash["CAD"].amount
+
+        solutions = {}
+        for solver in ("exact", "slsqp"):
+            solution = rebalancing_helper.rebalance_optimizer(p, target, snapshot, solver=solver, risk_model=risk_model)
+            solutions[solver] = rebalancing_helper.tracking_error_objective(
+                solution, current, target / 100., total_cash, risk_model.select(tickers))
+        self.assertLessEqual(solutions["exact"], solutions["slsqp"] + 1E-6)
+
+        target_allocation = dict(zip(tickers, target))
+        result = p.rebalance(target_allocation, risk_model=risk_model)
+        self.assertGreater(sum(result.new_units.values()), 0)
+        self.assertGreaterEqual(p.cash["CAD"].amount, 0.)
+
+        p, target = make_portfolio(3000)
+        tickers = list(p._holdings.tickers)
+        risk_model = random_risk_model(tickers, 20)
+        tracer = Tracer()
+        start = time.perf_counter()
+        p.rebalance(dict(zip(tickers, target)), tracer=tracer, risk_model=risk_model)
+        self.assertLess(time.perf_counter() - start, 2.)
+        self.assertGreater(tracer.metrics.counters["tracking_error_iterations"], 0)
+        self.assertEqual(tracer.metrics.counters["exact_solves"], 1)
+
+    def test_zero_variance(self):
+        """
+        Test that a risk model without any variance leaves only the cash penalty.
+        """
+        tickers = ["T%d" % i for i in range(5)]
+        risk_model = RiskModel(tickers, np.zeros((5, 1)))
+        current = np.full(5, 100.)
+        target = np.full(5, 0.2)
+        new = np.array([10., 0., 20., 0., 30.])
+
+        objective = rebalancing_helper.tracking_error_objective(new, current, target, 100., risk_model)
+        self.assertAlmostEqual(objective, (40. / 160.)**2)
+        gradient = rebalancing_helper.tracking_error_objective_gradient(new, current, target, 100., risk_model)
+        self.assertTrue(np.all(np.isfinite(gradient)))
+
+
+if __name__ == '__main__':
+    unittest.main()
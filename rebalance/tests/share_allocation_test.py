@@ -0,0 +1,84 @@
+import itertools
+import time
+import unittest
+
+import numpy as np
+
+from rebalance.portfolio import share_allocation
+from rebalance.portfolio import solvers
+
+
+class TestShareAllocation(unittest.TestCase):
+    def test_floor_units(self):
+        """
+        Test rounding down of market values to whole units.
+        """
+        np.testing.assert_array_equal(
+            share_allocation.floor_units(np.array([99., 100., -15.]), np.array([10., 10., 10.])),
+            [9, 10, -2])
+
+    def test_greedy_units(self):
+        """
+        Test that the greedy allocation matches the best allocation of a small problem.
+        """
+        prices = np.array([7., 11., 13.])
+        target_values = np.array([50., 30., 20.])
+        cash = 100.
+
+        units = share_allocation.greedy_units(np.zeros(3), prices, target_values, cash)
+        self.assertLessEqual(np.sum(units * prices), cash)
+
+        # brute force search of the best allocation
+        best_error = np.inf
+        for candidate in itertools.product(range(15), range(10), range(8)):
+            if np.sum(candidate * prices) <= cash:
+                best_error = min(best_error, np.sum((target_values - candidate * prices)**2))
+
+        error = np.sum((target_values - units * prices)**2)
+        self.assertLessEqual(error, best_error * 1.1)
+
+    def test_greedy_units_rows(self):
+        """
+        Test that the row-wise greedy allocation buys the same units as the greedy allocation of each row.
+        """
+        rng = np.random.default_rng(2)
+        prices = rng.uniform(5., 100., 10)
+        shortfalls = rng.uniform(-50., 300., (40, 10))
+        cash = rng.uniform(0., 500., 40)
+
+        units = share_allocation.greedy_units_rows(np.zeros((40, 10)), prices, shortfalls, cash)
+        for row_units, row_shortfalls, row_cash in zip(units, shortfalls, cash):
+            np.testing.assert_array_equal(
+                row_units, share_allocation.greedy_units(np.zeros(10), prices, row_shortfalls, row_cash))
+
+    def test_greedy_spends_leftover_cash(self):
+        """
+        Test that the greedy allocation spends leftover cash better than rounding down, for hundreds of assets.
+        """
+        rng = np.random.default_rng(0)
+        n = 500
+        prices = rng.uniform(5., 500., n)
+        current_values = rng.integers(0, 20, n) * prices
+        target = rng.uniform(size=n)
+        target = target / np.sum(target)
+        cash = 100000.
+
+        to_buy_values = solvers.solve_buy_only(current_values, target, cash)
+        floored = share_allocation.floor_units(to_buy_values, prices)
+        target_values = target * (np.sum(current_values) + cash)
+
+        start = time.perf_counter()
+        units = share_allocation.greedy_units(
+            floored, prices, target_values - current_values - floored * prices,
+            cash - np.sum(floored * prices))
+        self.assertLess(time.perf_counter() - start, 0.1)
+
+        self.assertTrue(np.all(units >= floored))
+        self.assertLessEqual(np.sum(units * prices), cash)
+        self.assertLess(cash - np.sum(units * prices), cash - np.sum(floored * prices))
+        self.assertLess(np.sum((target_values - current_values - units * prices)**2),
+                        np.sum((target_values - current_values - floored * prices)**2))
+
+
+if __name__ == '__main__':
+    unittest.main()
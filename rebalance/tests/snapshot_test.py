@@ -0,0 +1,127 @@
+import unittest
+
+import numpy as np
+
+from rebalance import Asset
+from rebalance import Cash
+from rebalance import CachedCurrencyRates
+from rebalance import MarketSnapshot
+from rebalance import Portfolio
+from rebalance import StaticQuoteProvider
+from rebalance import ToleranceBands
+from rebalance.tests import ProviderIsolation
+from rebalance.tests import TableRates
+
+
+class TestMarketSnapshot(ProviderIsolation, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        Asset.quote_provider = StaticQuoteProvider({
+            "XBB.TO": (33.4, "CAD"),
+            "XIC.TO": (24.3, "CAD"),
+            "ITOT": (69.4, "USD"),
+            "IEFA": (57.7, "USD"),
+            "IEMG": (49.1, "USD"),
+        })
+        self.rates = TableRates()
+        Cash.currency_rates = CachedCurrencyRates(self.rates)
+
+    def make_portfolio(self):
+        p = Portfolio()
+        p.easy_add_assets(tickers=["XBB.TO", "XIC.TO", "ITOT", "IEFA", "IEMG"],
+                          quantities=[36, 64, 32, 8, 7])
+        p.add_cash(3000., "USD")
+        p.add_cash(200., "CAD")
+        p.add_cash(100., "GBP")
+        return p
+
+    def test_capture(self):
+        """
+        Test capturing a snapshot of a portfolio's market.
+        """
+        p = self.make_portfolio()
+        snapshot = MarketSnapshot.capture(p, currencies=["eur"])
+
+        self.assertEqual(snapshot.currencies, ("CAD", "EUR", "GBP", "USD"))
+        self.assertEqual(self.rates.nb_lookups, 3)  # CAD to CAD needs no lookup
+        self.assertAlmostEqual(snapshot.get_rate("usd", "CAD"), 1.25)
+        self.assertAlmostEqual(snapshot.get_rate("GBP", "USD"), 1.7 / 1.25)
+        np.testing.assert_allclose(snapshot.rates_to("CAD"), [1., 1.5, 1.7, 1.25])
+        self.assertEqual(snapshot.price("ITOT"), 69.4)
+        self.assertAlmostEqual(snapshot.price_in("ITOT", "CAD"), 69.4 * 1.25)
+
+        # snapshot is immutable
+        with self.assertRaises(ValueError):
+            snapshot.rates[0, 1] = 2.
+        with self.assertRaises(ValueError):
+            snapshot.prices[0] = 2.
+
+        # updated copy
+        updated = snapshot.with_prices({"ITOT": 70.})
+        self.assertEqual(updated.price("ITOT"), 70.)
+        self.assertEqual(snapshot.price("ITOT"), 69.4)
+        self.assertIs(updated.rates, snapshot.rates)
+        with self.assertRaises(ValueError):
+            updated.prices[0] = 2.
+
+        # error handling
+        with self.assertRaises(Exception):
+            snapshot.get_rate("CAD", "JPY")
+        with self.assertRaises(Exception):
+            snapshot.with_prices({"TSLA": 700.})
+
+    def test_rebalance_without_network(self):
+        """
+        Test that a rebalance makes no rate lookup once the snapshot is captured.
+        """
+        target_asset_alloc = {
+            "XBB.TO": 20,
+            "XIC.TO": 20,
+            "ITOT": 36,
+            "IEFA": 20,
+            "IEMG": 4
+        }
+
+        p1 = self.make_portfolio()
+        snapshot = MarketSnapshot.capture(p1)
+        nb_lookups = self.rates.nb_lookups
+        Cash.currency_rates = None  # any lookup would now fail
+
+        p2 = self.make_portfolio()
+        result1 = p1.rebalance(target_asset_alloc, snapshot=snapshot)
+        result2 = p2.rebalance(target_asset_alloc, snapshot=snapshot)
+        self.assertEqual(self.rates.nb_lookups, nb_lookups)
+
+        # results are reproducible
+        self.assertEqual(result1[0], result2[0])
+        self.assertEqual(result1[2], result2[2])
+        self.assertAlmostEqual(p1.value("CAD", snapshot), p2.value("CAD", snapshot))
+
+
+    def test_rebalance_keeps_prices(self):
+        """
+        Test that the prices of a snapshot are only used for the duration of a rebalance.
+        """
+        target_asset_alloc = {
+            "XBB.TO": 20,
+            "XIC.TO": 20,
+            "ITOT": 36,
+            "IEFA": 20,
+            "IEMG": 4
+        }
+        p = self.make_portfolio()
+        snapshot = MarketSnapshot.capture(p).with_prices({"ITOT": 80.})
+
+        # no trade: the portfolio is within its tolerance bands
+        result = p.rebalance(target_asset_alloc, snapshot=snapshot, tolerance=ToleranceBands(absolute=100.))
+        self.assertEqual(result.prices["ITOT"][0], 80.)
+        self.assertEqual(p.assets["ITOT"].price, 69.4)
+
+        # trades made at the snapshot's prices
+        result = p.rebalance(target_asset_alloc, snapshot=snapshot)
+        self.assertEqual(result.prices["ITOT"][0], 80.)
+        self.assertEqual(p.assets["ITOT"].price, 69.4)
+
+
+if __name__ == '__main__':
+    unittest.main()
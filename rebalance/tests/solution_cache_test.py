@@ -0,0 +1,129 @@
+import unittest
+
+import numpy as np
+
+from rebalance import Asset
+from rebalance import Cash
+from rebalance import CachedCurrencyRates
+from rebalance import Portfolio
+from rebalance import RiskModel
+from rebalance import SolutionCache
+from rebalance import StaticQuoteProvider
+from rebalance import Tracer
+from rebalance.portfolio import rebalancing_helper
+from rebalance.tests import ProviderIsolation
+from rebalance.tests import TableRates
+
+
+class TestSolutionCache(ProviderIsolation, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        Asset.quote_provider = StaticQuoteProvider({
+            "XBB.TO": (25., "CAD"),
+            "XIC.TO": (20., "CAD"),
+            "ITOT": (80., "USD"),
+        })
+        Cash.currency_rates = CachedCurrencyRates(TableRates())
+        self.target = {"XBB.TO": 40., "XIC.TO": 40., "ITOT": 20.}
+
+    def make_portfolio(self, scale):
+        p = Portfolio()
+        p.easy_add_assets(tickers=["XBB.TO", "XIC.TO", "ITOT"], quantities=[40 * scale, 10 * scale, 5 * scale])
+        p.add_cash(1000. * scale, "CAD")
+        return p
+
+    def test_rescaled_solutions(self):
+        """
+        Test that a solution is shared by portfolios which differ only by their scale.
+        """
+        cache = SolutionCache()
+        target = np.array([40., 40., 20.])
+        solutions = []
+        for scale in (1, 10, 100):
+            p = self.make_portfolio(scale)
+            solutions.append(rebalancing_helper.rebalance_optimizer(p, target, solver="slsqp", cache=cache))
+
+        self.assertEqual(cache.misses, 1)
+        self.assertEqual(cache.hits, 2)
+        self.assertAlmostEqual(cache.hit_rate, 2. / 3.)
+        self.assertEqual(len(cache), 1)
+        np.testing.assert_allclose(solutions[1], 10. * solutions[0])
+        np.testing.assert_allclose(solutions[2], 100. * solutions[0])
+
+        # the solution of another target, or of other weights, is not shared
+        rebalancing_helper.rebalance_optimizer(self.make_portfolio(1), np.array([30., 50., 20.]), solver="slsqp", cache=cache)
+        p = self.make_portfolio(1)
+        p.add_cash(10., "CAD")
+        rebalancing_helper.rebalance_optimizer(p, target, solver="slsqp", cache=cache)
+        self.assertEqual(cache.misses, 3)
+
+        # weights within the tolerance share the solution, which never spends more than the cash
+        p = self.make_portfolio(1)
+        p.add_cash(0.01, "CAD")
+        solution = rebalancing_helper.rebalance_optimizer(p, target, solver="slsqp", cache=cache)
+        self.assertEqual(cache.hits, 3)
+        self.assertLessEqual(np.sum(solution), 1000.01 + 1E-9)
+        self.assertTrue(np.all(solution >= 0.))
+
+        # the solutions of the exact solvers are cached apart, and so is the default solver's
+        for solver in ("exact", "exact", "auto", "auto"):
+            rebalancing_helper.rebalance_optimizer(self.make_portfolio(10), target, solver=solver, cache=cache)
+        self.assertEqual(cache.misses, 5)
+        self.assertEqual(cache.hits, 5)
+
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.hit_rate, 0.)
+
+    def test_risk_model(self):
+        """
+        Test that risk models with the same content share solutions.
+        """
+        cache = SolutionCache()
+        target = np.array([40., 40., 20.])
+        tickers = ["XBB.TO", "XIC.TO", "ITOT"]
+        factors = [[0.1], [0.2], [0.3]]
+        for specific_variance in ([0.01, 0.02, 0.03], [0.01, 0.02, 0.03], [0.01, 0.02, 0.04]):
+            risk_model = RiskModel(tickers, factors, specific_variance=specific_variance)
+            rebalancing_helper.rebalance_optimizer(self.make_portfolio(1), target, cache=cache, risk_model=risk_model)
+
+        self.assertEqual(cache.hits, 1)
+        self.assertEqual(cache.misses, 2)
+        self.assertEqual(RiskModel(tickers, factors).fingerprint, RiskModel(tickers, factors).fingerprint)
+
+    def test_eviction(self):
+        """
+        Test that the least recently used solutions are evicted first.
+        """
+        cache = SolutionCache(maxsize=2)
+        targets = [np.array([40., 40., 20.]), np.array([30., 50., 20.]), np.array([20., 60., 20.])]
+        for target in targets[:2] + targets[:1] + targets[2:] + targets[:1] + targets[1:2]:
+            rebalancing_helper.rebalance_optimizer(self.make_portfolio(1), target, solver="slsqp", cache=cache)
+
+        # the second target was evicted when the third one was cached
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.hits, 2)
+        self.assertEqual(cache.misses, 4)
+
+        with self.assertRaises(AssertionError):
+            SolutionCache(maxsize=0)
+
+    def test_rebalance(self):
+        """
+        Test that accounts following the same model get the same trades (up to their scale) from one optimization.
+        """
+        cache = SolutionCache()
+        tracer = Tracer()
+        results = [self.make_portfolio(scale).rebalance(self.target, solver="slsqp", tracer=tracer, cache=cache)
+                   for scale in (1, 3, 1, 3)]
+
+        self.assertEqual(tracer.metrics.counters["solution_cache_misses"], 1)
+        self.assertEqual(tracer.metrics.counters["solution_cache_hits"], 3)
+        self.assertEqual(results[2].new_units, results[0].new_units)
+        expected = self.make_portfolio(3).rebalance(self.target, solver="slsqp")
+        for ticker, units in expected.new_units.items():
+            self.assertLessEqual(abs(results[1].new_units[ticker] - units), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
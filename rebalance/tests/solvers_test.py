@@ -0,0 +1,131 @@
+import time
+import unittest
+
+import numpy as np
+
+from rebalance import Tracer
+from rebalance.portfolio import solvers
+from rebalance.portfolio.risk import RiskModel
+
+
+class TestSolvers(unittest.TestCase):
+    def test_project_simplex(self):
+        """
+        Test the projection onto the scaled simplex.
+        """
+        np.testing.assert_allclose(solvers.project_simplex(np.array([1., 2., 3.]), 6.), [1., 2., 3.])
+        np.testing.assert_allclose(solvers.project_simplex(np.array([-5., 2., 3.]), 3.), [0., 1., 2.])
+        np.testing.assert_allclose(solvers.project_simplex(np.array([4., 4.]), 2.), [1., 1.])
+        np.testing.assert_allclose(solvers.project_simplex(np.array([4., 4.]), 0.), [0., 0.])
+
+        # a right or wrong guess of the support gives the same projection
+        values = np.array([-5., 2., 3.])
+        for support in ([False, True, True], [True, True, True], [False, False, True], [False, False, False]):
+            np.testing.assert_allclose(solvers.project_simplex(values, 3., np.array(support)), [0., 1., 2.])
+
+        rng = np.random.default_rng(0)
+        values = rng.normal(size=1000)
+        x = solvers.project_simplex(values, 10.)
+        self.assertTrue(np.all(x >= 0.))
+        self.assertAlmostEqual(np.sum(x), 10.)
+
+    def test_project_simplex_rows(self):
+        """
+        Test the row-wise projection against the projection of each row.
+        """
+        rng = np.random.default_rng(1)
+        values = rng.normal(size=(50, 20))
+        totals = rng.uniform(-1., 10., 50)
+        projections = solvers.project_simplex_rows(values, totals)
+        for row, total, projection in zip(values, totals, projections):
+            np.testing.assert_allclose(projection, solvers.project_simplex(row, total))
+
+    def test_solve_buy_only(self):
+        """
+        Test the water-filling solution of the buy-only problem.
+        """
+        current = np.array([100., 0., 50.])
+        target = np.array([0.2, 0.5, 0.3])
+
+        # not enough cash to reach the target: the most underweight asset is filled first
+        np.testing.assert_allclose(solvers.solve_buy_only(current, target, 50.), [0., 50., 0.])
+
+        # enough cash to reach the target
+        x = solvers.solve_buy_only(current, target, 350.)
+        np.testing.assert_allclose((current + x) / np.sum(current + x), target)
+
+        # no cash
+        np.testing.assert_allclose(solvers.solve_buy_only(current, target, 0.), [0., 0., 0.])
+
+    def test_solve_with_selling(self):
+        """
+        Test the solution of the problem where all assets are sold.
+        """
+        target = np.array([20., 30., 50.]) / 100.
+        np.testing.assert_allclose(solvers.solve_with_selling(target, 1000.), [200., 300., 500.])
+
+    def test_solve_tracking_error(self):
+        """
+        Test the tracking error solution against a dense SLSQP solution, and against water-filling with an identity covariance.
+        """
+        from scipy.optimize import minimize
+
+        rng = np.random.default_rng(2)
+        nb_assets = 30
+        tickers = ["T%d" % i for i in range(nb_assets)]
+        loadings = rng.normal(size=(nb_assets, 3)) * 0.1
+        specific_variance = rng.uniform(0.01, 0.05, nb_assets)
+        risk_model = RiskModel(tickers, loadings, specific_variance=specific_variance)
+        covariance = loadings @ loadings.T + np.diag(specific_variance)
+
+        current = rng.uniform(0., 100., nb_assets)
+        target = rng.uniform(size=nb_assets)
+        target = target / np.sum(target)
+        total_cash = 500.
+        total_value = np.sum(current) + total_cash
+
+        def tracking_variance(x):
+            diff = target - (current + x) / total_value
+            return diff @ covariance @ diff
+
+        x = solvers.solve_tracking_error(current, target, total_cash, risk_model)
+        self.assertAlmostEqual(np.sum(x), total_cash)
+        self.assertTrue(np.all(x >= 0.))
+        reference = minimize(tracking_variance, np.full(nb_assets, total_cash / nb_assets), method="SLSQP",
+                             bounds=[(0., total_cash)] * nb_assets,
+                             constraints=[{"type": "eq", "fun": lambda x: np.sum(x) - total_cash}],
+                             options={"ftol": 1E-15, "maxiter": 1000})
+        self.assertLessEqual(tracking_variance(x), reference.fun * (1. + 1E-6))
+
+        identity = RiskModel(tickers, np.zeros((nb_assets, 0)), specific_variance=np.ones(nb_assets))
+        np.testing.assert_allclose(solvers.solve_tracking_error(current, target, total_cash, identity),
+                                   solvers.solve_buy_only(current, target, total_cash), atol=1E-8)
+
+        # starting from the solution, the iterations stop right away
+        tracer = Tracer()
+        with tracer:
+            warm = solvers.solve_tracking_error(current, target, total_cash, risk_model, x0=x)
+        self.assertLessEqual(tracer.metrics.counters["tracking_error_iterations"], 2)
+        np.testing.assert_allclose(warm, x, atol=1E-6)
+
+        # no cash
+        np.testing.assert_allclose(solvers.solve_tracking_error(current, target, 0., risk_model), np.zeros(nb_assets))
+
+    def test_timing(self):
+        """
+        Test that solving a few hundred assets takes well under a millisecond.
+        """
+        rng = np.random.default_rng(1)
+        current = rng.uniform(0., 1000., 500)
+        target = rng.uniform(size=500)
+        target = target / np.sum(target)
+
+        nb_solves = 100
+        start = time.perf_counter()
+        for _ in range(nb_solves):
+            solvers.solve_buy_only(current, target, 10000.)
+        self.assertLess((time.perf_counter() - start) / nb_solves, 1e-3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from rebalance import Asset
+from rebalance import Cash
+from rebalance import CachedCurrencyRates
+from rebalance import Portfolio
+from rebalance import StaticQuoteProvider
+from rebalance import load_portfolios
+from rebalance import save_portfolios
+from rebalance.tests import OfflineQuoteProvider
+from rebalance.tests import OfflineRates
+from rebalance.tests import ProviderIsolation
+from rebalance.tests import TableRates
+
+
+def make_portfolios(nb_portfolios, nb_assets=30):
+    """
+    Synthetic portfolios holding 5 to 15 of ``nb_assets`` assets (in CAD and USD), and their target allocations.
+    """
+    rng = np.random.default_rng(0)
+    tickers = ["T%d" % i for i in range(nb_assets)]
+    Asset.quote_provider = StaticQuoteProvider(
+        {ticker: (price, "USD" if i % 2 else "CAD", "Asset %d" % i)
+         for i, (ticker, price) in enumerate(zip(tickers, rng.uniform(10., 100., nb_assets)))})
+
+    portfolios, targets = [], []
+    for i in range(nb_portfolios):
+        held = rng.choice(tickers, 5 + i % 11, replace=False).tolist()
+        p = Portfolio()
+        p.easy_add_assets(held, rng.integers(0, 50, len(held)).tolist())
+        p.add_cash(1000. * len(held), "USD" if i % 2 else "CAD")
+        p.selling_allowed = i % 3 == 0
+        portfolios.append(p)
+
+        target = rng.uniform(0., 1., len(held))
+        targets.append(dict(zip(held, (target / np.sum(target) * 100.).tolist())))
+    return portfolios, targets
+
+
+class TestStorage(ProviderIsolation, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        Cash.currency_rates = CachedCurrencyRates(TableRates())
+        self._directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self._directory.name, "portfolios.npz")
+
+    def tearDown(self):
+        self._directory.cleanup()
+
+    def assertPortfoliosEqual(self, p1, p2):
+        self.assertEqual(p1._holdings.tickers, p2._holdings.tickers)
+        np.testing.assert_array_equal(p1._holdings.quantities, p2._holdings.quantities)
+        np.testing.assert_array_equal(p1._holdings.prices, p2._holdings.prices)
+        for ticker, asset in p1.assets.items():
+            self.assertEqual(asset.currency, p2.assets[ticker].currency)
+            self.assertEqual(str(asset), str(p2.assets[ticker]))
+        self.assertEqual({currency: cash.amount for currency, cash in p1.cash.items()},
+                         {currency: cash.amount for currency, cash in p2.cash.items()})
+        self.assertEqual(p1.selling_allowed, p2.selling_allowed)
+        self.assertEqual(p1._common_currency, p2._common_currency)
+
+    def test_round_trip(self):
+        """
+        Test saving and loading portfolios, with and without memory mapping.
+        """
+        portfolios, _ = make_portfolios(20)
+        portfolios[1].selling_allowed = True
+        portfolios[2].add_asset(Asset.from_quote("TSLA", 3, 700.1, "USD", "Tesla"))
+        portfolios[3].add_cash(12.5, "GBP")
+        portfolios.append(Portfolio())
+
+        save_portfolios(self.path, portfolios)
+
+        # no network access when loading
+        Asset.quote_provider = OfflineQuoteProvider()
+        Cash.currency_rates = OfflineRates()
+        for mmap in (True, False):
+            loaded = load_portfolios(self.path, mmap=mmap)
+            self.assertEqual(len(loaded.portfolios), len(portfolios))
+            for p1, p2 in zip(portfolios, loaded.portfolios):
+                self.assertPortfoliosEqual(p1, p2)
+
+            self.assertEqual(list(loaded.snapshot.currencies), ["CAD", "GBP", "USD"])
+            self.assertAlmostEqual(loaded.snapshot.get_rate("USD", "GBP"), 1.25 / 1.7)
+            self.assertEqual(loaded.snapshot.price("TSLA"), 700.1)
+
+        # subset
+        loaded = load_portfolios(self.path, indices=[3, 1])
+        self.assertPortfoliosEqual(loaded.portfolios[0], portfolios[3])
+        self.assertPortfoliosEqual(loaded.portfolios[1], portfolios[1])
+
+        # single portfolio
+        path = os.path.join(self._directory.name, "portfolio.npz")
+        Cash.currency_rates = CachedCurrencyRates(TableRates())
+        portfolios[2].save(path)
+        Cash.currency_rates = OfflineRates()
+        self.assertPortfoliosEqual(Portfolio.load(path), portfolios[2])
+
+    def test_rebalance_loaded(self):
+        """
+        Test that loaded portfolios rebalance like the original ones, offline.
+        """
+        portfolios, targets = make_portfolios(10)
+        save_portfolios(self.path, portfolios)
+        expected = [p.rebalance(target) for p, target in zip(portfolios, targets)]
+
+        Asset.quote_provider = OfflineQuoteProvider()
+        Cash.currency_rates = OfflineRates()
+        loaded = load_portfolios(self.path)
+        for p, target, result in zip(loaded.portfolios, targets, expected):
+            self.assertEqual(p.rebalance(target, snapshot=loaded.snapshot)[0], result[0])
+
+        # loaded portfolios are independent of the file
+        p = loaded.portfolios[0]
+        p.buy_asset(p._holdings.tickers[0], 1)
+        self.assertEqual(load_portfolios(self.path, indices=[0]).portfolios[0]._holdings.quantities[0],
+                         p._holdings.quantities[0] - 1 - expected[0][0][p._holdings.tickers[0]])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,158 @@
+import os
+import tempfile
+import time
+import unittest
+
+from rebalance import Asset
+from rebalance import Cash
+from rebalance import CachedCurrencyRates
+from rebalance import MarketStore
+from rebalance import Portfolio
+from rebalance import Quote
+from rebalance import StaticQuoteProvider
+from rebalance import StoredCurrencyRates
+from rebalance import StoredQuoteProvider
+from rebalance.tests import CountingQuoteProvider
+from rebalance.tests import OfflineQuoteProvider
+from rebalance.tests import OfflineRates
+from rebalance.tests import ProviderIsolation
+from rebalance.tests import TableRates
+
+
+class TestMarketStore(ProviderIsolation, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self._directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self._directory.name, "market.sqlite")
+
+    def tearDown(self):
+        self._directory.cleanup()
+
+    def test_interface(self):
+        """
+        Test interface of MarketStore class.
+        """
+        store = MarketStore(self.path, durable=False)
+        now = time.time()
+        store.put_quotes({"TSLA": Quote(700.1, "USD", "Tesla"), "VCN.TO": Quote(35.5, "CAD", None)},
+                         timestamp=now - 100.)
+        store.put_rate("cad", "usd", 0.8, timestamp=now - 100.)
+
+        self.assertEqual(store.get_quotes(["TSLA", "VCN.TO", "ITOT"]),
+                         {"TSLA": Quote(700.1, "USD", "Tesla"), "VCN.TO": Quote(35.5, "CAD", None)})
+        self.assertEqual(store.get_quotes(["TSLA"], max_age=10.), {})
+        self.assertEqual(store.get_rate("CAD", "USD"), 0.8)
+        self.assertEqual(store.get_rate("CAD", "USD", max_age=200.), 0.8)
+        self.assertIsNone(store.get_rate("CAD", "USD", max_age=10.))
+        self.assertIsNone(store.get_rate("USD", "CAD"))
+
+        # replace
+        store.put_quotes({"TSLA": Quote(710., "USD", "Tesla")})
+        self.assertEqual(store.get_quotes(["TSLA"], max_age=10.)["TSLA"].price, 710.)
+
+        # persisted across connections
+        store.close()
+        store = MarketStore(self.path, durable=False)
+        self.assertEqual(store.get_quotes(["TSLA"])["TSLA"].price, 710.)
+        store.clear()
+        self.assertEqual(store.get_quotes(["TSLA"]), {})
+        self.assertIsNone(store.get_rate("CAD", "USD"))
+        store.close()
+
+    def test_home_directory(self):
+        """
+        Test that a path in the home directory is expanded.
+        """
+        home = {name: os.environ.get(name) for name in ("HOME", "USERPROFILE")}
+        os.environ["HOME"] = os.environ["USERPROFILE"] = self._directory.name
+        try:
+            store = MarketStore(os.path.join("~", "market.sqlite"), durable=False)
+        finally:
+            for name, value in home.items():
+                if value is None:
+                    del os.environ[name]
+                else:
+                    os.environ[name] = value
+
+        self.assertEqual(store.path, self.path)
+        store.put_rate("CAD", "USD", 0.8)
+        store.close()
+        self.assertTrue(os.path.exists(self.path))
+
+    def test_warm_restart(self):
+        """
+        Test that a second process reuses the quotes and rates fetched by the first one, even offline.
+        """
+        tickers = ["T%d" % i for i in range(600)]
+        provider = CountingQuoteProvider(
+            StaticQuoteProvider({ticker: (10. + i, "USD" if i % 2 else "CAD") for i, ticker in enumerate(tickers)}))
+        rates = TableRates()
+
+        # first process: everything is fetched
+        store = MarketStore(self.path, durable=False)
+        Asset.quote_provider = StoredQuoteProvider(provider, store)
+        Cash.currency_rates = CachedCurrencyRates(StoredCurrencyRates(store, rates))
+        p = Portfolio()
+        p.easy_add_assets(tickers, [1] * len(tickers))
+        p.add_cash(100., "GBP")
+        value = p.value("CAD")
+        self.assertEqual(provider.nb_requests, 1)
+        self.assertEqual(rates.nb_lookups, 2)
+        store.close()
+
+        # second process: nothing is fetched
+        store = MarketStore(self.path, durable=False)
+        Asset.quote_provider = StoredQuoteProvider(provider, store)
+        Cash.currency_rates = CachedCurrencyRates(StoredCurrencyRates(store, rates))
+        p = Portfolio()
+        p.easy_add_assets(tickers, [1] * len(tickers))
+        p.add_cash(100., "GBP")
+        self.assertAlmostEqual(p.value("CAD"), value)
+        self.assertEqual(provider.nb_requests, 1)
+        self.assertEqual(rates.nb_lookups, 2)
+
+        # only the missing quotes are fetched
+        provider.provider.add_quote("ITOT", 69.4, "USD")
+        Asset.quote_provider.get_quotes(["T1", "ITOT"])
+        self.assertEqual(provider.nb_requests, 2)
+        store.close()
+
+    def test_freshness(self):
+        """
+        Test that outdated entries are fetched again, and served if the source fails.
+        """
+        store = MarketStore(self.path, durable=False)
+        old = time.time() - 3600.
+        store.put_quotes({"TSLA": Quote(700.1, "USD", "Tesla")}, timestamp=old)
+        store.put_rate("USD", "CAD", 1.2, timestamp=old)
+
+        # outdated entries are refreshed
+        provider = CountingQuoteProvider(StaticQuoteProvider({"TSLA": (710., "USD", "Tesla")}))
+        self.assertEqual(StoredQuoteProvider(provider, store, max_age=60.).get_quote("TSLA").price, 710.)
+        self.assertEqual(provider.nb_requests, 1)
+        self.assertEqual(StoredCurrencyRates(store, TableRates(), max_age=60.).get_rate("usd", "cad"), 1.25)
+        self.assertEqual(store.get_rate("USD", "CAD", max_age=60.), 1.25)
+
+        # outdated entries are served when offline
+        store.put_quotes({"TSLA": Quote(700.1, "USD", "Tesla")}, timestamp=old)
+        store.put_rate("USD", "CAD", 1.2, timestamp=old)
+        offline = StoredQuoteProvider(OfflineQuoteProvider(), store, max_age=60.)
+        self.assertEqual(offline.get_quote("TSLA").price, 700.1)
+        offline_rates = StoredCurrencyRates(store, OfflineRates(), max_age=60.)
+        self.assertEqual(offline_rates.get_rate("USD", "CAD"), 1.2)
+        self.assertEqual(offline_rates.get_rate("USD", "USD"), 1.)
+
+        # unless disabled, or if nothing is stored
+        with self.assertRaises(ConnectionError):
+            StoredQuoteProvider(OfflineQuoteProvider(), store, max_age=60., serve_stale=False).get_quote("TSLA")
+        with self.assertRaises(ConnectionError):
+            offline.get_quote("ITOT")
+        with self.assertRaises(ConnectionError):
+            StoredCurrencyRates(store, OfflineRates(), max_age=60., serve_stale=False).get_rate("USD", "CAD")
+        with self.assertRaises(ConnectionError):
+            offline_rates.get_rate("USD", "EUR")
+        store.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
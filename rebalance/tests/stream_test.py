@@ -0,0 +1,93 @@
+import collections
+import gc
+import itertools
+import tracemalloc
+import unittest
+
+from rebalance import Asset
+from rebalance import Cash
+from rebalance import CashFlow
+from rebalance import MarketSnapshot
+from rebalance import Portfolio
+from rebalance import PriceUpdate
+from rebalance import StaticQuoteProvider
+from rebalance.tests import ProviderIsolation
+from rebalance.tests import TableRates
+
+
+class TestStream(ProviderIsolation, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        Asset.quote_provider = StaticQuoteProvider({
+            "VCN.TO": (35.5, "CAD"), "XAW.TO": (31.2, "CAD"), "ITOT": (69.4, "USD")})
+        Cash.currency_rates = TableRates()
+
+        self.p = Portfolio()
+        self.p.easy_add_assets(["VCN.TO", "XAW.TO", "ITOT"], [10, 20, 5])
+        self.p.add_cash(20., "CAD")
+        self.target = {"VCN.TO": 30., "XAW.TO": 40., "ITOT": 30.}
+
+    def test_rebalance_stream(self):
+        """
+        Test that each event is applied to the portfolio, which is then rebalanced.
+        """
+        events = [CashFlow(5., "CAD"),
+                  CashFlow(1000., "CAD"),
+                  PriceUpdate("ITOT", 50.),
+                  CashFlow(200., "usd"),
+                  CashFlow(-10., "CAD")]
+        stream = self.p.rebalance_stream(events, self.target)
+
+        event, result = next(stream)
+        self.assertEqual(event, events[0])
+        self.assertEqual(sum(result.new_units.values()), 0)
+        self.assertAlmostEqual(self.p.cash["CAD"].amount, 25.)
+
+        event, result = next(stream)
+        self.assertGreater(sum(result.new_units.values()), 10)
+        self.assertEqual(self.p.assets["VCN.TO"].quantity, 10 + result.new_units["VCN.TO"])
+        self.assertLess(self.p.cash_value("CAD"), 31.2)
+
+        event, result = next(stream)
+        self.assertEqual(result.prices["ITOT"], [50., "USD"])
+
+        # the snapshot is extended with the currency of the deposit
+        event, result = next(stream)
+        self.assertEqual(event.currency, "usd")
+        self.assertGreater(result.new_units["ITOT"], 0)
+
+        event, result = next(stream)
+        with self.assertRaises(StopIteration):
+            next(stream)
+
+        # withdrawals beyond the cash available
+        cash = self.p.cash["CAD"].amount
+        with self.assertRaises(Exception):
+            list(self.p.rebalance_stream([CashFlow(-1e6, "CAD")], self.target))
+        self.assertEqual(self.p.cash["CAD"].amount, cash)
+        with self.assertRaises(Exception):
+            list(self.p.rebalance_stream([PriceUpdate("TSLA", 700.)], self.target))
+        with self.assertRaises(Exception):
+            list(self.p.rebalance_stream([("CAD", 10.)], self.target))
+
+    def test_unbounded_stream(self):
+        """
+        Test that the events are consumed lazily, in constant memory.
+        """
+        snapshot = MarketSnapshot.capture(self.p)
+        events = itertools.cycle([CashFlow(40., "CAD"), PriceUpdate("VCN.TO", 36.), PriceUpdate("VCN.TO", 35.)])
+        stream = self.p.rebalance_stream(events, self.target, snapshot=snapshot)
+        self.assertEqual(len(list(itertools.islice(stream, 5))), 5)
+
+        # the memory retained does not grow with the number of events (keeping the results would take ~1 kB per event)
+        collections.deque(itertools.islice(stream, 200), maxlen=0)
+        gc.collect()
+        tracemalloc.start()
+        collections.deque(itertools.islice(stream, 200), maxlen=0)
+        gc.collect()
+        retained = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        self.assertLess(retained, 200 * 250)
+
+if __name__ == '__main__':
+    unittest.main()
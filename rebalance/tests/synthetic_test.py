@@ -0,0 +1,45 @@
+import subprocess
+import sys
+import unittest
+
+from rebalance import SyntheticCurrencyRates
+from rebalance import SyntheticQuoteProvider
+
+
+class TestSynthetic(unittest.TestCase):
+    def test_quotes(self):
+        """
+        Test interface of SyntheticQuoteProvider class.
+        """
+        provider = SyntheticQuoteProvider(["cad", "USD", "EUR"], min_price=10., max_price=20.)
+        quotes = provider.get_quotes(["A%d" % i for i in range(300)])
+
+        self.assertEqual(len(quotes), 300)
+        self.assertTrue(all(10. <= quote.price <= 20. for quote in quotes.values()))
+        self.assertEqual({quote.currency for quote in quotes.values()}, {"CAD", "USD", "EUR"})
+
+        # deterministic, even across processes
+        self.assertEqual(provider.get_quote("A7"), quotes["A7"])
+        code = "from rebalance import SyntheticQuoteProvider as P; print(P(['cad', 'USD', 'EUR'], min_price=10., max_price=20.).get_quote('A7').price)"
+        self.assertEqual(float(subprocess.check_output([sys.executable, "-c", code])), quotes["A7"].price)
+
+        # the seed changes the quotes
+        self.assertNotEqual(SyntheticQuoteProvider(seed=1).get_quote("A7"), SyntheticQuoteProvider().get_quote("A7"))
+
+    def test_rates(self):
+        """
+        Test interface of SyntheticCurrencyRates class.
+        """
+        rates = SyntheticCurrencyRates()
+        self.assertEqual(SyntheticCurrencyRates.currencies(3), ["CAD", "USD", "EUR"])
+        with self.assertRaises(AssertionError):
+            SyntheticCurrencyRates.currencies(11)
+
+        self.assertEqual(rates.get_rate("CAD", "cad"), 1.)
+        self.assertAlmostEqual(rates.get_rate("CAD", "USD") * rates.get_rate("USD", "CAD"), 1.)
+        self.assertAlmostEqual(rates.get_rate("CAD", "USD") * rates.get_rate("USD", "EUR"), rates.get_rate("CAD", "EUR"))
+        self.assertNotEqual(SyntheticCurrencyRates(seed=1).get_rate("CAD", "USD"), rates.get_rate("CAD", "USD"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -38,7 +38,8 @@ if __name__ == "__main__":
           maintainer_email=AUTHOR_EMAIL,
           description=DESCRIPTION,
           packages=find_packages(),
-          python_requires=">=3.6",
+          package_data={"rebalance.tests": ["fixtures/*.json"]},
+          python_requires=">=3.7",
           tests_require=test_reqs,
           url="https://rebalance.readthedocs.io/",
           install_requires=install_reqs)
\ No newline at end of file